@@ -0,0 +1,43 @@
+import hashlib
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+# Условные GET-запросы (If-None-Match).
+# ETag считается по дешёвым признакам изменения (время обновления, версия),
+# а не по телу ответа: при совпадении клиент получает 304 без сериализации и передачи данных.
+# Last-Modified не отдаём: у него точность в секунду, а два сообщения в одну секунду — обычное дело.
+
+
+def make_etag(request, *parts):
+    """ETag из признаков изменения, адреса с параметрами и формата ответа (JSON / страница DRF)."""
+    renderer = getattr(request, 'accepted_renderer', None)
+    parts += (request.get_full_path(), renderer.format if renderer else '')
+    return quote_etag(hashlib.md5('|'.join(map(str, parts)).encode()).hexdigest())
+
+
+def not_modified(request, etag, private=False):
+    """
+    Возвращает ответ 304 (или 412 для If-Match), если у клиента уже актуальные данные, иначе None.
+    Ответ 304 сразу содержит ETag, как того требует RFC 9110.
+    """
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        set_etag(response, etag, private)
+    return response
+
+
+def set_etag(response, etag, private=False):
+    """
+    Проставляет ETag и просит браузер каждый раз сверяться с сервером (no-cache):
+    данные меняются в любой момент, а проверка с ответом 304 почти ничего не стоит.
+    private — ответ свой у каждого пользователя, общие кэши (прокси) его не хранят.
+    """
+    if response.status_code not in (200, 304):
+        # Ошибки (400, 404) валидаторами не помечаем
+        return response
+    response['ETag'] = etag
+    if private:
+        patch_cache_control(response, no_cache=True, private=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
@@ -0,0 +1,47 @@
+import logging
+from django.conf import settings
+from .queries import SQL_PREVIEW_LENGTH, QueryLog
+
+logger = logging.getLogger('api.queries')
+
+# Выше этих порогов запрос пишется в лог как предупреждение вместе с самыми медленными SQL
+WARN_QUERIES = getattr(settings, 'QUERY_BUDGET_WARN_QUERIES', 30)
+WARN_DB_MS = getattr(settings, 'QUERY_BUDGET_WARN_MS', 200)
+
+
+def _slowest_header(log):
+    # Заголовки — только ASCII в одну строку
+    text = ' | '.join(f"{ms:.1f}ms {sql[:SQL_PREVIEW_LENGTH]}" for ms, sql in log.slowest())
+    return ' '.join(text.split()).encode('ascii', 'replace').decode()
+
+
+class QueryBudgetMiddleware:
+    """
+    Считает SQL-запросы каждого HTTP-запроса: число, время в БД и самые медленные.
+    В DEBUG отдаёт их в заголовках (X-DB-Queries, X-DB-Time-Ms, X-DB-Slowest и Server-Timing —
+    последний видно во вкладке Network браузера). В лог api.queries пишет строку на каждый запрос (INFO),
+    а превысившие пороги — предупреждением с самыми медленными SQL.
+    Бюджеты запросов по эндпоинтам закреплены тестами в api/tests.py.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        log = QueryLog()
+        with log.recording():
+            response = self.get_response(request)
+
+        summary = f"{request.method} {request.path} {response.status_code}: {log.count} SQL, {log.ms:.1f} мс в БД"
+        if log.count > WARN_QUERIES or log.ms > WARN_DB_MS:
+            logger.warning("%s\n%s", summary, log.describe_slowest())
+        else:
+            logger.info(summary)
+
+        if settings.DEBUG:
+            response['X-DB-Queries'] = str(log.count)
+            response['X-DB-Time-Ms'] = f"{log.ms:.1f}"
+            if log.count:
+                response['X-DB-Slowest'] = _slowest_header(log)
+            response['Server-Timing'] = f'db;dur={log.ms:.1f};desc="{log.count} SQL"'
+        return response
@@ -0,0 +1,60 @@
+import heapq
+import time
+from contextlib import ExitStack, contextmanager
+from django.db import connections
+
+# Сколько самых медленных запросов запоминать
+SLOWEST_KEPT = 3
+# До скольких символов обрезать SQL в заголовках и логах
+SQL_PREVIEW_LENGTH = 200
+
+
+class QueryLog:
+    """
+    Учёт SQL-запросов через connection.execute_wrapper: число, суммарное время и самые медленные.
+    Работает и без DEBUG (в отличие от connection.queries), поэтому годится для продакшена.
+    keep_all=True дополнительно сохраняет текст каждого запроса — для сообщений в тестах.
+    """
+
+    def __init__(self, slowest=SLOWEST_KEPT, keep_all=False):
+        self.count = 0
+        self.seconds = 0.0
+        self._slowest_kept = slowest
+        self._slowest = []
+        self.statements = [] if keep_all else None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.count += 1
+            self.seconds += duration
+            # Куча из N самых долгих: (время, номер, sql), номер — чтобы не сравнивать строки
+            item = (duration, self.count, sql)
+            if len(self._slowest) < self._slowest_kept:
+                heapq.heappush(self._slowest, item)
+            elif self._slowest and duration > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, item)
+            if self.statements is not None:
+                self.statements.append(sql)
+
+    @property
+    def ms(self):
+        return self.seconds * 1000
+
+    def slowest(self):
+        """[(мс, sql), ...] от самого долгого."""
+        return [(duration * 1000, sql) for duration, _, sql in sorted(self._slowest, reverse=True)]
+
+    def describe_slowest(self):
+        return '\n'.join(f"{ms:.1f} мс: {sql[:SQL_PREVIEW_LENGTH]}" for ms, sql in self.slowest())
+
+    @contextmanager
+    def recording(self):
+        """Считает запросы ко всем базам внутри блока with."""
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
@@ -0,0 +1,19 @@
+from contextlib import contextmanager
+from .queries import QueryLog
+
+
+class QueryBudgetMixin:
+    """
+    Для TestCase: assertQueryBudget(n) проверяет, что код внутри with выполнил не больше n SQL-запросов.
+    В отличие от assertNumQueries допускает меньше (оптимизация не ломает тест),
+    а при превышении печатает все запросы — сразу видно, какой из них лишний (обычно N+1).
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, budget, label=''):
+        log = QueryLog(keep_all=True)
+        with log.recording():
+            yield log
+        if log.count > budget:
+            statements = '\n'.join(f"{i}. {sql}" for i, sql in enumerate(log.statements, 1))
+            self.fail(f"{label or 'Запрос'}: {log.count} SQL при бюджете {budget}\n{statements}")
@@ -1,3 +1,169 @@
-from django.test import TestCase
+from unittest import mock
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import URLPattern, URLResolver
+from rest_framework.test import APITestCase
+from articles import corpus
+from articles.models import Post, Tag
+from chat.models import Chat, Message
+from users.models import User
+from users.views import MyTokenObtainPairSerializer
+from . import urls
+from .testing import QueryBudgetMixin
 
-# Create your tests here.
+# Бюджет SQL-запросов на каждый маршрут api/urls.py (имя маршрута -> запросов не больше).
+# Данных в тестах несколько штук каждого вида, так что N+1 сразу выходит за бюджет.
+# Поменялся эндпоинт — поменяйте бюджет осознанно; новый маршрут без бюджета роняет test_every_route_has_budget.
+# Пользователь и право psych берутся из JWT (users/authentication.py) — запросов на аутентификацию нет.
+# В тестах к транзакциям добавляются SAVEPOINT вокруг atomic.
+BUDGETS = {
+    'api-root': 0,
+    # Блокировка ученика, проверка активного чата, выбор психолога, чат, счётчик, сообщение, превью,
+    # ученик и психолог для ответа
+    'chat-initiate': 15,
+    # Агрегат для ETag + чаты с учениками и психологами одним JOIN
+    'chat-list': 2,
+    'chat-detail': 1,
+    'chat-messages': 2,
+    'chat-send-message': 3,
+    'chat-mark-read': 5,
+    'chat-close': 5,
+    # Статьи + теги одним prefetch (с ?page=N ещё COUNT)
+    'article-list': 3,
+    'article-detail': 2,
+    'article-tags': 1,
+    # Только строка администратора (is_staff)
+    'article-cache-stats': 1,
+    # Версия корпуса + лексический индекс + победители + их теги
+    'ai-search': 4,
+    # Администратор (is_staff) + версия корпуса
+    'ai-search-stats': 2,
+    # INSERT в точке сохранения (повтор при совпадении токена): SAVEPOINT + INSERT + RELEASE
+    'register-student': 3,
+    # Администратор (строка при обращении к is_staff) + на пачку: проверка токенов, SAVEPOINT + INSERT + RELEASE
+    'provision-students': 5,
+}
+
+
+def route_names(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from route_names(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield pattern.name
+
+
+class QueryBudgetTest(QueryBudgetMixin, APITestCase):
+    CHATS = 5
+    ARTICLES = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.psychologist = User.objects.create(email='psy@school.ru', token='psy')
+        cls.psychologist.user_permissions.add(Permission.objects.get(codename='psych'))
+        cls.admin = User.objects.create(email='admin@school.ru', token='admin', is_staff=True)
+        for i in range(cls.CHATS):
+            student = User.objects.create(token=f'student-{i}')
+            chat = Chat.objects.create(student=student, psychologist=cls.psychologist)
+            for j in range(4):
+                Message.objects.create(chat=chat, sender=student if j % 2 else cls.psychologist, content=f"сообщение {j}")
+        cls.chat = Chat.objects.order_by('id').first()
+        cls.student = cls.chat.student
+        cls.newcomer = User.objects.create(token='newcomer')
+        tags = [Tag.objects.create(name=name) for name in ("Учёба", "Стресс", "Семья")]
+        for i in range(cls.ARTICLES):
+            post = Post.objects.create(title=f"Статья {i}", excerpt="Описание", text="Как справиться со стрессом")
+            post.tags.set(tags[:1 + i % 3])
+        cls.post = Post.objects.first()
+
+    def setUp(self):
+        # Бюджет — на ответ без кэша статей (articles/response_cache.py)
+        cache.clear()
+
+    def login(self, user):
+        # Настоящий JWT, как при входе (с клеймом is_psychologist), а не force_authenticate:
+        # запросы аутентификации тоже входят в бюджет
+        token = MyTokenObtainPairSerializer.get_token(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def call(self, name, method, url, data=None, status=200):
+        with self.assertQueryBudget(BUDGETS[name], label=name) as log:
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertEqual(response.status_code, status, response.content[:300])
+        return log.count
+
+    def test_every_route_has_budget(self):
+        self.assertEqual(set(route_names(urls.urlpatterns)), set(BUDGETS))
+
+    def test_api_root(self):
+        self.call('api-root', 'get', '/api/v1/')
+
+    def test_chat_routes(self):
+        self.login(self.psychologist)
+        self.call('chat-list', 'get', '/api/v1/chats/')
+        self.call('chat-detail', 'get', f'/api/v1/chats/{self.chat.id}/')
+        self.call('chat-messages', 'get', f'/api/v1/chats/{self.chat.id}/messages/')
+        self.call('chat-send-message', 'post', f'/api/v1/chats/{self.chat.id}/send_message/', {'content': "Ответ"}, 201)
+        last = self.chat.messages.filter(sender=self.student).last()
+        self.call('chat-mark-read', 'post', f'/api/v1/chats/{self.chat.id}/mark_read/', {'up_to_id': last.id})
+        self.call('chat-close', 'post', f'/api/v1/chats/{self.chat.id}/close/')
+
+    def test_initiate(self):
+        self.login(self.newcomer)
+        self.call('chat-initiate', 'post', '/api/v1/chats/initiate/', {'content': "Мне нужна помощь"}, 201)
+
+    def test_article_routes(self):
+        self.call('article-list', 'get', '/api/v1/articles/')
+        self.call('article-list', 'get', '/api/v1/articles/?page=1&tag=Стресс')
+        self.call('article-tags', 'get', '/api/v1/articles/tags/')
+        self.login(self.admin)
+        self.call('article-cache-stats', 'get', '/api/v1/articles/cache-stats/')
+        self.call('article-detail', 'get', f'/api/v1/articles/{self.post.id}/')
+
+    def test_ai_search(self):
+        # Строка версии корпуса создаётся один раз на базу — не в бюджете запроса
+        corpus.get_corpus_version()
+        self.call('ai-search', 'post', '/api/v1/articles/ai-search/', {'query': "стресс перед экзаменом"})
+        self.login(self.admin)
+        self.call('ai-search-stats', 'get', '/api/v1/articles/ai-search/stats/')
+
+    def test_register_student(self):
+        self.call('register-student', 'post', '/api/auth/register-student/', {'password': 'secret-password'}, 201)
+
+    def test_provision_students(self):
+        self.login(self.admin)
+        # Ответ потоковый: запросы идут, пока читается тело, поэтому оно читается внутри бюджета
+        with self.assertQueryBudget(BUDGETS['provision-students'], label='provision-students'):
+            response = self.client.post('/api/auth/provision-students/', {'count': 3}, format='json')
+            content = b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(content.splitlines()), 4)
+
+
+class QueryBudgetMiddlewareTest(APITestCase):
+    def setUp(self):
+        # Ответ из кэша статей не дошёл бы до БД
+        cache.clear()
+        Post.objects.create(title="Статья", excerpt="Описание", text="Текст")
+
+    @override_settings(DEBUG=True)
+    def test_debug_headers(self):
+        response = self.client.get('/api/v1/articles/')
+        self.assertEqual(response['X-DB-Queries'], '2')
+        self.assertIn('SELECT', response['X-DB-Slowest'])
+        self.assertTrue(response['Server-Timing'].startswith('db;dur='))
+
+    def test_no_headers_without_debug(self):
+        response = self.client.get('/api/v1/articles/')
+        self.assertNotIn('X-DB-Queries', response)
+
+    def test_log(self):
+        with self.assertLogs('api.queries', 'INFO') as logs:
+            self.client.get('/api/v1/articles/')
+        self.assertIn('GET /api/v1/articles/ 200: 2 SQL', logs.output[0])
+
+        # Выше порога — предупреждение со списком самых медленных SQL (другая страница: первая уже в кэше ответов)
+        with mock.patch('api.middleware.WARN_QUERIES', 1), self.assertLogs('api.queries', 'WARNING') as logs:
+            self.client.get('/api/v1/articles/?page=1')
+        self.assertIn('SELECT', logs.output[0])
@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 # Предполагаем, что views.py находится в вашем приложении 'articles'
-from articles.views import ArticleViewSet, ai_search_view
+from articles.views import ArticleViewSet, ai_search_view, ai_search_stats_view
 from chat.views import *
 from users.views import *
 
@@ -15,6 +15,8 @@ router.register(r'articles', ArticleViewSet, basename='article')
 urlpatterns = [
     path('v1/chats/initiate/', initiate_chat, name='chat-initiate'),
     path('v1/articles/ai-search/', ai_search_view, name='ai-search'),
-    path('auth/register-student/', RegisterStudentView.as_view()),
+    path('v1/articles/ai-search/stats/', ai_search_stats_view, name='ai-search-stats'),
+    path('auth/register-student/', RegisterStudentView.as_view(), name='register-student'),
+    path('auth/provision-students/', ProvisionStudentsView.as_view(), name='provision-students'),
     path('v1/', include(router.urls)), 
 ]
\ No newline at end of file
@@ -1,4 +1,5 @@
 from django.contrib import admin
 from articles.models import *
 admin.site.register(Post)
-admin.site.register(Tag)
\ No newline at end of file
+admin.site.register(Tag)
+admin.site.register(PostEmbedding)
\ No newline at end of file
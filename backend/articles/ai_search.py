@@ -1,59 +1,394 @@
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+from django.conf import settings
+import hashlib
+import threading
 import numpy as np
-from .models import Post
+from .batching import BatchingEncoder
+from .corpus import bump_corpus_version, follows, get_corpus_version
+from .embedding_store import open_store
+from .encoder import MODEL_NAME, get_model
+from .lexical_index import LexicalIndex, tokenize
+from .models import Post, PostEmbedding, PostPassage
+from .passage_index import PassageIndex, split_passages
+from .search_cache import QueryCache, normalize_query
+from .vector_index import VectorIndex
+
+# Индекс векторов всех статей в памяти процесса. Заполняется при первом поиске,
+# дальше обновляется сигналами сохранения и удаления статей.
+index = VectorIndex()
+_index_load_lock = threading.Lock()
+
+# Общий для всех процессов файл квантованных векторов (см. команду build_embedding_store).
+# Если он есть, индекс берёт векторы из него через mmap и держит в памяти только изменения.
+EMBEDDING_STORE_PATH = getattr(settings, 'AI_SEARCH_EMBEDDING_STORE', None)
+
+# Инвертированный индекс (BM25) по заголовку, описанию и полному тексту статей.
+# Короткие запросы с точным совпадением слов обходятся без модели,
+# а для остальных модель переранжирует только лучших лексических кандидатов.
+lexical_index = LexicalIndex()
+_lexical_load_lock = threading.Lock()
+LEXICAL_CANDIDATES = getattr(settings, 'AI_SEARCH_LEXICAL_CANDIDATES', 50)
+LEXICAL_MAX_TERMS = getattr(settings, 'AI_SEARCH_LEXICAL_MAX_TERMS', 2)
+
+# Фрагменты полного текста статей. Нарезаются и кодируются только при сохранении статьи
+# (или командой embed_articles), поэтому длина статей не влияет на время поиска.
+PASSAGE_WORDS = getattr(settings, 'AI_SEARCH_PASSAGE_WORDS', 80)
+PASSAGE_OVERLAP = getattr(settings, 'AI_SEARCH_PASSAGE_OVERLAP', 20)
+PASSAGE_CANDIDATES = getattr(settings, 'AI_SEARCH_PASSAGE_CANDIDATES', 100)
+passage_index = PassageIndex(top_m=getattr(settings, 'AI_SEARCH_PASSAGE_TOP_M', 1))
+_passage_load_lock = threading.Lock()
+
+# Кэш векторов запросов (не зависит от статей) и кэш найденных id статей
+# (ключ содержит версию корпуса, поэтому после изменения статей старые записи просто не находятся).
+CACHE_SIZE = getattr(settings, 'AI_SEARCH_CACHE_SIZE', 512)
+CACHE_TTL = getattr(settings, 'AI_SEARCH_CACHE_TTL', 60 * 60)
+query_embedding_cache = QueryCache(max_size=CACHE_SIZE, ttl=CACHE_TTL)
+result_cache = QueryCache(max_size=CACHE_SIZE, ttl=CACHE_TTL)
+
+# Одновременные запросы кодируются моделью одним батчем
+query_encoder = BatchingEncoder(
+    get_model,
+    max_batch_size=getattr(settings, 'AI_SEARCH_BATCH_SIZE', 16),
+    max_wait_ms=getattr(settings, 'AI_SEARCH_BATCH_WAIT_MS', 5),
+)
+
+
+def get_embedding_text(post):
+    """Текст статьи, который превращается в вектор (заголовок + описание)."""
+    return f"{post.title}. {post.excerpt}"
+
+
+def get_content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def vector_to_bytes(vector):
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+def bytes_to_vector(data):
+    return np.frombuffer(bytes(data), dtype=np.float32)
+
+
+def is_embedding_fresh(embedding, post):
+    """Вектор актуален, если посчитан текущей моделью по текущему тексту статьи."""
+    return (
+        embedding is not None
+        and embedding.model_name == MODEL_NAME
+        and embedding.content_hash == get_content_hash(get_embedding_text(post))
+    )
+
+
+def get_stored_embedding(post):
+    # Обратная связь OneToOne бросает исключение, если вектора ещё нет
+    try:
+        return post.embedding
+    except PostEmbedding.DoesNotExist:
+        return None
+
+
+def embed_posts(posts):
+    """
+    Считает векторы для списка статей одним батчем и сохраняет их в БД.
+    Возвращает словарь {post.id: вектор}.
+    """
+    model = get_model()
+    if not model or not posts:
+        return {}
+
+    texts = [get_embedding_text(post) for post in posts]
+    vectors = model.encode(texts)
+
+    result = {}
+    for post, text, vector in zip(posts, texts, vectors):
+        PostEmbedding.objects.update_or_create(
+            post=post,
+            defaults={
+                'model_name': MODEL_NAME,
+                'content_hash': get_content_hash(text),
+                'vector': vector_to_bytes(vector),
+            },
+        )
+        result[post.id] = np.asarray(vector, dtype=np.float32)
+    return result
+
+
+def update_post_embedding(post):
+    """Пересчитывает вектор статьи, если он отсутствует или устарел, и обновляет индекс."""
+    if not get_model():
+        return
+    embedding = get_stored_embedding(post)
+    if is_embedding_fresh(embedding, post):
+        vector = bytes_to_vector(embedding.vector)
+    else:
+        vector = embed_posts([post])[post.id]
+    if index.loaded:
+        index.upsert(post.id, vector)
+
+
+def get_passages_hash(post):
+    # Параметры нарезки входят в хэш: при их смене фрагменты пересчитываются
+    return get_content_hash(f"{PASSAGE_WORDS}:{PASSAGE_OVERLAP}:{post.text}")
+
+
+def are_passages_fresh(post, stored):
+    """stored — множество пар (модель, хэш) у сохранённых фрагментов статьи."""
+    if not (post.text or '').strip():
+        return not stored
+    return stored == {(MODEL_NAME, get_passages_hash(post))}
+
+
+def build_passages(post, vectors):
+    """Несохранённые фрагменты статьи по уже посчитанным векторам (в порядке split_post)."""
+    content_hash = get_passages_hash(post)
+    return [
+        PostPassage(
+            post=post, position=position, start=start, end=end,
+            model_name=MODEL_NAME, content_hash=content_hash, vector=vector_to_bytes(vector),
+        )
+        for position, ((start, end), vector) in enumerate(zip(split_post(post), vectors))
+    ]
+
+
+def split_post(post):
+    return split_passages(post.text, words=PASSAGE_WORDS, overlap=PASSAGE_OVERLAP)
+
+
+def update_post_passages(post):
+    """Нарезает полный текст статьи на фрагменты и кодирует их одним батчем, если текст изменился."""
+    stored = set(post.passages.values_list('model_name', 'content_hash').distinct())
+    if are_passages_fresh(post, stored):
+        return
+    # Фрагменты старого текста бесполезны, даже если новые сейчас посчитать нечем
+    post.passages.all().delete()
+    model = get_model()
+    spans = split_post(post)
+    if not model or not spans:
+        passage_index.remove_post(post.id)
+        return
+    vectors = model.encode([post.text[start:end] for start, end in spans])
+    passages = PostPassage.objects.bulk_create(build_passages(post, vectors))
+    if passage_index.loaded:
+        passage_index.replace_post(
+            post.id, [(p.id, p.start, p.end, vector) for p, vector in zip(passages, vectors)]
+        )
+
+
+def update_search_indexes(post):
+    """Обновляет статью во всех индексах поиска (лексическом, векторном и фрагментов)."""
+    if lexical_index.loaded:
+        lexical_index.upsert(post)
+    update_post_embedding(post)
+    update_post_passages(post)
+
+
+def remove_post_from_indexes(post_id):
+    index.remove(post_id)
+    lexical_index.remove(post_id)
+    passage_index.remove_post(post_id)
+
+
+def advance_corpus_version():
+    """
+    Увеличивает версию корпуса после изменения статьи.
+    Если между версиями не было чужих изменений, индексы этого процесса уже актуальны (обновлены сигналом).
+    Иначе (статью изменил и другой процесс) они перезагрузятся при следующем поиске.
+    """
+    version = bump_corpus_version()
+    for search_index in (index, lexical_index, passage_index):
+        if follows(version, search_index.version):
+            search_index.version = version
+
+
+def get_index(version=None):
+    """
+    Возвращает индекс, при первом обращении (или после чужих изменений) загружая его
+    из файла векторов и/или сохранённых в БД векторов.
+    Отсутствующие или устаревшие векторы пересчитываются одним батчем.
+    version — уже прочитанная версия корпуса (чтобы не читать её из БД ещё раз).
+    """
+    version = version or get_corpus_version()
+    if index.loaded and index.version == version:
+        return index
+    with _index_load_lock:
+        if index.loaded and index.version == version:
+            return index
+        store = _open_embedding_store()
+        if store is not None:
+            _load_index_from_store(store, version)
+        else:
+            # Полный текст статей не нужен — только заголовок и описание для проверки хэша
+            articles = Post.objects.select_related('embedding').defer('text')
+            index.load(_collect_vectors(articles).items(), version=version)
+    return index
+
+
+def _collect_vectors(articles):
+    """Векторы статей: актуальные из БД, остальные пересчитываются одним батчем."""
+    vectors = {}
+    stale = []
+    for art in articles:
+        embedding = get_stored_embedding(art)
+        if is_embedding_fresh(embedding, art):
+            vectors[art.id] = bytes_to_vector(embedding.vector)
+        else:
+            stale.append(art)
+    vectors.update(embed_posts(stale))
+    return vectors
+
+
+def _open_embedding_store():
+    try:
+        store = open_store(EMBEDDING_STORE_PATH)
+    except (OSError, ValueError) as e:
+        print(f"Ошибка чтения файла векторов: {e}")
+        return None
+    # Файл, записанный другой моделью, бесполезен
+    if store is not None and store.header.get('model') != MODEL_NAME:
+        return None
+    return store
+
+
+def _load_index_from_store(store, version):
+    """
+    Основа индекса — файл векторов. Из БД дочитываются только расхождения с ним:
+    новые статьи, векторы, обновлённые после записи файла, и удалённые статьи.
+    """
+    stored_ids = set(store.ids.tolist())
+    existing_ids = set(Post.objects.values_list('id', flat=True))
+    changed_ids = set(
+        PostEmbedding.objects.filter(updated_at__gt=store.header['created_at']).values_list('post_id', flat=True)
+    )
+    delta_ids = (existing_ids - stored_ids) | (changed_ids & existing_ids)
+    articles = Post.objects.select_related('embedding').defer('text').filter(id__in=delta_ids)
+    index.load(_collect_vectors(articles).items(), version=version, store=store)
+    for post_id in stored_ids - existing_ids:
+        index.remove(post_id)
+
+
+def get_lexical_index(version=None):
+    """Возвращает лексический индекс, при первом обращении (или после чужих изменений) строя его из БД."""
+    version = version or get_corpus_version()
+    if lexical_index.loaded and lexical_index.version == version:
+        return lexical_index
+    with _lexical_load_lock:
+        if not (lexical_index.loaded and lexical_index.version == version):
+            posts = Post.objects.only('id', 'title', 'excerpt', 'text').order_by().iterator(chunk_size=500)
+            lexical_index.load(posts, version=version)
+    return lexical_index
+
+
+def get_passage_index(version=None):
+    """Возвращает индекс фрагментов, при первом обращении (или после чужих изменений) читая их из БД."""
+    version = version or get_corpus_version()
+    if passage_index.loaded and passage_index.version == version:
+        return passage_index
+    with _passage_load_lock:
+        if not (passage_index.loaded and passage_index.version == version):
+            rows = (
+                PostPassage.objects.filter(model_name=MODEL_NAME)
+                .values_list('id', 'post_id', 'start', 'end', 'vector')
+                .order_by()
+                .iterator(chunk_size=2000)
+            )
+            passage_index.load(
+                ((pid, post_id, start, end, bytes_to_vector(vector)) for pid, post_id, start, end, vector in rows),
+                version=version,
+            )
+    return passage_index
 
-# Загружаем модель ОДИН РАЗ при запуске сервера (или первом импорте).
-# 'all-MiniLM-L6-v2' - это очень быстрая и легкая модель (около 80Мб), идеальная для CPU.
-# Она преобразует текст в вектор из 384 чисел.
-try:
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-except Exception as e:
-    print(f"Ошибка загрузки модели ИИ: {e}")
-    model = None
 
 def search_articles_semantically(query, top_k=3, threshold=0.25):
     """
-    Ищет статьи, описание (excerpt) которых по смыслу похоже на запрос (query).
+    Ищет статьи, похожие на запрос (query): сначала по словам (BM25), затем по смыслу
+    (заголовок с описанием и фрагменты полного текста).
     top_k: сколько статей вернуть максимум.
-    threshold: порог похожести (0..1), ниже которого статьи отсеиваются.
+    threshold: порог смыслового сходства (0..1), ниже которого статьи отсеиваются.
+    У найденных статей заполнен атрибут snippet — лучший фрагмент текста (или None).
     """
-    if not model:
-        return []
+    normalized = normalize_query(query)
+    # Версия читается из БД один раз на поиск и передаётся индексам
+    version = get_corpus_version()
+    result_key = (normalized, top_k, threshold, version)
+    ranked = result_cache.get(result_key)
 
-    # 1. Получаем все опубликованные статьи
-    # В продакшене векторы статей лучше хранить в БД (pgvector), но для <1000 статей так быстрее.
-    articles = list(Post.objects.all())
-    if not articles:
+    if ranked is None:
+        ranked = _rank_posts(normalized, top_k, threshold, version)
+        result_cache.set(result_key, ranked)
+
+    if not ranked:
         return []
 
-    # 2. Собираем тексты для анализа (заголовки + описания для лучшей точности)
-    article_texts = [f"{art.title}. {art.excerpt}" for art in articles]
+    # Из БД достаём только победителей (с тегами — одним запросом на всех), сохраняя порядок ранжирования
+    found = Post.objects.prefetch_related('tags').in_bulk([post_id for post_id, _ in ranked])
+    results = []
+    for post_id, span in ranked:
+        post = found.get(post_id)
+        if post is None:
+            continue
+        post.snippet = post.text[span[0]:span[1]] if span else None
+        results.append(post)
+    return results
+
 
-    # 3. Превращаем запрос и статьи в векторы (embeddings)
-    article_embeddings = model.encode(article_texts)
-    query_embedding = model.encode([query])
+def _rank_posts(normalized, top_k, threshold, version=None):
+    """Список пар (id статьи, границы лучшего фрагмента или None) по убыванию релевантности."""
+    terms = tokenize(normalized)
+    lexical_hits = get_lexical_index(version).search(terms, top_n=LEXICAL_CANDIDATES)
 
-    # 4. Считаем косинусное сходство (насколько векторы близки)
-    # Результат - массив чисел от -1 до 1
-    similarities = cosine_similarity(query_embedding, article_embeddings)[0]
+    # 1. Короткий запрос, все слова которого есть в лучших статьях, — модель не нужна
+    exact = [(post_id, None) for post_id, _, coverage in lexical_hits[:top_k] if coverage == 1.0]
+    if exact and len(set(terms)) <= LEXICAL_MAX_TERMS:
+        return exact
 
-    # 5. Сортируем результаты
-    # Получаем индексы от самых похожих к менее похожим
-    top_indices = np.argsort(similarities)[::-1]
+    # Без модели остаётся только лексический поиск
+    if not get_model():
+        return [(post_id, None) for post_id, _, _ in lexical_hits[:top_k]]
 
-    results = []
-    for idx in top_indices:
-        score = similarities[idx]
-        
-        # Если сходство ниже порога, перестаем искать
-        if score < threshold:
-            continue
-        
-        if len(results) >= top_k:
-            break
+    # 2. Модель кодирует только сам запрос (и только если его ещё нет в кэше)
+    query_embedding = query_embedding_cache.get((MODEL_NAME, normalized))
+    if query_embedding is None:
+        query_embedding = query_encoder.encode(normalized)
+        query_embedding_cache.set((MODEL_NAME, normalized), query_embedding)
+
+    # 3. Переранжируем по смыслу лексических кандидатов.
+    # Если среди них не набралось top_k подходящих (запрос сформулирован другими словами),
+    # сравниваем запрос со всеми статьями.
+    hits = []
+    if lexical_hits:
+        candidates = [post_id for post_id, _, _ in lexical_hits]
+        hits = _semantic_hits(query_embedding, top_k, threshold, candidates, version)
+    if len(hits) < top_k:
+        hits = _semantic_hits(query_embedding, top_k, threshold, version=version)
+    return hits
+
+
+def _semantic_hits(query_embedding, top_k, threshold, post_ids=None, version=None):
+    """
+    Оценка статьи — лучшее из сходства с заголовком+описанием и со фрагментами полного текста.
+    Лучший фрагмент возвращается как сниппет, даже если статья выиграла по заголовку.
+    """
+    scored = {
+        post_id: (score, None)
+        for post_id, score in get_index(version).search(query_embedding, top_k=top_k, threshold=threshold, ids=post_ids)
+    }
+    passages = get_passage_index(version).search(
+        query_embedding, top_k=top_k, threshold=threshold, post_ids=post_ids, candidates=PASSAGE_CANDIDATES
+    )
+    for post_id, (score, start, end) in passages.items():
+        head_score = scored.get(post_id, (score, None))[0]
+        scored[post_id] = (max(score, head_score), (start, end))
+    best = sorted(scored.items(), key=lambda item: item[1][0], reverse=True)[:top_k]
+    return [(post_id, span) for post_id, (_, span) in best]
 
-        # Добавляем статью в результаты
-        results.append(articles[idx])
 
-    return results
\ No newline at end of file
+def get_search_stats():
+    return {
+        'corpus_version': get_corpus_version(),
+        'lexical_index_size': len(lexical_index),
+        'vector_index_size': len(index),
+        'passage_index_size': len(passage_index),
+        'embedding_store': index.store.header if index.store is not None else None,
+        'query_embeddings': query_embedding_cache.stats(),
+        'results': result_cache.stats(),
+        'batching': query_encoder.stats(),
+    }
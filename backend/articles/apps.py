@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ArticlesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'articles'
+
+    def ready(self):
+        # Подключаем обработчики сигналов (обновление векторов для ИИ-поиска)
+        from . import signals  # noqa: F401
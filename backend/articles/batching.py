@@ -0,0 +1,96 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+
+
+class BatchingEncoder:
+    """
+    Очередь инференса, общая для всех потоков процесса.
+    Запросы, пришедшие почти одновременно, копятся до max_wait_ms миллисекунд
+    (или до max_batch_size штук) и кодируются моделью одним батчем.
+    Каждый вызывающий поток получает свой вектор через Future.
+    """
+
+    def __init__(self, get_model, max_batch_size=16, max_wait_ms=5):
+        self.get_model = get_model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0, max_wait_ms) / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.total_queue_delay = 0.0
+        self.max_queue_delay = 0.0
+
+    def _ensure_worker(self):
+        # Поток создаётся при первом запросе — уже после fork воркера веб-сервера
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='ai-search-encoder', daemon=True)
+                self._thread.start()
+
+    def encode(self, text, timeout=None):
+        """Кодирует один текст (в составе общего батча) и возвращает вектор."""
+        future = Future()
+        self._queue.put((text, future, time.monotonic()))
+        self._ensure_worker()
+        return future.result(timeout)
+
+    def _collect(self):
+        first = self._queue.get()
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                # Забираем то, что уже лежит в очереди, даже если время ожидания вышло
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.monotonic()
+            try:
+                model = self.get_model()
+                if model is None:
+                    raise RuntimeError("Модель ИИ не загружена")
+                vectors = np.asarray(model.encode([text for text, _, _ in batch]), dtype=np.float32)
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+            else:
+                for (_, future, _), vector in zip(batch, vectors):
+                    future.set_result(vector)
+            self._record(batch, started)
+
+    def _record(self, batch, started):
+        delays = [started - enqueued for _, _, enqueued in batch]
+        with self._stats_lock:
+            self.batches += 1
+            self.items += len(batch)
+            self.total_queue_delay += sum(delays)
+            self.max_queue_delay = max(self.max_queue_delay, max(delays))
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'batches': self.batches,
+                'items': self.items,
+                'avg_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0,
+                # Насколько в среднем заполнен батч относительно max_batch_size
+                'fill_rate': round(self.items / (self.batches * self.max_batch_size), 4) if self.batches else 0.0,
+                'avg_queue_delay_ms': round(self.total_queue_delay / self.items * 1000, 3) if self.items else 0.0,
+                'max_queue_delay_ms': round(self.max_queue_delay * 1000, 3),
+            }
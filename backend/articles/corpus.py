@@ -0,0 +1,94 @@
+import uuid
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from .models import CorpusVersion
+
+# Версия корпуса статей. Увеличивается при любом изменении статьи,
+# поэтому по ней можно точно (а не по таймауту) сбрасывать кэши поиска.
+# Хранится в БД (CorpusVersion), общей для всех процессов: увеличение — один UPDATE value = value + 1,
+# и процесс, изменивший статью, получает ровно свою новую версию. Если она на 1 больше версии его индексов,
+# других изменений между ними не было и индексы, уже обновлённые сигналом, перезагружать не нужно.
+# Версия — пара (метка строки, счётчик), см. CorpusVersion.
+CORPUS_VERSION_ID = 1
+
+# Версии ниже только сбрасывают кэши ответов, точный счётчик им не нужен. Они лежат в кэше Django,
+# общем для процессов (CACHES в settings), и новая версия — новое случайное значение:
+# запись ключа атомарна, а incr файлового кэша — чтение и запись, при одновременной правке он потерял бы шаг.
+# Версия того, что отдают список и карточки статей: меняется вместе с корпусом, а ещё при
+# изменении тегов. Отдельно от версии корпуса, чтобы правка тегов не перезагружала индексы поиска.
+CONTENT_VERSION_KEY = 'articles:content_version'
+
+
+def _new_version():
+    # Не совпадает ни с одной из прежних версий, в том числе если ключ потерялся (перезапуск, вытеснение)
+    return uuid.uuid4().hex
+
+
+def _get_version(key):
+    return cache.get_or_set(key, _new_version, timeout=None)
+
+
+def _bump_version(key):
+    version = _new_version()
+    cache.set(key, version, timeout=None)
+    return version
+
+
+def _corpus_row():
+    return CorpusVersion.objects.filter(pk=CORPUS_VERSION_ID)
+
+
+def _create_corpus_row():
+    try:
+        with transaction.atomic():
+            CorpusVersion.objects.create(pk=CORPUS_VERSION_ID)
+    except IntegrityError:
+        # Строку одновременно создал другой процесс
+        pass
+
+
+def get_corpus_version():
+    version = _corpus_row().values_list('epoch', 'value').first()
+    if version is None:
+        _create_corpus_row()
+        version = _corpus_row().values_list('epoch', 'value').get()
+    return version
+
+
+def bump_corpus_version():
+    """Увеличивает версию корпуса на 1 и возвращает новое значение."""
+    with transaction.atomic():
+        if not _corpus_row().update(value=F('value') + 1):
+            _create_corpus_row()
+            _corpus_row().update(value=F('value') + 1)
+        # Строка заблокирована UPDATE до конца транзакции — читаем своё значение, а не чужое
+        return _corpus_row().values_list('epoch', 'value').get()
+
+
+def follows(version, previous):
+    """Следующая ли version за previous (ровно одно изменение корпуса между ними)."""
+    return previous is not None and version == (previous[0], previous[1] + 1)
+
+
+def get_content_version():
+    return _get_version(CONTENT_VERSION_KEY)
+
+
+def bump_content_version():
+    """Меняет версию содержимого статей (для ETag и кэша ответов) и возвращает новое значение."""
+    return _bump_version(CONTENT_VERSION_KEY)
+
+
+# Версия отдельной статьи: меняется при правке самой статьи, её тегов или тега, который у неё стоит.
+# По ней кэшируется карточка статьи — правка одной статьи не сбрасывает закэшированные карточки остальных.
+ARTICLE_VERSION_KEY = 'articles:article_version:{}'
+
+
+def get_article_version(post_id):
+    return _get_version(ARTICLE_VERSION_KEY.format(post_id))
+
+
+def bump_article_versions(post_ids):
+    for post_id in set(post_ids):
+        _bump_version(ARTICLE_VERSION_KEY.format(post_id))
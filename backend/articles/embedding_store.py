@@ -0,0 +1,142 @@
+import json
+import os
+import struct
+import tempfile
+import numpy as np
+
+# Файл с векторами статей, который все процессы сервера открывают через mmap (только чтение),
+# поэтому в памяти лежит одна копия в page cache на всю машину.
+#
+# Формат (все секции выровнены по 64 байта):
+#   MAGIC (8 байт) | длина заголовка (uint32, little-endian) | заголовок JSON
+#   ids     int64[count]
+#   scales  float32[count]        — только для int8: множитель каждого вектора
+#   vectors float16|int8[count, dim]
+MAGIC = b'PSYEMB1\n'
+ALIGNMENT = 64
+BLOCK_ROWS = 8192
+DTYPES = ('float16', 'int8')
+
+
+def _aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def quantize(vectors, dtype):
+    """Возвращает (квантованные векторы, множители или None)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == 'float16':
+        return vectors.astype(np.float16), None
+    if dtype == 'int8':
+        scales = np.abs(vectors).max(axis=1) / 127 if len(vectors) else np.empty(0, dtype=np.float32)
+        scales = np.where(scales > 0, scales, 1).astype(np.float32)
+        quantized = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return quantized, scales
+    raise ValueError(f"Неизвестный тип векторов: {dtype}")
+
+
+def write_store(path, ids, vectors, dtype='int8', **header):
+    """
+    Записывает файл векторов атомарно: сначала во временный файл рядом, затем os.replace.
+    Процессы, уже открывшие старый файл, продолжают читать его до переоткрытия.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    count = ids.shape[0]
+    dim = vectors.shape[1] if count else int(header.pop('dim', 0))
+    quantized, scales = quantize(vectors.reshape(count, dim), dtype)
+
+    header = dict(header, dim=dim, count=count, dtype=dtype)
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.embeddings-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<I', len(header_bytes)))
+            f.write(header_bytes)
+            sections = [ids] + ([scales] if scales is not None else []) + [quantized]
+            for section in sections:
+                f.write(b'\0' * (_aligned(f.tell()) - f.tell()))
+                f.write(np.ascontiguousarray(section).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class EmbeddingStore:
+    """Открытый только для чтения файл векторов. Массивы — np.memmap поверх файла."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path}: не файл векторов статей")
+            (header_length,) = struct.unpack('<I', f.read(4))
+            self.header = json.loads(f.read(header_length).decode('utf-8'))
+            offset = f.tell()
+
+        self.dim = self.header['dim']
+        self.count = self.header['count']
+        self.dtype = self.header['dtype']
+        if self.dtype not in DTYPES:
+            raise ValueError(f"{path}: неизвестный тип векторов {self.dtype}")
+
+        offset = _aligned(offset)
+        self.ids = self._map(np.int64, offset, (self.count,))
+        offset = _aligned(offset + self.count * 8)
+        self.scales = None
+        if self.dtype == 'int8':
+            self.scales = self._map(np.float32, offset, (self.count,))
+            offset = _aligned(offset + self.count * 4)
+        self.vectors = self._map(np.dtype(self.dtype), offset, (self.count, self.dim))
+
+    def _map(self, dtype, offset, shape):
+        if not shape[0]:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(self.path, dtype=dtype, mode='r', offset=offset, shape=shape)
+
+    def __len__(self):
+        return self.count
+
+    def scores(self, query, rows=None):
+        """
+        Скалярные произведения запроса (float32) со всеми векторами файла или со строками rows.
+        Квантованные векторы переводятся в float32 блоками, чтобы не держать в памяти копию всего файла.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        vectors = self.vectors if rows is None else self.vectors[rows]
+        scales = self.scales if rows is None or self.scales is None else self.scales[rows]
+        result = np.empty(vectors.shape[0], dtype=np.float32)
+        for start in range(0, vectors.shape[0], BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + BLOCK_ROWS], dtype=np.float32)
+            result[start:start + BLOCK_ROWS] = block @ query
+        if scales is not None:
+            result *= scales
+        return result
+
+
+def open_store(path):
+    """Открывает файл векторов или возвращает None, если файла нет."""
+    if not path or not os.path.exists(path):
+        return None
+    return EmbeddingStore(path)
+
+
+def recall_at_k(exact_matrix, approx_scores_fn, queries, k=10):
+    """
+    Доля статей из точного top-k (float32), которые попали и в top-k по квантованным векторам.
+    approx_scores_fn(query) должна возвращать оценки для всех строк exact_matrix.
+    """
+    hits = 0
+    for query in queries:
+        exact_top = set(np.argpartition(-(exact_matrix @ query), k - 1)[:k])
+        approx_top = set(np.argpartition(-approx_scores_fn(query), k - 1)[:k])
+        hits += len(exact_top & approx_top)
+    return hits / (len(queries) * k) if len(queries) else 1.0
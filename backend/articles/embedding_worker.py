@@ -0,0 +1,19 @@
+# Функции для пула процессов команды embed_articles.
+# Модуль намеренно не импортирует Django: дочерний процесс загружает только модель ИИ.
+import numpy as np
+
+_model = None
+
+
+def init_worker(model_name):
+    global _model
+    from .stub_encoder import STUB_MODEL_NAME, HashingEncoder
+    if model_name == STUB_MODEL_NAME:
+        _model = HashingEncoder()
+        return
+    from sentence_transformers import SentenceTransformer
+    _model = SentenceTransformer(model_name)
+
+
+def encode_batch(texts):
+    return np.asarray(_model.encode(texts), dtype=np.float32)
@@ -0,0 +1,68 @@
+import gc
+import threading
+import time
+from django.conf import settings
+from .stub_encoder import STUB_MODEL_NAME, HashingEncoder
+
+# Имя модели сохраняется вместе с вектором: при смене модели все старые векторы считаются устаревшими.
+# 'all-MiniLM-L6-v2' - это очень быстрая и легкая модель (около 80Мб), идеальная для CPU.
+# Она преобразует текст в вектор из 384 чисел.
+MODEL_NAME = getattr(settings, 'AI_SEARCH_MODEL', 'all-MiniLM-L6-v2')
+
+# AI_SEARCH_ENCODER = 'stub' подменяет модель детерминированной заглушкой (бенчмарки и тесты без весов модели).
+# У заглушки своё имя, чтобы её векторы не смешивались с векторами настоящей модели.
+USE_STUB_ENCODER = getattr(settings, 'AI_SEARCH_ENCODER', 'model') == 'stub'
+if USE_STUB_ENCODER:
+    MODEL_NAME = STUB_MODEL_NAME
+
+# Модель загружается лениво, при первом обращении: импорт torch и загрузка весов
+# занимают секунды и сотни мегабайт, а большинству процессов (миграции, тесты, команды) модель не нужна.
+_model = None
+_load_failed = False
+_lock = threading.Lock()
+
+
+def get_model(retry=False):
+    """
+    Возвращает модель, загружая её при первом вызове.
+    Если загрузка не удалась, возвращает None и больше не пытается (кроме retry=True).
+    """
+    global _model, _load_failed
+    if _model is not None or (_load_failed and not retry):
+        return _model
+    with _lock:
+        if _model is None and (not _load_failed or retry):
+            try:
+                if USE_STUB_ENCODER:
+                    _model = HashingEncoder()
+                else:
+                    from sentence_transformers import SentenceTransformer
+                    _model = SentenceTransformer(MODEL_NAME)
+                _load_failed = False
+            except Exception as e:
+                print(f"Ошибка загрузки модели ИИ: {e}")
+                _load_failed = True
+    return _model
+
+
+def is_loaded():
+    return _model is not None
+
+
+def warm_up(run_inference=True):
+    """
+    Заранее загружает модель, чтобы первый пользовательский запрос не платил за загрузку.
+    run_inference=False — только веса, без прогона (нужно в мастер-процессе перед fork:
+    пулы потоков torch, запущенные до fork, могут зависнуть в дочерних процессах).
+    Возвращает время загрузки в секундах или None, если модель недоступна.
+    """
+    started = time.monotonic()
+    model = get_model(retry=True)
+    if model is None:
+        return None
+    if run_inference:
+        model.encode(["прогрев"])
+    # Загруженные объекты больше не трогает сборщик мусора,
+    # поэтому после fork их страницы памяти остаются общими с родителем
+    gc.freeze()
+    return time.monotonic() - started
@@ -0,0 +1,140 @@
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+
+# Частые служебные слова, которые ничего не говорят о теме статьи
+STOP_WORDS = frozenset("""
+и в во не что он на я с со как а то все она так его но да ты к у же вы за бы по только ее мне было
+вот от меня еще нет о из ему теперь когда даже ну ли если уже или ни быть был него до вас нибудь
+опять уж вам ведь там потом себя ничего ей может они тут где есть надо ней для мы тебя их чем была
+сам чтоб без будто чего раз тоже себе под будет ж тогда кто этот того потому этого какой совсем ним
+здесь этом один почти мой тем чтобы нее сейчас были куда зачем всех никогда можно при наконец два
+об другой хоть после над больше тот через эти нас про всего них какая много разве три эту моя
+впрочем хорошо свою этой перед иногда лучше чуть том нельзя такой им более всегда конечно всю между
+очень это
+""".split())
+
+# Окончания русских слов (от длинных к коротким). Отрезаем одно окончание,
+# чтобы «учёба», «учёбы» и «учёбе» попадали в один термин.
+ENDINGS = sorted("""
+иями ями ами ьми ыми ими ого его ому ему ешь ете ите ишь ость остью ости ение ения ении ением
+ой ей ый ий ая яя ое ее ую юю ых их ым им ом ем ов ев ам ям ах ях ию ия ие ии ью ет ют ут ит ят ат
+ла ли ло ть а я о е у ю ы и й ь л
+""".split(), key=len, reverse=True)
+
+MIN_STEM_LENGTH = 3
+WORD_RE = re.compile(r'\w+')
+
+
+def stem(word):
+    if word.endswith(('ся', 'сь')) and len(word) - 2 >= MIN_STEM_LENGTH:
+        word = word[:-2]
+    for ending in ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM_LENGTH:
+            return word[:-len(ending)]
+    return word
+
+
+def tokenize(text):
+    """Разбивает текст на термины: нижний регистр, ё -> е, без стоп-слов, с отрезанными окончаниями."""
+    words = WORD_RE.findall(text.lower().replace('ё', 'е'))
+    return [stem(word) for word in words if len(word) > 1 and word not in STOP_WORDS and not word.isdigit()]
+
+
+class LexicalIndex:
+    """
+    Инвертированный индекс статей с ранжированием BM25.
+    Для каждого термина хранится словарь {id статьи: сколько раз термин встретился}.
+    Заголовок и описание весят больше полного текста (их термины учитываются несколько раз).
+    """
+
+    FIELD_WEIGHTS = {'title': 3, 'excerpt': 2, 'text': 1}
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._postings = {}  # термин -> {id статьи: частота}
+        self._doc_terms = {}  # id статьи -> Counter терминов (нужен, чтобы убрать старые записи)
+        self._doc_lengths = {}
+        self._total_length = 0
+        self.loaded = False
+        # Версия корпуса, которой соответствует содержимое индекса
+        self.version = None
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    @classmethod
+    def post_terms(cls, post):
+        terms = Counter()
+        for field, weight in cls.FIELD_WEIGHTS.items():
+            for term in tokenize(getattr(post, field) or ''):
+                terms[term] += weight
+        return terms
+
+    def load(self, posts, version=None):
+        """Строит индекс с нуля по итератору статей."""
+        with self._lock:
+            self._postings = {}
+            self._doc_terms = {}
+            self._doc_lengths = {}
+            self._total_length = 0
+            for post in posts:
+                self._add(post.id, self.post_terms(post))
+            self.version = version
+            self.loaded = True
+
+    def _add(self, post_id, terms):
+        for term, count in terms.items():
+            self._postings.setdefault(term, {})[post_id] = count
+        self._doc_terms[post_id] = terms
+        length = sum(terms.values())
+        self._doc_lengths[post_id] = length
+        self._total_length += length
+
+    def remove(self, post_id):
+        with self._lock:
+            terms = self._doc_terms.pop(post_id, None)
+            if terms is None:
+                return
+            for term in terms:
+                postings = self._postings[term]
+                del postings[post_id]
+                if not postings:
+                    del self._postings[term]
+            self._total_length -= self._doc_lengths.pop(post_id)
+
+    def upsert(self, post):
+        """Добавляет или заменяет статью (нужны поля title, excerpt и text)."""
+        terms = self.post_terms(post)
+        with self._lock:
+            self.remove(post.id)
+            self._add(post.id, terms)
+
+    def search(self, query_terms, top_n=50):
+        """
+        Возвращает до top_n троек (id статьи, оценка BM25, доля терминов запроса, найденных в статье),
+        отсортированных по убыванию оценки.
+        """
+        query_terms = set(query_terms)
+        with self._lock:
+            docs = len(self._doc_terms)
+            if not docs or not query_terms:
+                return []
+            avg_length = self._total_length / docs
+            scores = {}
+            matched = Counter()
+            for term in query_terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for post_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[post_id] / avg_length)
+                    scores[post_id] = scores.get(post_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+                    matched[post_id] += 1
+        ranked = heapq.nlargest(top_n, scores.items(), key=lambda item: item[1])
+        return [(post_id, score, matched[post_id] / len(query_terms)) for post_id, score in ranked]
@@ -0,0 +1,72 @@
+import time
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from articles import ai_search
+from articles.corpus import get_corpus_version, bump_corpus_version
+from articles.embedding_store import DTYPES, EmbeddingStore, recall_at_k, write_store
+from articles.models import PostEmbedding
+
+
+class Command(BaseCommand):
+    help = (
+        "Записывает актуальные векторы статей в общий файл (float16 или int8), "
+        "который процессы сервера открывают через mmap. Печатает потерю recall@k относительно float32."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=getattr(settings, 'AI_SEARCH_EMBEDDING_STORE', None), help="Куда записать файл")
+        parser.add_argument('--dtype', choices=DTYPES, default='int8', help="Формат хранения векторов")
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Сколько строк читать из БД за один запрос")
+        parser.add_argument('--recall-k', type=int, default=10, help="k для оценки recall@k")
+        parser.add_argument('--recall-queries', type=int, default=200, help="Сколько случайных запросов для оценки recall (0 — не оценивать)")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not path:
+            raise CommandError("Не задан путь к файлу (--path или AI_SEARCH_EMBEDDING_STORE)")
+
+        # Время фиксируем до чтения: всё, что изменится позже, процессы дочитают из БД
+        created_at = timezone.now()
+        version = get_corpus_version()
+        started = time.monotonic()
+
+        ids, vectors, skipped = [], [], 0
+        embeddings = (
+            PostEmbedding.objects.filter(model_name=ai_search.MODEL_NAME)
+            .select_related('post').defer('post__text').order_by('post_id')
+        )
+        for embedding in embeddings.iterator(chunk_size=options['chunk_size']):
+            # Устаревшие векторы в файл не пишем — индекс пересчитает их сам
+            if not ai_search.is_embedding_fresh(embedding, embedding.post):
+                skipped += 1
+                continue
+            vector = ai_search.bytes_to_vector(embedding.vector)
+            norm = np.linalg.norm(vector)
+            ids.append(embedding.post_id)
+            vectors.append(vector / norm if norm else vector)
+
+        matrix = np.vstack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+        write_store(
+            path, ids, matrix, dtype=options['dtype'],
+            model=ai_search.MODEL_NAME, created_at=created_at.isoformat(), corpus_version=version,
+        )
+        # Индексы во всех процессах переоткроют файл
+        bump_corpus_version()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Записано векторов: {len(ids)} ({options['dtype']}), пропущено устаревших: {skipped}, "
+            f"файл: {path}, время: {time.monotonic() - started:.1f} с"
+        ))
+
+        k = min(options['recall_k'], len(ids))
+        if options['recall_queries'] and k:
+            store = EmbeddingStore(path)
+            # Запросы — смеси случайных пар статей, похожие на реальные запросы «между темами»
+            rng = np.random.default_rng(0)
+            pairs = rng.integers(0, len(ids), size=(options['recall_queries'], 2))
+            queries = matrix[pairs[:, 0]] + matrix[pairs[:, 1]]
+            queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+            recall = recall_at_k(matrix, store.scores, queries, k=k)
+            self.stdout.write(f"recall@{k} относительно float32: {recall:.4f} (потеря {1 - recall:.4f})")
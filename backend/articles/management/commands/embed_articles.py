@@ -0,0 +1,190 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from articles import ai_search
+from articles.corpus import bump_corpus_version
+from articles.embedding_worker import init_worker, encode_batch
+from articles.models import Post, PostEmbedding, PostPassage
+
+
+def upsert_options(unique_fields, update_fields):
+    """
+    Параметры bulk_create для «вставить или обновить».
+    MySQL (ON DUPLICATE KEY UPDATE) срабатывает на любой уникальный ключ и не принимает unique_fields,
+    SQLite и PostgreSQL (ON CONFLICT (...)) без них не работают.
+    """
+    options = {'update_conflicts': True, 'update_fields': update_fields}
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = unique_fields
+    return options
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает векторы статей для ИИ-поиска (заголовок+описание и фрагменты полного текста). "
+        "Статьи читаются потоком, кодируются батчами (при желании в нескольких процессах) "
+        "и записываются в БД пачками."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=64, help="Сколько текстов кодировать за один вызов модели")
+        parser.add_argument('--chunk-size', type=int, default=500, help="Сколько строк читать из БД за один запрос")
+        parser.add_argument('--workers', type=int, default=0, help="Число процессов для кодирования (0 — в текущем процессе)")
+        parser.add_argument('--force', action='store_true', help="Пересчитать и актуальные векторы")
+        parser.add_argument('--skip-passages', action='store_true', help="Не нарезать и не кодировать фрагменты полного текста")
+        parser.add_argument('--dry-run', action='store_true', help="Только посчитать векторы и скорость, ничего не записывать")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        chunk_size = options['chunk_size']
+        self.workers = options['workers']
+        self.force = options['force']
+        self.dry_run = options['dry_run']
+        if batch_size <= 0:
+            raise CommandError("--batch-size должен быть больше нуля")
+        if not self.workers and not ai_search.get_model():
+            raise CommandError("Модель ИИ не загружена")
+
+        self.total = Post.objects.count()
+        self.seen = self.skipped = self.encoded = 0
+        self.texts_encoded = 0
+        self.encode_seconds = 0.0
+        self.started = time.monotonic()
+
+        self.pool = None
+        if self.workers:
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=init_worker, initargs=(ai_search.MODEL_NAME,)
+            )
+        try:
+            self._encode_all(self._pending_posts(batch_size, chunk_size), self._save_embeddings)
+            self._report("Заголовки и описания")
+            if not options['skip_passages']:
+                self.seen = self.skipped = self.encoded = 0
+                self._encode_all(self._pending_passages(batch_size, chunk_size), self._save_passages)
+                self._report("Фрагменты текста")
+        finally:
+            if self.pool:
+                self.pool.shutdown()
+
+        if self.texts_encoded and not self.dry_run:
+            # Индексы поиска во всех процессах перечитают векторы
+            bump_corpus_version()
+
+        elapsed = time.monotonic() - self.started
+        rate = self.texts_encoded / elapsed if elapsed else 0.0
+        encode_rate = self.texts_encoded / self.encode_seconds if self.encode_seconds else 0.0
+        prefix = "[dry-run] " if self.dry_run else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Закодировано текстов: {self.texts_encoded}, время: {elapsed:.1f} с, скорость: {rate:.1f} текстов/с"
+            + (f" (только модель: {encode_rate:.1f} текстов/с)" if not self.workers else "")
+        ))
+
+    def _report(self, stage):
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(
+            f"{stage}: закодировано статей {self.encoded}, пропущено актуальных {self.skipped}, "
+            f"{self.encoded / elapsed if elapsed else 0.0:.1f} статей/с"
+        )
+
+    def _progress(self):
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(
+            f"{self.seen}/{self.total}: закодировано {self.encoded}, пропущено {self.skipped}, "
+            f"{self.encoded / elapsed if elapsed else 0.0:.1f} статей/с"
+        )
+
+    def _pending_posts(self, batch_size, chunk_size):
+        """Читает статьи потоком и отдаёт батчи (статьи, тексты) тех, чей вектор нужно пересчитать."""
+        queryset = Post.objects.select_related('embedding').defer('text').order_by('id')
+        batch = []
+        for post in queryset.iterator(chunk_size=chunk_size):
+            self.seen += 1
+            if not self.force and ai_search.is_embedding_fresh(ai_search.get_stored_embedding(post), post):
+                self.skipped += 1
+                continue
+            batch.append(post)
+            if len(batch) >= batch_size:
+                yield batch, [ai_search.get_embedding_text(p) for p in batch]
+                batch = []
+        if batch:
+            yield batch, [ai_search.get_embedding_text(p) for p in batch]
+
+    def _pending_passages(self, batch_size, chunk_size):
+        """
+        Отдаёт батчи (статьи, тексты их фрагментов) для статей, чьи фрагменты устарели.
+        Батч набирается, пока в нём не станет batch_size фрагментов.
+        """
+        stored = {}
+        for post_id, model_name, content_hash in (
+            PostPassage.objects.values_list('post_id', 'model_name', 'content_hash').distinct().order_by()
+        ):
+            stored.setdefault(post_id, set()).add((model_name, content_hash))
+
+        posts, texts = [], []
+        for post in Post.objects.only('id', 'text').order_by('id').iterator(chunk_size=chunk_size):
+            self.seen += 1
+            if not self.force and ai_search.are_passages_fresh(post, stored.get(post.id, set())):
+                self.skipped += 1
+                continue
+            posts.append(post)
+            texts.extend(post.text[start:end] for start, end in ai_search.split_post(post))
+            if len(texts) >= batch_size:
+                yield posts, texts
+                posts, texts = [], []
+        if posts:
+            yield posts, texts
+
+    def _encode_all(self, batches, save):
+        if self.pool is None:
+            model = ai_search.get_model()
+            for items, texts in batches:
+                started = time.monotonic()
+                vectors = model.encode(texts) if texts else []
+                self.encode_seconds += time.monotonic() - started
+                save(items, texts, vectors)
+            return
+
+        # Держим в работе не больше двух батчей на процесс, чтобы не читать всю таблицу в память
+        in_flight = []
+        for items, texts in batches:
+            in_flight.append((items, texts, self.pool.submit(encode_batch, texts)))
+            if len(in_flight) >= self.workers * 2:
+                items, texts, future = in_flight.pop(0)
+                save(items, texts, future.result())
+        for items, texts, future in in_flight:
+            save(items, texts, future.result())
+
+    def _save_embeddings(self, posts, texts, vectors):
+        self.encoded += len(posts)
+        self.texts_encoded += len(texts)
+        if not self.dry_run:
+            PostEmbedding.objects.bulk_create(
+                [
+                    PostEmbedding(
+                        post=post,
+                        model_name=ai_search.MODEL_NAME,
+                        content_hash=ai_search.get_content_hash(text),
+                        vector=ai_search.vector_to_bytes(vector),
+                    )
+                    for post, text, vector in zip(posts, texts, vectors)
+                ],
+                **upsert_options(['post'], ['model_name', 'content_hash', 'vector', 'updated_at']),
+            )
+        self._progress()
+
+    def _save_passages(self, posts, texts, vectors):
+        self.encoded += len(posts)
+        self.texts_encoded += len(texts)
+        if not self.dry_run:
+            # Векторы идут подряд в порядке статей и их фрагментов
+            passages, offset = [], 0
+            for post in posts:
+                count = len(ai_search.split_post(post))
+                passages.extend(ai_search.build_passages(post, vectors[offset:offset + count]))
+                offset += count
+            with transaction.atomic():
+                PostPassage.objects.filter(post__in=posts).delete()
+                PostPassage.objects.bulk_create(passages)
+        self._progress()
@@ -0,0 +1,66 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from articles.models import Post
+from chat.censor import WordFilter
+from chat.moderation import describe_spans
+from articles.moderation import find_banned_many
+
+FIELDS = ['title', 'excerpt', 'text']
+
+
+class Command(BaseCommand):
+    help = (
+        "Проверяет все статьи (заголовок, описание и полный текст) на запрещённые слова. "
+        "Статьи читаются из БД потоком и проверяются пачками; с --mask найденное заменяется звёздочками."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help="Сколько статей читать из БД и проверять за раз")
+        parser.add_argument('--mask', action='store_true', help="Заменить найденные слова звёздочками и сохранить статьи")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size <= 0:
+            raise CommandError("--chunk-size должен быть больше нуля")
+        self.mask = options['mask']
+
+        self.checked = self.flagged = self.chars = 0
+        started = time.monotonic()
+        chunk = []
+        for post in Post.objects.only('id', *FIELDS).order_by('id').iterator(chunk_size=chunk_size):
+            chunk.append(post)
+            if len(chunk) >= chunk_size:
+                self._check(chunk)
+                chunk = []
+        if chunk:
+            self._check(chunk)
+
+        elapsed = time.monotonic() - started
+        rate = self.checked / elapsed if elapsed else 0.0
+        action = "исправлено" if self.mask else "найдено"
+        self.stdout.write(self.style.SUCCESS(
+            f"Проверено статей: {self.checked}, {action} с запрещёнными словами: {self.flagged}, "
+            f"время: {elapsed:.1f} с, {rate:.1f} статей/с, {self.chars / elapsed / 1e6 if elapsed else 0.0:.2f} млн символов/с"
+        ))
+
+    def _check(self, posts):
+        texts = [getattr(post, field) or '' for post in posts for field in FIELDS]
+        found = find_banned_many(texts)
+        self.checked += len(posts)
+        self.chars += sum(map(len, texts))
+
+        for index, post in enumerate(posts):
+            spans = dict(zip(FIELDS, found[index * len(FIELDS):(index + 1) * len(FIELDS)]))
+            dirty = [field for field in FIELDS if spans[field]]
+            if not dirty:
+                continue
+            self.flagged += 1
+            for field in dirty:
+                self.stdout.write(
+                    f"Статья {post.id}, {field}: {describe_spans(getattr(post, field), spans[field])}"
+                )
+            if self.mask:
+                for field in dirty:
+                    setattr(post, field, WordFilter.mask_spans(getattr(post, field), spans[field]))
+                # Через save, чтобы сигналы обновили индексы поиска
+                post.save(update_fields=dirty)
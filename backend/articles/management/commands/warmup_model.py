@@ -0,0 +1,24 @@
+import resource
+from django.core.management.base import BaseCommand, CommandError
+from articles import encoder
+from articles.ai_search import get_index
+
+
+def _max_rss_mb():
+    # На Linux ru_maxrss в килобайтах
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    help = "Загружает модель ИИ-поиска и индекс статей, печатает время загрузки и пиковую память процесса."
+
+    def handle(self, *args, **options):
+        rss_before = _max_rss_mb()
+        seconds = encoder.warm_up()
+        if seconds is None:
+            raise CommandError("Модель ИИ не загружена")
+        articles = len(get_index())
+        self.stdout.write(self.style.SUCCESS(
+            f"Модель {encoder.MODEL_NAME} загружена за {seconds:.2f} с, статей в индексе: {articles}, "
+            f"пиковая память: {rss_before:.0f} -> {_max_rss_mb():.0f} МБ"
+        ))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostEmbedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=100, verbose_name='Модель')),
+                ('content_hash', models.CharField(max_length=64, verbose_name='Хэш текста')),
+                ('vector', models.BinaryField(verbose_name='Вектор')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='embedding', to='articles.post', verbose_name='Статья')),
+            ],
+            options={
+                'verbose_name': 'Вектор статьи',
+                'verbose_name_plural': 'Векторы статей',
+            },
+        ),
+    ]
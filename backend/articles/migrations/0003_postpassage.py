@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0002_postembedding'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostPassage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField(verbose_name='Номер фрагмента')),
+                ('start', models.PositiveIntegerField(verbose_name='Начало')),
+                ('end', models.PositiveIntegerField(verbose_name='Конец')),
+                ('model_name', models.CharField(max_length=100, verbose_name='Модель')),
+                ('content_hash', models.CharField(max_length=64, verbose_name='Хэш текста')),
+                ('vector', models.BinaryField(verbose_name='Вектор')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='passages', to='articles.post', verbose_name='Статья')),
+            ],
+            options={
+                'verbose_name': 'Фрагмент статьи',
+                'verbose_name_plural': 'Фрагменты статей',
+                'ordering': ['post', 'position'],
+                'unique_together': {('post', 'position')},
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:06
+
+import articles.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0004_post_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorpusVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('epoch', models.CharField(default=articles.models._new_epoch, max_length=32, verbose_name='Метка')),
+                ('value', models.PositiveBigIntegerField(default=0, verbose_name='Счётчик')),
+            ],
+            options={
+                'verbose_name': 'Версия корпуса статей',
+                'verbose_name_plural': 'Версии корпуса статей',
+            },
+        ),
+    ]
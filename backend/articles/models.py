@@ -1,3 +1,4 @@
+import uuid
 from django.db import models
 
 # Модель для Тегов (Учёба, Стресс, Семья и т.д.)
@@ -28,9 +29,73 @@ class Post(models.Model):
         verbose_name_plural = "Статьи"
         # Сортировка по умолчанию: новые сверху
         ordering = ['-created_at'] 
+        # Постраничный список идёт по (created_at, id) от новых к старым (articles/pagination.py)
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='post_created_id'),
+        ]
         permissions = [
             ("add_posts", "Can add and edit posts"),
         ]
         
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return self.title
+
+# Сохранённый вектор статьи для ИИ-поиска.
+# Храним вместе с именем модели и хэшем текста, чтобы понимать, когда вектор устарел.
+class PostEmbedding(models.Model):
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, related_name='embedding', verbose_name="Статья")
+    model_name = models.CharField(max_length=100, verbose_name="Модель")
+    content_hash = models.CharField(max_length=64, verbose_name="Хэш текста")
+    # Сырые байты массива float32
+    vector = models.BinaryField(verbose_name="Вектор")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Вектор статьи"
+        verbose_name_plural = "Векторы статей"
+
+    def __str__(self):
+        return f"Вектор статьи {self.post_id} ({self.model_name})"
+
+
+# Фрагмент полного текста статьи со своим вектором: поиск находит статью
+# по любому месту текста и показывает найденный фрагмент.
+class PostPassage(models.Model):
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='passages', verbose_name="Статья")
+    position = models.PositiveIntegerField(verbose_name="Номер фрагмента")
+    # Границы фрагмента в Post.text (в символах)
+    start = models.PositiveIntegerField(verbose_name="Начало")
+    end = models.PositiveIntegerField(verbose_name="Конец")
+    model_name = models.CharField(max_length=100, verbose_name="Модель")
+    # Хэш полного текста статьи (вместе с параметрами нарезки), по которому нарезаны фрагменты
+    content_hash = models.CharField(max_length=64, verbose_name="Хэш текста")
+    vector = models.BinaryField(verbose_name="Вектор")
+
+    class Meta:
+        verbose_name = "Фрагмент статьи"
+        verbose_name_plural = "Фрагменты статей"
+        ordering = ['post', 'position']
+        unique_together = ('post', 'position')
+
+    def __str__(self):
+        return f"Фрагмент {self.position} статьи {self.post_id}"
+
+
+def _new_epoch():
+    return uuid.uuid4().hex
+
+
+# Версия корпуса статей (articles/corpus.py): одна строка, счётчик увеличивается атомарно (UPDATE value = value + 1),
+# поэтому процесс, изменивший статью, точно знает, не было ли между его версиями чужих изменений.
+# epoch — случайная метка строки: если строку создадут заново (новая база, восстановление из копии),
+# версии не совпадут ни с одной из прежних, даже когда счётчик начнётся с нуля.
+class CorpusVersion(models.Model):
+    epoch = models.CharField(max_length=32, default=_new_epoch, verbose_name="Метка")
+    value = models.PositiveBigIntegerField(default=0, verbose_name="Счётчик")
+
+    class Meta:
+        verbose_name = "Версия корпуса статей"
+        verbose_name_plural = "Версии корпуса статей"
+
+    def __str__(self):
+        return f"Версия корпуса {self.epoch}:{self.value}"
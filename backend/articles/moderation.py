@@ -0,0 +1,17 @@
+import os
+from django.conf import settings
+from chat.censor import WordFilter
+from chat.moderation import CENSORED_WORDS_FILE
+
+# Статьи проверяются по тому же списку, что и чат, кроме слов из allowed_words.txt:
+# в статьях психолога это обычные слова и медицинские термины («член семьи», «аборт»),
+# а в чате — ругательства. Список разрешённых слов подхватывается без перезапуска, как и основной
+word_filter = WordFilter(
+    CENSORED_WORDS_FILE,
+    getattr(settings, 'ARTICLE_ALLOWED_WORDS_FILE', os.path.join(os.path.dirname(__file__), 'allowed_words.txt')),
+)
+
+
+def find_banned_many(texts):
+    """Запрещённые в статьях слова для пачки текстов: для каждого список (начало, конец)."""
+    return word_filter.find_all_many([text if isinstance(text, str) else '' for text in texts])
@@ -0,0 +1,30 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+# Постраничный список статей.
+# По умолчанию — курсор (?cursor=...): следующая страница выбирается условием по индексу (created_at, id),
+# без COUNT и OFFSET, поэтому стоит одинаково и на первой странице, и на сотой, и при любом размере базы.
+# С ?page=N — обычные номера страниц с общим числом статей (count): ради него лишний COUNT(*).
+
+PAGE_SIZE = getattr(settings, 'ARTICLES_PAGE_SIZE', 12)
+MAX_PAGE_SIZE = 100
+
+
+class ArticleCursorPagination(CursorPagination):
+    page_size = PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+    # id — чтобы порядок статей с одинаковым временем создания был однозначным
+    ordering = ('-created_at', '-id')
+
+
+class ArticlePagePagination(PageNumberPagination):
+    page_size = PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+
+
+def get_article_paginator(request):
+    if ArticlePagePagination.page_query_param in request.query_params:
+        return ArticlePagePagination()
+    return ArticleCursorPagination()
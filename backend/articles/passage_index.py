@@ -0,0 +1,102 @@
+import re
+import threading
+import numpy as np
+from .vector_index import VectorIndex
+
+WORD_RE = re.compile(r'\S+')
+
+
+def split_passages(text, words=80, overlap=20):
+    """
+    Режет текст на перекрывающиеся фрагменты по words слов (соседние делят overlap слов).
+    Возвращает список границ (начало, конец) в символах исходного текста.
+    """
+    bounds = [match.span() for match in WORD_RE.finditer(text or '')]
+    if not bounds:
+        return []
+    step = max(1, words - overlap)
+    spans = []
+    for first in range(0, len(bounds), step):
+        last = min(first + words, len(bounds)) - 1
+        spans.append((bounds[first][0], bounds[last][1]))
+        if last == len(bounds) - 1:
+            break
+    return spans
+
+
+class PassageIndex:
+    """
+    Векторы фрагментов полного текста статей (VectorIndex по id фрагмента)
+    плюс отображение фрагмент -> (статья, границы в тексте).
+    Оценка статьи — максимум (или среднее top_m) по сходству её фрагментов с запросом.
+    """
+
+    def __init__(self, top_m=1):
+        self.top_m = max(1, top_m)
+        self._lock = threading.RLock()
+        self._vectors = VectorIndex()
+        self._spans = {}  # id фрагмента -> (id статьи, начало, конец)
+        self._post_passages = {}  # id статьи -> [id фрагментов]
+        self.loaded = False
+        # Версия корпуса, которой соответствует содержимое индекса
+        self.version = None
+
+    def __len__(self):
+        return len(self._spans)
+
+    def load(self, passages, version=None):
+        """Строит индекс с нуля из кортежей (id фрагмента, id статьи, начало, конец, вектор)."""
+        with self._lock:
+            self._spans = {}
+            self._post_passages = {}
+            items = []
+            for passage_id, post_id, start, end, vector in passages:
+                self._spans[passage_id] = (post_id, start, end)
+                self._post_passages.setdefault(post_id, []).append(passage_id)
+                items.append((passage_id, vector))
+            self._vectors.load(items)
+            self.version = version
+            self.loaded = True
+
+    def replace_post(self, post_id, passages):
+        """Заменяет все фрагменты статьи: passages — кортежи (id фрагмента, начало, конец, вектор)."""
+        with self._lock:
+            self.remove_post(post_id)
+            for passage_id, start, end, vector in passages:
+                self._spans[passage_id] = (post_id, start, end)
+                self._post_passages.setdefault(post_id, []).append(passage_id)
+                self._vectors.upsert(passage_id, vector)
+
+    def remove_post(self, post_id):
+        with self._lock:
+            for passage_id in self._post_passages.pop(post_id, []):
+                self._spans.pop(passage_id, None)
+                self._vectors.remove(passage_id)
+
+    def search(self, query_vector, top_k=3, threshold=0.25, post_ids=None, candidates=100):
+        """
+        Возвращает {id статьи: (оценка, начало, конец лучшего фрагмента)} для лучших статей.
+        Сравниваем запрос с фрагментами (всеми или только статей post_ids) и берём
+        candidates лучших фрагментов; статьи, набравшие меньше top_m фрагментов, усредняются по тем, что есть.
+        """
+        with self._lock:
+            passage_ids = None
+            if post_ids is not None:
+                passage_ids = [pid for post_id in post_ids for pid in self._post_passages.get(post_id, [])]
+            hits = self._vectors.search(
+                query_vector, top_k=max(candidates, top_k * self.top_m), threshold=threshold, ids=passage_ids
+            )
+            spans = {passage_id: self._spans[passage_id] for passage_id, _ in hits}
+
+        per_post = {}
+        # hits отсортированы по убыванию, поэтому первый фрагмент статьи — лучший
+        for passage_id, score in hits:
+            post_id, start, end = spans[passage_id]
+            per_post.setdefault(post_id, {'scores': [], 'span': (start, end)})['scores'].append(score)
+
+        ranked = {
+            post_id: (float(np.mean(data['scores'][:self.top_m])),) + data['span']
+            for post_id, data in per_post.items()
+        }
+        best = sorted(ranked.items(), key=lambda item: item[1][0], reverse=True)[:top_k]
+        return dict(best)
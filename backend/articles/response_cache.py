@@ -0,0 +1,83 @@
+import hashlib
+import threading
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+# Кэш ответов списка и карточек статей.
+# Хранятся данные ответа (response.data) до рендера: JSON и страница DRF получаются из одной записи.
+# В ключ входит версия (articles/corpus.py): список — версия содержимого, карточка — версия статьи.
+# Сигналы (articles/signals.py) меняют версии после правки, и старые записи просто перестают находиться,
+# поэтому ничего не нужно удалять по шаблону: работает на любом бэкенде кэша, в том числе LocMem и файловом.
+# Старые записи вытесняет сам кэш или удаляет таймаут.
+
+KEY_PREFIX = 'articles:response'
+
+
+def get_cache():
+    return caches[getattr(settings, 'ARTICLES_RESPONSE_CACHE', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'ARTICLES_RESPONSE_CACHE_TIMEOUT', 60 * 60)
+
+
+class ResponseCacheStats:
+    """Попадания и промахи по видам ответов (list / detail / tags) в этом процессе."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def record(self, kind, hit):
+        with self._lock:
+            hits, misses = self._counts.get(kind, (0, 0))
+            self._counts[kind] = (hits + hit, misses + (not hit))
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+        result = {}
+        for kind, (hits, misses) in sorted(counts.items()):
+            total = hits + misses
+            result[kind] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': round(hits / total, 4) if total else 0.0,
+            }
+        return result
+
+
+stats = ResponseCacheStats()
+
+
+def make_key(request, kind, version):
+    """
+    Ключ: вид ответа, версия и адрес с параметрами (страница, курсор, размер, тег).
+    Параметры сортируются, чтобы ?tag=a&page=2 и ?page=2&tag=a попадали в одну запись.
+    Адрес полный, с хостом: в ссылках next/previous пагинации он тоже полный.
+    """
+    params = sorted((name, value) for name, values in request.query_params.lists() for value in values)
+    address = '|'.join([request.build_absolute_uri(request.path), repr(params)])
+    return f"{KEY_PREFIX}:{kind}:{version}:{hashlib.md5(address.encode()).hexdigest()}"
+
+
+def cached_response(request, kind, version, build):
+    """
+    Ответ из кэша или build() с сохранением данных в кэш.
+    Кэшируются только успешные ответы (200): ошибки (404, 400) каждый раз считаются заново.
+    """
+    cache = get_cache()
+    key = make_key(request, kind, version)
+    data = cache.get(key)
+    stats.record(kind, data is not None)
+    if data is not None:
+        return Response(data)
+    response = build()
+    if response.status_code == 200:
+        cache.set(key, response.data, get_timeout())
+    return response
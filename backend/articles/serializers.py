@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from .models import Post, Tag
 from django.db import transaction
+from chat.moderation import describe_spans
+from .moderation import find_banned_many
 class TagSerializer(serializers.ModelSerializer):
     """
     Сериализатор для модели Тега.
@@ -31,6 +33,20 @@ class PostListSerializer(serializers.ModelSerializer):
         # Возвращает "5 мин"
         return f"{obj.read_time} мин"
 
+class PostSearchSerializer(PostListSerializer):
+    """
+    Сериализатор результатов ИИ-поиска: карточка статьи + найденный фрагмент текста.
+    """
+    snippet = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Post
+        fields = PostListSerializer.Meta.fields + ['snippet']
+
+    def get_snippet(self, obj):
+        # Заполняется функцией поиска, у статьи из БД такого атрибута нет
+        return getattr(obj, 'snippet', None)
+
 class PostDetailSerializer(PostListSerializer):
     """
     Сериализатор для детального просмотра статьи (используется на /articles/1/).
@@ -53,6 +69,19 @@ class PostCreateUpdateSerializer(serializers.ModelSerializer):
         model = Post
         # Включаем все поля, которые приходят с фронтенда
         fields = ['id', 'title', 'excerpt', 'text', 'read_time', 'tags_input'] 
+
+    # Поля, которые проверяются на запрещённые слова (полный текст тоже — проверка линейная)
+    CENSORED_FIELDS = ['title', 'excerpt', 'text', 'tags_input']
+
+    def validate(self, attrs):
+        fields = [field for field in self.CENSORED_FIELDS if attrs.get(field)]
+        errors = {}
+        for field, spans in zip(fields, find_banned_many([attrs[field] for field in fields])):
+            if spans:
+                errors[field] = f"Недопустимые слова: {describe_spans(attrs[field], spans)}"
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
         
     def _handle_tags(self, post, tags_string):
         """Создает или находит теги из строки и привязывает их к посту."""
@@ -0,0 +1,84 @@
+import logging
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from .corpus import bump_article_versions, bump_content_version
+from .models import Post, Tag
+
+logger = logging.getLogger(__name__)
+
+
+def _content_changed(post_ids=()):
+    """Меняет версию содержимого (списки статей) и версии затронутых статей (их карточки)."""
+    post_ids = list(post_ids)
+
+    def bump():
+        bump_content_version()
+        bump_article_versions(post_ids)
+
+    # После коммита: иначе клиент успеет получить старые данные уже с новой версией
+    transaction.on_commit(bump)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, **kwargs):
+    """Обновляем статью в индексах ИИ-поиска сразу после создания или изменения."""
+    # Импорт внутри функции, чтобы не загружать модуль поиска при старте приложения
+    from .ai_search import update_search_indexes, advance_corpus_version
+
+    # Ошибка модели не должна мешать сохранению статьи — вектор досчитается при поиске.
+    # Точка сохранения: если упадёт запись вектора, откатится только она, а не вся транзакция
+    # с самой статьёй (в PostgreSQL после ошибки SQL без неё транзакция уже не принимает запросы)
+    try:
+        with transaction.atomic():
+            update_search_indexes(instance)
+    except Exception:
+        logger.exception("Ошибка обновления вектора статьи %s", instance.pk)
+
+    # Версию меняем после коммита, чтобы другие процессы не перечитали статьи до записи в БД
+    transaction.on_commit(advance_corpus_version)
+    _content_changed([instance.pk])
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    """Убираем удалённую статью из индексов ИИ-поиска."""
+    from .ai_search import remove_post_from_indexes, advance_corpus_version
+
+    remove_post_from_indexes(instance.pk)
+    transaction.on_commit(advance_corpus_version)
+    _content_changed([instance.pk])
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def post_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Теги статьи видны в списке и карточке, но в поиске не участвуют — меняем только версии содержимого."""
+    # reverse — изменение со стороны тега (tag.posts.add(...)): instance — тег, pk_set — статьи
+    if reverse and action == 'pre_clear':
+        # После tag.posts.clear() уже не узнать, у каких статей стоял тег
+        instance._cleared_post_ids = list(instance.posts.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            post_ids = [instance.pk]
+        elif action == 'post_clear':
+            post_ids = instance.__dict__.pop('_cleared_post_ids', [])
+        else:
+            post_ids = pk_set
+        _content_changed(post_ids)
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, **kwargs):
+    # Переименование тега меняет карточки всех статей с ним; у нового тега статей ещё нет
+    _content_changed([] if created else instance.posts.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_deleting(sender, instance, **kwargs):
+    # Связи со статьями удаляются вместе с тегом — запоминаем статьи до этого
+    instance._deleted_post_ids = list(instance.posts.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    _content_changed(instance.__dict__.pop('_deleted_post_ids', []))
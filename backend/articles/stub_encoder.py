@@ -0,0 +1,26 @@
+# Заглушка модели ИИ для бенчмарков и тестов: не требует весов и сети.
+# Модуль не импортирует Django, поэтому годится и для пула процессов embed_articles.
+import re
+import zlib
+import numpy as np
+
+STUB_MODEL_NAME = 'hashing-stub-384'
+WORD_RE = re.compile(r'\w+')
+
+
+class HashingEncoder:
+    """
+    Детерминированный «мешок слов»: каждое слово хэшируется в одну из dim координат со знаком.
+    Похожие по словам тексты получают похожие векторы, чего достаточно для замеров скорости.
+    """
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def encode(self, texts, **kwargs):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in WORD_RE.findall(text.lower()):
+                h = zlib.crc32(word.encode('utf-8'))
+                vectors[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return vectors
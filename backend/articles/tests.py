@@ -1,3 +1,695 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
+import numpy as np
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from chat.censor import WordFilter
+from chat.moderation import CENSORED_WORDS_FILE, contains_banned
+from users.models import User
+from users.views import MyTokenObtainPairSerializer
+from . import response_cache
+from . import ai_search, corpus, encoder
+from .batching import BatchingEncoder
+from .embedding_store import open_store, write_store
+from .lexical_index import LexicalIndex, tokenize
+from .management.commands.embed_articles import upsert_options
+from .models import Post, PostEmbedding, Tag
+from .passage_index import split_passages
+from .serializers import PostCreateUpdateSerializer
+from .search_cache import QueryCache
+from .stub_encoder import HashingEncoder
+from .vector_index import VectorIndex
 
-# Create your tests here.
+
+class ArticleConditionalGetTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post = Post.objects.create(title="Стресс перед экзаменом", excerpt="Как справиться", text="Текст")
+
+    def get(self, url, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(url, **headers)
+
+    def test_unchanged_list_costs_no_queries(self):
+        first = self.get('/api/v1/articles/')
+        self.assertEqual(first.status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.get('/api/v1/articles/', first['ETag'])
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(len(queries), 0)
+
+    def test_changes_invalidate_etag(self):
+        list_etag = self.get('/api/v1/articles/')['ETag']
+        detail_etag = self.get(f'/api/v1/articles/{self.post.id}/')['ETag']
+        self.assertEqual(self.get(f'/api/v1/articles/{self.post.id}/', detail_etag).status_code, 304)
+
+        # Теги статьи меняются отдельно от неё самой
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.tags.add(Tag.objects.create(name="Учёба"))
+        response = self.get('/api/v1/articles/', list_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['tags'], ["Учёба"])
+        list_etag = response['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.title = "Новый заголовок"
+            self.post.save()
+        self.assertEqual(self.get('/api/v1/articles/', list_etag).status_code, 200)
+        self.assertEqual(self.get(f'/api/v1/articles/{self.post.id}/', detail_etag).status_code, 200)
+
+
+class ArticlePaginationTest(APITestCase):
+    POSTS = 7
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.study, cls.stress = Tag.objects.create(name="Учёба"), Tag.objects.create(name="Стресс")
+        cls.posts = []
+        for i in range(cls.POSTS):
+            post = Post.objects.create(title=f"Статья {i}", excerpt="Описание", text="Полный текст " * 100)
+            post.tags.set([cls.study, cls.stress][:1 + i % 2])
+            cls.posts.append(post)
+        # Новые сверху
+        cls.ids = [post.id for post in reversed(cls.posts)]
+
+    def setUp(self):
+        # Записи кэша ответов от других тестов: в тестах версии не меняются (транзакция не коммитится)
+        cache.clear()
+
+    def test_cursor_pages(self):
+        ids, url = [], '/api/v1/articles/?page_size=3'
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                data = self.client.get(url).json()
+            # Статьи и их теги, без COUNT и без полного текста
+            self.assertEqual(len(queries), 2)
+            self.assertNotIn('"text"', queries[0]['sql'])
+            self.assertNotIn('count', data)
+            ids += [article['id'] for article in data['results']]
+            url = data['next']
+        self.assertEqual(ids, self.ids)
+
+    def test_numbered_pages(self):
+        data = self.client.get('/api/v1/articles/?page=2&page_size=3').json()
+        self.assertEqual(data['count'], self.POSTS)
+        self.assertEqual([article['id'] for article in data['results']], self.ids[3:6])
+        self.assertEqual(self.client.get('/api/v1/articles/?page=9').status_code, 404)
+
+    def test_page_size_is_capped(self):
+        Post.objects.bulk_create([Post(title="Ещё", excerpt="", text="") for _ in range(120)])
+        self.assertEqual(len(self.client.get('/api/v1/articles/?page_size=1000').json()['results']), 100)
+
+    def test_tag_filter(self):
+        data = self.client.get('/api/v1/articles/', {'tag': "Стресс"}).json()
+        self.assertEqual([article['id'] for article in data['results']], self.ids[1::2])
+        for article in data['results']:
+            # Теги статьи целиком, а не только отфильтрованный
+            self.assertEqual(article['tags'], ["Учёба", "Стресс"])
+
+    def test_detail_has_text(self):
+        data = self.client.get(f'/api/v1/articles/{self.posts[0].id}/').json()
+        self.assertTrue(data['text'].startswith("Полный текст"))
+
+    def test_tags(self):
+        self.assertEqual(self.client.get('/api/v1/articles/tags/').json(), ["Стресс", "Учёба"])
+
+
+class ArticleResponseCacheTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        response_cache.stats.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag = Tag.objects.create(name="Стресс")
+            self.first = Post.objects.create(title="Первая", excerpt="Описание", text="Текст")
+            self.second = Post.objects.create(title="Вторая", excerpt="Описание", text="Текст")
+            self.first.tags.add(self.tag)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(queries)
+
+    def assertCached(self, url):
+        data, count = self.get(url)
+        self.assertEqual(count, 0, url)
+        return data
+
+    def assertFresh(self, url):
+        data, count = self.get(url)
+        self.assertGreater(count, 0, url)
+        return data
+
+    def test_cached_per_page_tag_and_id(self):
+        urls = [
+            '/api/v1/articles/', '/api/v1/articles/?page=1', '/api/v1/articles/?tag=Стресс',
+            f'/api/v1/articles/{self.first.id}/', f'/api/v1/articles/{self.second.id}/', '/api/v1/articles/tags/',
+        ]
+        for url in urls:
+            self.assertFresh(url)
+        for url in urls:
+            self.assertCached(url)
+        # Порядок параметров не важен
+        self.assertFresh('/api/v1/articles/?tag=Стресс&page=1')
+        self.assertCached('/api/v1/articles/?page=1&tag=Стресс')
+
+        stats = self.client.get('/api/v1/articles/cache-stats/')
+        self.assertEqual(stats.status_code, 401)
+        admin = User.objects.create(email='admin@school.ru', token='admin', is_staff=True)
+        token = MyTokenObtainPairSerializer.get_token(admin).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        stats = self.client.get('/api/v1/articles/cache-stats/').json()
+        self.assertEqual(stats['list'], {'hits': 4, 'misses': 4, 'hit_rate': 0.5})
+        self.assertEqual(stats['detail']['hits'], 2)
+
+    def test_post_change_invalidates_its_detail_and_lists(self):
+        first_url, second_url = f'/api/v1/articles/{self.first.id}/', f'/api/v1/articles/{self.second.id}/'
+        for url in ('/api/v1/articles/', first_url, second_url):
+            self.assertFresh(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first.title = "Новый заголовок"
+            self.first.save()
+        self.assertEqual(self.assertFresh(first_url)['title'], "Новый заголовок")
+        self.assertEqual(self.assertFresh('/api/v1/articles/')['results'][1]['title'], "Новый заголовок")
+        self.assertCached(second_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.second.delete()
+        self.assertEqual(self.client.get(second_url).status_code, 404)
+        self.assertCached(first_url)
+
+    def test_tag_changes_invalidate_tagged_articles(self):
+        first_url, second_url = f'/api/v1/articles/{self.first.id}/', f'/api/v1/articles/{self.second.id}/'
+        self.assertFresh(first_url)
+        self.assertFresh(second_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.name = "Тревога"
+            self.tag.save()
+        self.assertEqual(self.assertFresh(first_url)['tags'], ["Тревога"])
+        self.assertCached(second_url)
+
+        # Со стороны тега
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.posts.add(self.second)
+        self.assertEqual(self.assertFresh(second_url)['tags'], ["Тревога"])
+        self.assertCached(first_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.posts.clear()
+        self.assertEqual(self.assertFresh(first_url)['tags'], [])
+        self.assertEqual(self.assertFresh(second_url)['tags'], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.second.tags.add(self.tag)
+        self.assertFresh(second_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.delete()
+        self.assertEqual(self.assertFresh(second_url)['tags'], [])
+        self.assertCached(first_url)
+
+    def test_errors_are_not_cached(self):
+        self.assertEqual(self.client.get('/api/v1/articles/999999/').status_code, 404)
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(id=999999, title="Появилась", excerpt="", text="")
+        self.assertEqual(self.client.get(f'/api/v1/articles/{post.id}/').status_code, 200)
+        self.assertEqual(self.client.get('/api/v1/articles/0999999/').status_code, 200)
+        self.assertEqual(self.client.get('/api/v1/articles/?page=9').status_code, 404)
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': tempfile.mkdtemp(prefix='articles-cache-'),
+}})
+class FileResponseCacheTest(ArticleResponseCacheTest):
+    """То же на файловом кэше: данные ответа сохраняются через pickle и читаются другим процессом."""
+
+
+@mock.patch('articles.encoder._model', HashingEncoder())
+class EmbedArticlesCommandTest(APITestCase):
+    def embed(self, *args):
+        call_command('embed_articles', *args, stdout=io.StringIO())
+
+    def test_reembeds_changed_articles_in_place(self):
+        posts = [Post.objects.create(title=f"Статья {i}", excerpt="Описание", text="Текст") for i in range(3)]
+        PostEmbedding.objects.all().delete()
+        self.embed('--skip-passages')
+        self.assertEqual(PostEmbedding.objects.count(), 3)
+        before = {e.post_id: e.pk for e in PostEmbedding.objects.all()}
+
+        # Мимо сигналов: вектор первой статьи устарел, строка уже есть — запись идёт через upsert
+        Post.objects.filter(pk=posts[0].pk).update(title="Новый заголовок")
+        self.embed('--skip-passages')
+        embedding = PostEmbedding.objects.get(post=posts[0])
+        self.assertEqual(PostEmbedding.objects.count(), 3)
+        self.assertEqual(embedding.pk, before[posts[0].pk])
+        self.assertEqual(embedding.content_hash, ai_search.get_content_hash(ai_search.get_embedding_text(Post.objects.get(pk=posts[0].pk))))
+
+        self.embed('--skip-passages', '--force')
+        self.assertEqual(PostEmbedding.objects.count(), 3)
+
+    def test_upsert_options_for_mysql(self):
+        with mock.patch('articles.management.commands.embed_articles.connection') as connection:
+            connection.features.supports_update_conflicts_with_target = False
+            self.assertNotIn('unique_fields', upsert_options(['post'], ['vector']))
+            connection.features.supports_update_conflicts_with_target = True
+            self.assertEqual(upsert_options(['post'], ['vector'])['unique_fields'], ['post'])
+
+
+class ArticleCensorTest(SimpleTestCase):
+    def validate(self, **data):
+        serializer = PostCreateUpdateSerializer(data=dict({'title': "Статья", 'excerpt': "Описание", 'text': "Текст"}, **data))
+        serializer.is_valid()
+        return serializer.errors
+
+    def test_ordinary_words_are_allowed_in_articles(self):
+        self.assertEqual(self.validate(
+            title="Член семьи заболел", excerpt="Как быть членом команды",
+            text="Разговор про аборт и про то, как прикинуть план на неделю.",
+        ), {})
+        # В чате эти слова по-прежнему под запретом
+        self.assertTrue(contains_banned("член"))
+
+    def test_banned_words_are_rejected(self):
+        errors = self.validate(text="Ты д-у-р-а-к", tags_input="Учёба, сука")
+        self.assertEqual(set(errors), {'text', 'tags_input'})
+        self.assertIn("д-у-р-а-к", str(errors['text'][0]))
+
+    def test_allowed_list_is_reloaded(self):
+        fd, path = tempfile.mkstemp(suffix='.txt')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        word_filter = WordFilter(CENSORED_WORDS_FILE, path)
+        self.assertTrue(word_filter.contains("дурак"))
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write("ДУРАК\n")
+        os.utime(path, ns=(time.time_ns() + 10 ** 9,) * 2)
+        self.assertFalse(word_filter.contains("дурак"))
+
+
+class PostSavedSignalTest(APITestCase):
+    def test_index_error_rolls_back_only_the_index_update(self):
+        def broken_update(post):
+            # Запись вектора успела пройти, а потом упал SQL
+            PostEmbedding.objects.create(post=post, model_name='test', content_hash='x', vector=b'')
+            raise DatabaseError("сломанный запрос")
+
+        with mock.patch('articles.ai_search.update_search_indexes', side_effect=broken_update):
+            with self.assertLogs('articles.signals', 'ERROR') as logs, transaction.atomic():
+                post = Post.objects.create(title="Статья", excerpt="Описание", text="Текст")
+                # Транзакция со статьёй продолжает работать
+                Post.objects.filter(pk=post.pk).update(title="Новый заголовок")
+        self.assertIn(f"статьи {post.pk}", logs.output[0])
+        self.assertEqual(Post.objects.get(pk=post.pk).title, "Новый заголовок")
+        self.assertFalse(PostEmbedding.objects.filter(post=post).exists())
+
+
+class ContentVersionTest(APITestCase):
+    def test_bump_is_seen_by_other_processes(self):
+        location = tempfile.mkdtemp(prefix='articles-cache-')
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location,
+        }}):
+            version = corpus.get_content_version()
+            self.assertEqual(corpus.get_content_version(), version)
+            # Другой процесс — свой объект кэша над теми же файлами
+            from django.core.cache.backends.filebased import FileBasedCache
+            other = FileBasedCache(location, {})
+            other.set(corpus.CONTENT_VERSION_KEY, 'из другого процесса', timeout=None)
+            self.assertEqual(corpus.get_content_version(), 'из другого процесса')
+            self.assertNotIn(corpus.bump_content_version(), (version, 'из другого процесса'))
+            self.assertEqual(other.get(corpus.CONTENT_VERSION_KEY), corpus.get_content_version())
+
+
+
+@mock.patch('articles.encoder._model', HashingEncoder())
+class CorpusVersionTest(APITestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.posts = [
+                Post.objects.create(title=f"Статья {i}", excerpt="Описание", text="Как справиться со стрессом")
+                for i in range(3)
+            ]
+
+    def search(self, query):
+        return [post.id for post in ai_search.search_articles_semantically(query)]
+
+    def count_loads(self):
+        """Подменяет load() всех индексов обёрткой, которая считает вызовы."""
+        loads = []
+        for search_index in (ai_search.index, ai_search.lexical_index, ai_search.passage_index):
+            original = search_index.load
+            patcher = mock.patch.object(
+                search_index, 'load', side_effect=lambda *args, original=original, **kwargs: (loads.append(1), original(*args, **kwargs))[1],
+            )
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return loads
+
+    def test_bump_is_atomic_increment(self):
+        epoch, value = corpus.get_corpus_version()
+        self.assertEqual(corpus.bump_corpus_version(), (epoch, value + 1))
+        self.assertEqual(corpus.bump_corpus_version(), (epoch, value + 2))
+        self.assertTrue(corpus.follows((epoch, value + 2), (epoch, value + 1)))
+        self.assertFalse(corpus.follows((epoch, value + 2), (epoch, value)))
+        self.assertFalse(corpus.follows(('другая', value + 1), (epoch, value)))
+
+    def test_own_save_keeps_indexes(self):
+        self.search("стресс")
+        loads = self.count_loads()
+        with self.captureOnCommitCallbacks(execute=True):
+            post = self.posts[0]
+            post.title = "Бессонница перед контрольной"
+            post.save()
+        # Индексы этого процесса обновлены сигналом — перезагружать их не нужно
+        self.assertEqual(self.search("бессонница"), [post.id])
+        self.assertEqual(loads, [])
+
+    def test_foreign_change_reloads_indexes(self):
+        self.search("стресс")
+        loads = self.count_loads()
+        # Статью изменил другой процесс: сигнала здесь не было, версия ушла на шаг вперёд
+        Post.objects.filter(pk=self.posts[1].pk).update(title="Бессонница перед контрольной")
+        corpus.bump_corpus_version()
+        self.assertEqual(self.search("бессонница"), [self.posts[1].pk])
+        self.assertTrue(loads)
+
+
+def unit(*values):
+    vector = np.zeros(8, dtype=np.float32)
+    vector[:len(values)] = values
+    return vector
+
+
+class SemanticSearchTest(APITestCase):
+    """Поиск целиком (search_articles_semantically) на заглушке модели: у неё сходство — общие слова."""
+
+    def setUp(self):
+        # Короткие фрагменты, чтобы фрагмент с нужными словами не тонул в остальном тексте
+        patcher = mock.patch.multiple(ai_search, PASSAGE_WORDS=4, PASSAGE_OVERLAP=1)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sleep = Post.objects.create(
+                title="Бессонница мешает учиться", excerpt="Советы психолога", text="Погода была тёплой весь день",
+            )
+            self.walk = Post.objects.create(
+                title="Прогулки", excerpt="Заметка",
+                text="Погода была тёплой весь день. Бессонница мешает учиться днём.",
+            )
+            self.exam = Post.objects.create(
+                title="Стресс перед экзаменом", excerpt="Как успокоиться", text="Дышите глубоко",
+            )
+            self.year = Post.objects.create(title="Итоги 2025", excerpt="Год", text="Отдых")
+
+    def search(self, query):
+        return [(post.id, post.snippet) for post in ai_search.search_articles_semantically(query)]
+
+    def test_lexical_shortcut(self):
+        # Все слова короткого запроса нашлись — запрос не кодируется моделью
+        with mock.patch.object(ai_search.query_encoder, 'encode') as encode:
+            self.assertEqual(self.search("стресс экзамен"), [(self.exam.id, None)])
+        encode.assert_not_called()
+
+    def test_lexical_only_without_model(self):
+        with mock.patch('articles.ai_search.get_model', return_value=None), \
+                mock.patch.object(ai_search.query_encoder, 'encode') as encode:
+            # Заголовок весит больше текста
+            self.assertEqual(self.search("бессонница мешает учиться"), [(self.sleep.id, None), (self.walk.id, None)])
+        encode.assert_not_called()
+
+    def test_snippet_from_best_passage(self):
+        # Статья про сон выигрывает по заголовку (её фрагменты не подходят — сниппета нет),
+        # «Прогулки» — только по фрагменту, он и становится сниппетом
+        self.assertEqual(
+            self.search("бессонница мешает учиться"),
+            [(self.sleep.id, None), (self.walk.id, "мешает учиться днём.")],
+        )
+
+    def test_full_scan_when_few_candidates(self):
+        # Числа не попадают в лексический индекс: по словам находится только статья про экзамен,
+        # и недостающие результаты добираются сравнением со всеми статьями
+        with mock.patch.object(ai_search, '_semantic_hits', wraps=ai_search._semantic_hits) as semantic_hits:
+            found = [post_id for post_id, _ in self.search("стресс экзаменом успокоиться 2025")]
+        self.assertEqual(found, [self.exam.id, self.year.id])
+        candidates, full_scan = semantic_hits.call_args_list
+        self.assertEqual(candidates.args[3], [self.exam.id])
+        self.assertEqual(full_scan, mock.call(mock.ANY, 3, mock.ANY, version=mock.ANY))
+
+    def test_result_cache_follows_corpus_version(self):
+        with mock.patch.object(ai_search, '_rank_posts', wraps=ai_search._rank_posts) as rank_posts:
+            self.assertEqual(self.search("стресс"), [(self.exam.id, None)])
+            self.assertEqual(self.search("стресс"), [(self.exam.id, None)])
+            self.assertEqual(rank_posts.call_count, 1)
+
+            # Правка статьи увеличивает версию корпуса — закэшированный ответ больше не подходит
+            with self.captureOnCommitCallbacks(execute=True):
+                self.exam.title = "Паника перед экзаменом"
+                self.exam.save()
+            self.assertEqual(self.search("стресс"), [])
+            self.assertEqual(rank_posts.call_count, 2)
+
+
+class StubEncoderTest(SimpleTestCase):
+    def test_suite_runs_on_stub_encoder(self):
+        # manage.py test включает AI_SEARCH_ENCODER = 'stub' (settings): тестам не нужны веса модели и сеть
+        self.assertTrue(encoder.USE_STUB_ENCODER)
+        self.assertIsInstance(encoder.get_model(), HashingEncoder)
+
+
+class VectorIndexTest(SimpleTestCase):
+    def make_index(self, store=None):
+        index = VectorIndex()
+        index.load([(1, unit(1)), (2, unit(1, 1)), (3, unit(0, 1)), (4, unit(-1))], store=store)
+        return index
+
+    def test_top_k_sorted_by_similarity(self):
+        index = self.make_index()
+        result = index.search(unit(1), top_k=2, threshold=-1)
+        self.assertEqual([post_id for post_id, _ in result], [1, 2])
+        self.assertAlmostEqual(result[0][1], 1.0, places=5)
+        self.assertAlmostEqual(result[1][1], 2 ** -0.5, places=5)
+        # Порог отбрасывает непохожие статьи, даже если top_k больше
+        self.assertEqual([post_id for post_id, _ in index.search(unit(1), top_k=10, threshold=0.5)], [1, 2])
+        self.assertEqual([post_id for post_id, _ in index.search(unit(1), top_k=10, ids=[3, 4], threshold=-1)], [3, 4])
+
+    def test_upsert_replaces_vector(self):
+        index = self.make_index()
+        index.upsert(4, unit(1))
+        index.upsert(5, unit(0, 0, 1))
+        self.assertEqual(len(index), 5)
+        self.assertEqual({post_id for post_id, _ in index.search(unit(1), top_k=3, threshold=0.9)}, {1, 4})
+        self.assertEqual(index.search(unit(-1), top_k=1), [])
+        self.assertEqual(index.search(unit(0, 0, 1), top_k=1)[0][0], 5)
+
+    def test_remove_moves_last_row(self):
+        index = self.make_index()
+        index.remove(1)
+        index.remove(42)
+        self.assertEqual(len(index), 3)
+        # На место удалённой строки переехала статья 4 — её вектор не должен перепутаться
+        self.assertEqual(index.search(unit(-1), top_k=1)[0][0], 4)
+        self.assertNotIn(1, [post_id for post_id, _ in index.search(unit(1), top_k=10, threshold=-1)])
+
+    def test_store_rows_are_replaced_and_removed(self):
+        path = os.path.join(tempfile.mkdtemp(prefix='articles-store-'), 'embeddings.bin')
+        write_store(path, [1, 2, 3], [unit(1), unit(0, 1), unit(0, 0, 1)], dtype='float16')
+        index = VectorIndex()
+        index.load([(2, unit(-1))], store=open_store(path))
+        self.assertEqual(len(index), 3)
+        # Строка 2 из файла заменена вектором из памяти
+        self.assertEqual(index.search(unit(-1), top_k=1)[0][0], 2)
+        self.assertEqual(index.search(unit(0, 1), top_k=1), [])
+        index.remove(3)
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.search(unit(0, 0, 1), top_k=1), [])
+
+
+class EmbeddingStoreTest(SimpleTestCase):
+    def round_trip(self, dtype):
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((5, 16)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        path = os.path.join(tempfile.mkdtemp(prefix='articles-store-'), 'embeddings.bin')
+        write_store(path, [10, 20, 30, 40, 50], vectors, dtype=dtype, model='test')
+        store = open_store(path)
+        self.assertEqual((len(store), store.dim, store.dtype, store.header['model']), (5, 16, dtype, 'test'))
+        self.assertEqual(list(store.ids), [10, 20, 30, 40, 50])
+        return store, vectors
+
+    def test_int8_round_trip(self):
+        store, vectors = self.round_trip('int8')
+        restored = np.asarray(store.vectors, dtype=np.float32) * np.asarray(store.scales)[:, None]
+        np.testing.assert_allclose(restored, vectors, atol=0.01)
+        np.testing.assert_allclose(store.scores(vectors[2]), vectors @ vectors[2], atol=0.02)
+        np.testing.assert_allclose(store.scores(vectors[2], np.array([4, 2])), (vectors @ vectors[2])[[4, 2]], atol=0.02)
+
+    def test_float16_round_trip(self):
+        store, vectors = self.round_trip('float16')
+        self.assertIsNone(store.scales)
+        np.testing.assert_allclose(np.asarray(store.vectors, dtype=np.float32), vectors, atol=1e-3)
+        np.testing.assert_allclose(store.scores(vectors[0]), vectors @ vectors[0], atol=1e-3)
+
+    def test_empty_and_missing(self):
+        path = os.path.join(tempfile.mkdtemp(prefix='articles-store-'), 'embeddings.bin')
+        self.assertIsNone(open_store(path))
+        write_store(path, [], np.empty((0, 0)), dim=16)
+        store = open_store(path)
+        self.assertEqual((len(store), store.dim), (0, 16))
+        self.assertEqual(store.scores(np.ones(16)).shape, (0,))
+
+
+class QueryCacheTest(SimpleTestCase):
+    def test_ttl_expiry(self):
+        cache = QueryCache(max_size=10, ttl=60)
+        with mock.patch('articles.search_cache.time.monotonic', return_value=1000.0):
+            cache.set('тревога', [1, 2])
+        with mock.patch('articles.search_cache.time.monotonic', return_value=1059.0):
+            self.assertEqual(cache.get('тревога'), [1, 2])
+        with mock.patch('articles.search_cache.time.monotonic', return_value=1061.0):
+            self.assertIsNone(cache.get('тревога'))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_lru_eviction(self):
+        cache = QueryCache(max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        # Обращение к «a» делает её свежей, вытесняется «b»
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c')), (1, 3))
+        self.assertEqual(cache.stats()['size'], 2)
+
+    def test_disabled(self):
+        cache = QueryCache(max_size=0)
+        cache.set('a', 1)
+        self.assertIsNone(cache.get('a'))
+
+
+class BatchingEncoderTest(SimpleTestCase):
+    class Model:
+        """Вектор текста — [длина, номер вызова encode]; запоминает размеры батчей."""
+
+        def __init__(self):
+            self.batches = []
+
+        def encode(self, texts):
+            self.batches.append(len(texts))
+            return [[len(text), len(self.batches)] for text in texts]
+
+    def encode_concurrently(self, encoder, texts):
+        results = {}
+        barrier = threading.Barrier(len(texts))
+
+        def worker(text):
+            barrier.wait()
+            try:
+                results[text] = encoder.encode(text, timeout=5)
+            except Exception as e:
+                results[text] = e
+
+        threads = [threading.Thread(target=worker, args=(text,)) for text in texts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_requests_share_batches(self):
+        model = self.Model()
+        encoder = BatchingEncoder(lambda: model, max_batch_size=4, max_wait_ms=200)
+        texts = ['x' * length for length in range(1, 11)]
+        results = self.encode_concurrently(encoder, texts)
+        # Каждый поток получил вектор своего текста
+        for text in texts:
+            self.assertEqual(results[text][0], len(text))
+        self.assertEqual(sum(model.batches), 10)
+        self.assertLessEqual(max(model.batches), 4)
+        self.assertLess(len(model.batches), 10)
+        stats = encoder.stats()
+        self.assertEqual((stats['items'], stats['batches']), (10, len(model.batches)))
+
+    def test_single_request_waits_at_most_max_wait(self):
+        model = self.Model()
+        encoder = BatchingEncoder(lambda: model, max_batch_size=16, max_wait_ms=20)
+        started = time.monotonic()
+        self.assertEqual(list(encoder.encode('один', timeout=5)), [4, 1])
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(model.batches, [1])
+
+    def test_errors_reach_every_caller(self):
+        encoder = BatchingEncoder(lambda: None, max_batch_size=4, max_wait_ms=50)
+        results = self.encode_concurrently(encoder, ['a', 'b', 'c'])
+        for result in results.values():
+            self.assertIsInstance(result, RuntimeError)
+
+
+class LexicalIndexTest(SimpleTestCase):
+    def post(self, post_id, title='', excerpt='', text=''):
+        return mock.Mock(id=post_id, title=title, excerpt=excerpt, text=text)
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize("Учёба и учёбы, учебе!"), ['учеб', 'учеб', 'учеб'])
+        self.assertEqual(tokenize("В 2024 году я"), ['год'])
+
+    def test_bm25_ranking(self):
+        index = LexicalIndex()
+        index.load([
+            self.post(1, title="Как справиться с тревогой", text="Тревога перед экзаменом — это нормально."),
+            self.post(2, title="Сон и отдых", text="Тревога мешает спать. Про сон и режим."),
+            self.post(3, title="Дружба в классе", text="Как найти друзей."),
+        ])
+        result = index.search(tokenize("тревога"))
+        # Термин в заголовке весит больше, статья без термина в выдачу не попадает
+        self.assertEqual([post_id for post_id, _, _ in result], [1, 2])
+        self.assertGreater(result[0][1], result[1][1])
+        self.assertEqual(result[0][2], 1.0)
+
+        result = index.search(tokenize("тревога сон"))
+        self.assertEqual(result[0][0], 2)
+        self.assertEqual(result[0][2], 1.0)
+        self.assertEqual(dict((post_id, share) for post_id, _, share in result)[1], 0.5)
+        self.assertEqual(index.search(tokenize("тревога"), top_n=1)[0][0], 1)
+
+    def test_upsert_and_remove(self):
+        index = LexicalIndex()
+        index.load([self.post(1, title="Тревога"), self.post(2, title="Сон")])
+        index.upsert(self.post(1, title="Дружба"))
+        self.assertEqual(index.search(tokenize("тревога")), [])
+        self.assertEqual(index.search(tokenize("дружба"))[0][0], 1)
+        index.remove(2)
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.search(tokenize("сон")), [])
+
+
+class SplitPassagesTest(SimpleTestCase):
+    def test_overlapping_passages(self):
+        text = ' '.join(f'w{i}' for i in range(10))
+        spans = split_passages(text, words=4, overlap=1)
+        self.assertEqual([text[start:end] for start, end in spans], [
+            'w0 w1 w2 w3', 'w3 w4 w5 w6', 'w6 w7 w8 w9',
+        ])
+
+    def test_short_and_empty_text(self):
+        self.assertEqual(split_passages('  один  два ', words=80, overlap=20), [(2, 11)])
+        self.assertEqual(split_passages('', words=4, overlap=1), [])
+        self.assertEqual(split_passages(None), [])
+
+    def test_last_passage_is_not_repeated(self):
+        text = ' '.join(f'w{i}' for i in range(7))
+        spans = split_passages(text, words=4, overlap=1)
+        self.assertEqual([text[start:end] for start, end in spans], ['w0 w1 w2 w3', 'w3 w4 w5 w6'])
+        # Перекрытие не меньше длины фрагмента не должно зацикливать разбиение
+        self.assertEqual(len(split_passages(text, words=2, overlap=5)), 6)
@@ -0,0 +1,167 @@
+import threading
+import numpy as np
+
+
+class VectorIndex:
+    """
+    Индекс векторов статей, который живёт в памяти процесса.
+    Все векторы лежат в одной непрерывной матрице float32 (уже нормализованные),
+    рядом — массив id статей в том же порядке.
+    Косинусное сходство при этом сводится к одному умножению матрицы на вектор.
+
+    Основную часть векторов можно взять из общего файла (EmbeddingStore, квантованный, через mmap).
+    Тогда в памяти процесса лежат только статьи, изменённые после записи файла.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._matrix = None  # (capacity, dim), занято только первые self._size строк
+        self._ids = np.empty(0, dtype=np.int64)
+        self._positions = {}  # id статьи -> номер строки
+        self._size = 0
+        # Файл с векторами и маска его строк, которые ещё актуальны (не удалены и не заменены)
+        self._store = None
+        self._store_alive = None
+        self._store_alive_count = 0
+        self.loaded = False
+        # Версия корпуса, которой соответствует содержимое индекса
+        self.version = None
+
+    def __len__(self):
+        return self._size + self._store_alive_count
+
+    @property
+    def store(self):
+        return self._store
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def load(self, items, version=None, store=None):
+        """
+        Строит индекс с нуля из пар (id статьи, вектор).
+        store — файл векторов (id в нём отсортированы), items тогда дополняют или заменяют его строки.
+        """
+        items = list(items)
+        with self._lock:
+            self._store = store if store is not None and len(store) else None
+            if self._store is not None:
+                self._store_alive = np.ones(len(self._store), dtype=bool)
+                self._store_alive_count = len(self._store)
+            else:
+                self._store_alive = None
+                self._store_alive_count = 0
+
+            self._matrix = None
+            self._ids = np.empty(0, dtype=np.int64)
+            self._positions = {}
+            self._size = 0
+            for post_id, vector in items:
+                self.upsert(post_id, vector)
+            self.version = version
+            self.loaded = True
+
+    def _store_row(self, post_id):
+        """Номер актуальной строки статьи в файле или None."""
+        if self._store is None:
+            return None
+        ids = self._store.ids
+        row = int(np.searchsorted(ids, post_id))
+        if row < ids.shape[0] and ids[row] == post_id and self._store_alive[row]:
+            return row
+        return None
+
+    def _drop_from_store(self, post_id):
+        row = self._store_row(post_id)
+        if row is not None:
+            self._store_alive[row] = False
+            self._store_alive_count -= 1
+
+    def _grow(self, dim):
+        # Запас по ёмкости удваивается, чтобы добавление статьи не копировало всю матрицу каждый раз
+        capacity = 0 if self._matrix is None else self._matrix.shape[0]
+        new_capacity = max(16, capacity * 2)
+        matrix = np.zeros((new_capacity, dim), dtype=np.float32)
+        ids = np.zeros(new_capacity, dtype=np.int64)
+        if self._size:
+            matrix[:self._size] = self._matrix[:self._size]
+            ids[:self._size] = self._ids[:self._size]
+        self._matrix, self._ids = matrix, ids
+
+    def upsert(self, post_id, vector):
+        """Добавляет или заменяет вектор статьи."""
+        vector = self._normalize(vector)
+        with self._lock:
+            self._drop_from_store(post_id)
+            row = self._positions.get(post_id)
+            if row is None:
+                if self._matrix is None or self._size == self._matrix.shape[0]:
+                    self._grow(vector.shape[0])
+                row = self._size
+                self._size += 1
+                self._positions[post_id] = row
+                self._ids[row] = post_id
+            self._matrix[row] = vector
+
+    def remove(self, post_id):
+        """Удаляет статью: на её место переезжает последняя строка матрицы."""
+        with self._lock:
+            self._drop_from_store(post_id)
+            row = self._positions.pop(post_id, None)
+            if row is None:
+                return
+            last = self._size - 1
+            if row != last:
+                self._matrix[row] = self._matrix[last]
+                moved_id = int(self._ids[last])
+                self._ids[row] = moved_id
+                self._positions[moved_id] = row
+            self._size = last
+
+    def _scores(self, query, ids):
+        """Возвращает массивы (id статей, сходство) для всех статей или только для ids."""
+        if ids is None:
+            rows = slice(0, self._size)
+        else:
+            rows = np.array([self._positions[i] for i in ids if i in self._positions], dtype=np.int64)
+        all_ids = [self._ids[rows]]
+        if self._matrix is not None:
+            all_scores = [self._matrix[rows] @ query]
+        else:
+            all_scores = [np.empty(0, dtype=np.float32)]
+
+        if self._store is not None:
+            if ids is None:
+                store_scores = self._store.scores(query)
+                # Удалённые и заменённые строки файла не должны попасть в выдачу
+                store_scores[~self._store_alive] = -np.inf
+                all_ids.append(self._store.ids)
+            else:
+                store_rows = np.array(
+                    [row for row in map(self._store_row, ids) if row is not None], dtype=np.int64
+                )
+                store_scores = self._store.scores(query, store_rows)
+                all_ids.append(self._store.ids[store_rows])
+            all_scores.append(store_scores)
+        return np.concatenate(all_ids), np.concatenate(all_scores)
+
+    def search(self, query_vector, top_k=3, threshold=0.25, ids=None):
+        """
+        Возвращает до top_k пар (id статьи, сходство), отсортированных по убыванию.
+        Пары со сходством ниже threshold отбрасываются.
+        ids — если передан, сравниваем запрос только с этими статьями.
+        """
+        query = self._normalize(query_vector)
+        with self._lock:
+            row_ids, scores = self._scores(query, ids)
+            if not row_ids.shape[0] or top_k <= 0:
+                return []
+
+            # argpartition находит top_k за O(n), полностью сортируем только победителей
+            k = min(top_k, scores.shape[0])
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(int(row_ids[i]), float(scores[i])) for i in top if scores[i] >= threshold]
@@ -1,10 +1,17 @@
 from rest_framework import viewsets, permissions
-from .models import Post
-from .serializers import PostListSerializer, PostDetailSerializer, PostCreateUpdateSerializer
+from rest_framework.decorators import action
+from .models import Post, Tag
+from .serializers import PostListSerializer, PostDetailSerializer, PostCreateUpdateSerializer, PostSearchSerializer
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.response import Response
-from .ai_search import search_articles_semantically
+from .ai_search import search_articles_semantically, get_search_stats
+from . import response_cache
+from .corpus import get_article_version, get_content_version
+from .response_cache import cached_response
+from .pagination import get_article_paginator
+from users.authentication import is_psychologist
+from api.conditional import make_etag, not_modified, set_etag
 
 
 @api_view(['POST'])
@@ -29,9 +36,18 @@ def ai_search_view(request):
         return Response([], status=200) # Возвращаем пустой список при ошибке
     
     # Сериализуем результаты (превращаем объекты Django в JSON)
-    serializer = PostListSerializer(found_articles, many=True)
+    serializer = PostSearchSerializer(found_articles, many=True)
     
     return Response(serializer.data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def ai_search_stats_view(request):
+    """
+    Статистика ИИ-поиска: кэши (попадания, промахи, размер) и заполнение батчей модели.
+    """
+    return Response(get_search_stats())
 # КАСТОМНОЕ РАЗРЕШЕНИЕ: Чтение для всех, запись только для психологов
 class IsPsychologistOrReadOnly(permissions.BasePermission):
     """
@@ -43,19 +59,39 @@ class IsPsychologistOrReadOnly(permissions.BasePermission):
             return True
         
         # Для небезопасных методов (POST, PUT, DELETE)
-        # Требуем аутентификации И наличие разрешения 'users.psych'
-        # Проверка 'users.psych' берется из вашей модели пользователя
-        return request.user and request.user.is_authenticated and request.user.has_perm('users.psych')
+        # Требуем аутентификации И наличие разрешения 'users.psych' (из токена, см. users/authentication.py)
+        return is_psychologist(request.user)
 
 
 # ОБНОВЛЕННЫЙ VIEWSET
 class ArticleViewSet(viewsets.ModelViewSet): # ⬅️ Меняем на ModelViewSet для включения POST/PUT/DELETE
-    queryset = Post.objects.all()
+    # Теги каждой статьи сериализатор берёт через obj.tags.all() — подгружаем их одним запросом на весь список
+    queryset = Post.objects.prefetch_related('tags')
+    # Поля карточки в списке (PostListSerializer) и created_at для курсора: полный текст в списке не нужен
+    LIST_FIELDS = ['id', 'title', 'excerpt', 'read_time', 'created_at']
     # Убираем 'authentication_classes = []' для работы JWT-аутентификации
     permission_classes = [IsPsychologistOrReadOnly] # ⬅️ Используем новое разрешение
     
     # perform_create не нужен, так как автора устанавливать не требуется
     
+    @property
+    def paginator(self):
+        # Курсор или номера страниц — по параметрам запроса (см. articles/pagination.py)
+        if not hasattr(self, '_paginator'):
+            self._paginator = get_article_paginator(self.request) if self.action == 'list' else None
+        return self._paginator
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action != 'list':
+            return queryset
+        queryset = queryset.only(*self.LIST_FIELDS).order_by('-created_at', '-id')
+        # ?tag=Стресс — статьи с этим тегом
+        tag = self.request.query_params.get('tag')
+        if tag:
+            queryset = queryset.filter(tags__name=tag)
+        return queryset
+
     def get_serializer_class(self):
         # Используем сериализатор для создания/обновления
         if self.action in ['create', 'update', 'partial_update']:
@@ -65,4 +101,40 @@ class ArticleViewSet(viewsets.ModelViewSet): # ⬅️ Меняем на ModelVie
         if self.action == 'list':
             return PostListSerializer
             
-        return PostDetailSerializer
\ No newline at end of file
+        return PostDetailSerializer
+
+    # Список и карточка статьи меняются только вместе со своей версией (articles/signals.py):
+    # список — с версией содержимого, карточка — с версией статьи.
+    # Версии лежат в кэше, поэтому повторный запрос без изменений — 304 без единого запроса к БД,
+    # а запрос без If-None-Match — ответ из кэша ответов (articles/response_cache.py), тоже без БД.
+    # Версию читаем до данных: если статья изменится посередине, тег окажется старым и клиент просто перезапросит
+    def _conditional(self, request, kind, version, handler, *args, **kwargs):
+        etag = make_etag(request, 'articles', kind, version)
+        response = not_modified(request, etag)
+        if response is None:
+            response = cached_response(request, kind, version, lambda: handler(request, *args, **kwargs))
+            response = set_etag(response, etag)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(request, 'list', get_content_version(), super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            post_id = int(kwargs[self.lookup_url_kwarg or self.lookup_field])
+        except ValueError:
+            # Такой статьи всё равно нет; а «01» и «1» не должны читать разные версии одной статьи
+            return super().retrieve(request, *args, **kwargs)
+        return self._conditional(request, 'detail', get_article_version(post_id), super().retrieve, *args, **kwargs)
+
+    # GET /v1/articles/cache-stats/ — попадания в кэш ответов статей (в этом процессе)
+    @action(detail=False, methods=['get'], url_path='cache-stats', permission_classes=[IsAdminUser])
+    def cache_stats(self, request):
+        return Response(response_cache.stats.stats())
+
+    # GET /v1/articles/tags/ — названия всех тегов для фильтра: в постраничном списке видны не все
+    @action(detail=False, methods=['get'])
+    def tags(self, request):
+        return self._conditional(request, 'tags', get_content_version(), lambda request: Response(
+            list(Tag.objects.order_by('name').values_list('name', flat=True))
+        ))
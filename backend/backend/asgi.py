@@ -5,6 +5,9 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+HTTP обслуживает Django, WebSocket (ws/chats/...) — consumers из chat/consumers.py.
+Запуск из папки backend: daphne -b 127.0.0.1 -p 8001 backend.asgi:application
 """
 
 import os
@@ -13,4 +16,16 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+# Django настраивается до импорта consumers (они импортируют модели)
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from chat.middleware import JWTAuthMiddleware  # noqa: E402
+from chat.routing import websocket_urlpatterns  # noqa: E402
+
+# Проверки Origin нет намеренно: сокет аутентифицируется только токеном из строки запроса (не cookie),
+# а фронтенд, как и для REST (CORS_ALLOW_ALL_ORIGINS), может жить на другом домене
+application = ProtocolTypeRouter({
+    'http': django_asgi_app,
+    'websocket': JWTAuthMiddleware(URLRouter(websocket_urlpatterns)),
+})
@@ -1,6 +1,7 @@
 from datetime import timedelta
 from pathlib import Path
 import os
+import sys
 from dotenv import load_dotenv
 load_dotenv()
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -34,6 +35,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым, чтобы учитывать SQL всех остальных middleware (сессии, аутентификация)
+    "api.middleware.QueryBudgetMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -47,7 +50,8 @@ MIDDLEWARE = [
 ROOT_URLCONF = 'backend.urls'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',  # JWT аутентификация
+        # JWT аутентификация без запроса к БД: пользователь и право psych — из клеймов токена
+        'users.authentication.ClaimsJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',         # Сессионная аутентификация для браузера
     ),
     'DEFAULT_PERMISSION_CLASSES': (
@@ -70,7 +74,9 @@ TEMPLATES = [
     },
 ]
 SIMPLE_JWT = {
-    'ACCESS_TOKEN_LIFETIME': timedelta(hours=9),
+    # Коротко: access проверяется без БД (users/authentication.py), и заблокированный пользователь
+    # теряет доступ, только когда истечёт access, — при обновлении по refresh is_active проверяется по БД
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=15),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'ROTATE_REFRESH_TOKENS': False,
     'BLACKLIST_AFTER_ROTATION': True,
@@ -133,6 +139,63 @@ STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 ADMIN_MEDIA_PREFIX = '/static/admin/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+# Файл квантованных векторов статей для ИИ-поиска (создаётся командой build_embedding_store)
+AI_SEARCH_EMBEDDING_STORE = os.path.join(BASE_DIR, 'article_embeddings.bin')
+# Тесты (manage.py test) идут на детерминированной заглушке вместо модели ИИ (articles/encoder.py):
+# им не нужны ни веса модели, ни сеть
+if sys.argv[1:2] == ['test']:
+    AI_SEARCH_ENCODER = 'stub'
+# Кэш, общий для всех процессов сервера (воркеры gunicorn): в нём лежат версии статей (articles/corpus.py),
+# по которым процессы узнают о правках, сделанных в других процессах, и кэш ответов статей.
+# Кэш в памяти процесса (LocMem) здесь не подходит: остальные процессы не увидели бы новых версий.
+# REDIS_URL в окружении — Redis (общий и для нескольких серверов), иначе — файлы в DJANGO_CACHE_DIR.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('DJANGO_CACHE_DIR', os.path.join(BASE_DIR, 'cache')),
+        }
+    }
+# Слой каналов для доставки сообщений чата по WebSocket (chat/realtime.py).
+# InMemoryChannelLayer рассылает только внутри своего процесса: сообщение, сохранённое одним процессом,
+# получат лишь сокеты, подключённые к нему же. Поэтому без Redis HTTP и WebSocket должен обслуживать
+# один процесс daphne (run.py). С REDIS_URL — channels_redis, и процессов может быть сколько угодно.
+if os.getenv('REDIS_URL'):
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [os.getenv('REDIS_URL')]},
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'},
+    }
+# Учёт SQL-запросов (api/middleware.py): запросы, превысившие пороги, пишутся в лог api.queries
+# предупреждением со списком самых медленных SQL. QUERY_LOG_LEVEL=INFO в окружении — строка на каждый запрос
+QUERY_BUDGET_WARN_QUERIES = 30
+QUERY_BUDGET_WARN_MS = 200
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api.queries': {
+            'handlers': ['console'],
+            'level': os.getenv('QUERY_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOWS_CREDENTIALS = True
 AUTH_USER_MODEL = 'users.User'
\ No newline at end of file
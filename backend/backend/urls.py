@@ -1,11 +1,10 @@
 from django.contrib import admin
 from django.urls import path, include
 from users.views import *
-from rest_framework_simplejwt.views import TokenRefreshView
 urlpatterns = [
     path('admin/', admin.site.urls),
     path("api/token/", MyTokenObtainPairView.as_view(), name="get_token"),
-    path("api/token/refresh/", TokenRefreshView.as_view(), name="refresh"),
+    path("api/token/refresh/", MyTokenRefreshView.as_view(), name="refresh"),
     path("api-auth/", include("rest_framework.urls")),
     path('api/', include('api.urls')),
 ]
\ No newline at end of file
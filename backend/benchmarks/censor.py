@@ -0,0 +1,145 @@
+"""
+Микробенчмарк проверки сообщений на запрещённые слова.
+
+Сравнивает прежнюю реализацию (файл читается и бор pygtrie строится заново на каждый вызов)
+с автоматом Ахо-Корасик из chat/censor.py, который собирается один раз и ищет по нормализованному тексту.
+В часть сообщений вставляется запрещённое слово — как есть или замаскированное
+(регистр, латинские буквы, повторы, разделители, другая форма слова); для каждого способа
+считается доля пойманных сообщений, для чистых сообщений — доля ложных срабатываний.
+
+Запуск из папки backend:
+    python -m benchmarks.censor --messages 3000 --output censor.json
+"""
+import argparse
+import os
+import random
+from .common import percentiles, run_metadata, timed_ms, write_report
+from .search_latency import VOCABULARY
+from chat.censor import ENDINGS, VERB_ENDINGS, WordFilter, load_words, normalize, stem
+
+WORDS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'chat', 'censored_words.txt')
+
+# Связки и частые слова переписки, чтобы сообщения были похожи на живые
+CHAT_WORDS = """
+я ты мы он она они это что как не да нет но и а в на с у к по за от до если когда потому почему
+очень просто сегодня вчера завтра сейчас опять снова уже еще тоже можно нужно хочу могу знаю думаю
+понимаю кажется честно спасибо привет здравствуйте извините пожалуйста ладно хорошо плохо
+""".split()
+
+
+VARIANTS = ['plain', 'case', 'homoglyph', 'repeat', 'separator', 'inflected']
+
+
+def legacy_censor(value):
+    """Прежняя реализация chat.custom_filters.censor — для сравнения."""
+    from pygtrie import Trie
+    if isinstance(value, str):
+        censored_words = Trie()
+        with open(WORDS_PATH, 'r', encoding='utf-8') as file:
+            for word in file:
+                censored_words[word.strip()] = True
+        for word in value.split():
+            if word.strip('.,!?') in censored_words:
+                return True
+    return False
+
+
+# Обратная таблица: русская буква -> похожая латинская
+LOOKALIKES = {'а': 'a', 'с': 'c', 'е': 'e', 'к': 'k', 'м': 'm', 'о': 'o', 'р': 'p', 'т': 't', 'х': 'x', 'у': 'y', 'б': '6'}
+
+
+def disguise(rng, word, variant, stems):
+    if variant == 'case':
+        return rng.choice([word.upper(), word.capitalize()])
+    if variant == 'homoglyph':
+        return ''.join(LOOKALIKES[char] if char in LOOKALIKES and rng.random() < 0.5 else char for char in word)
+    if variant == 'repeat':
+        position = rng.randrange(len(word))
+        return word[:position] + word[position] * rng.randint(2, 4) + word[position:]
+    if variant == 'separator':
+        return rng.choice(['-', '.', ' ', '*', '_']).join(word)
+    if variant == 'inflected':
+        word_stem, forms = rng.choice(stems)
+        endings = [ending for ending in ENDINGS if word_stem + ending not in forms]
+        return word_stem + rng.choice(endings)
+    return word
+
+
+def make_message(rng, banned, stems, variant):
+    words = rng.choices(CHAT_WORDS + VOCABULARY, k=rng.randint(3, 60))
+    if variant:
+        words.insert(rng.randrange(len(words) + 1), disguise(rng, rng.choice(banned), variant, stems))
+    text = ''
+    for word in words:
+        text += word + rng.choice(['', '', '', ',', '.', '!', '?']) + ' '
+    return text.strip()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--per-variant', type=int, default=100, help="Сколько сообщений с каждым способом маскировки")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Куда записать JSON")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+    words = load_words(WORDS_PATH)
+    banned = [word for word in words if word.isalpha() and word.lower() == word and not word.isascii()]
+    forms = {}
+    for word in banned:
+        if not word.endswith(VERB_ENDINGS) and stem(word) != word:
+            forms.setdefault(stem(word), set()).add(word)
+    stems = sorted(forms.items())
+
+    variants = [variant for variant in VARIANTS for _ in range(args.per_variant)]
+    variants += [None] * max(0, args.messages - len(variants))
+    rng.shuffle(variants)
+    messages = [make_message(rng, banned, stems, variant) for variant in variants]
+
+    word_filter = WordFilter(WORDS_PATH)
+    build_ms, _ = timed_ms(word_filter.contains, '')
+
+    legacy = [timed_ms(legacy_censor, message) for message in messages]
+    compiled = [timed_ms(word_filter.contains, message) for message in messages]
+    normalize_ms = [timed_ms(normalize, message)[0] for message in messages]
+
+    detection = {}
+    for variant in VARIANTS:
+        rows = [i for i, v in enumerate(variants) if v == variant]
+        detection[variant] = {
+            'messages': len(rows),
+            'legacy': round(sum(legacy[i][1] for i in rows) / len(rows), 3) if rows else None,
+            'compiled': round(sum(compiled[i][1] for i in rows) / len(rows), 3) if rows else None,
+        }
+    clean = [i for i, v in enumerate(variants) if v is None]
+
+    legacy_ms = percentiles([ms for ms, _ in legacy])
+    compiled_ms = percentiles([ms for ms, _ in compiled])
+    total_chars = sum(map(len, messages))
+    write_report({
+        'benchmark': 'censor',
+        'meta': run_metadata(),
+        'params': vars(args),
+        'words': len(words),
+        'mean_message_chars': round(total_chars / len(messages), 1),
+        'automaton_build_ms': round(build_ms, 3),
+        'detection': detection,
+        'false_positives': {
+            'messages': len(clean),
+            'legacy': round(sum(legacy[i][1] for i in clean) / len(clean), 4) if clean else None,
+            'compiled': round(sum(compiled[i][1] for i in clean) / len(clean), 4) if clean else None,
+        },
+        'legacy_ms': legacy_ms,
+        'compiled_ms': compiled_ms,
+        'normalize_ms': percentiles(normalize_ms),
+        'compiled_chars_per_second': round(total_chars / (sum(ms for ms, _ in compiled) / 1000)),
+        'speedup_mean': round(legacy_ms['mean'] / compiled_ms['mean'], 1) if compiled_ms['mean'] else None,
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+
+def setup_django(stub_encoder=False, db_path=None):
+    """Настраивает Django на benchmarks.settings. Вызывать до импорта моделей."""
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'benchmarks.settings'
+    if stub_encoder:
+        os.environ['BENCH_STUB_ENCODER'] = '1'
+    if db_path:
+        os.environ['BENCH_DB'] = db_path
+    import django
+    django.setup()
+
+
+def percentiles(samples_ms):
+    """p50/p90/p95/p99/max в миллисекундах."""
+    if not samples_ms:
+        return {}
+    ordered = sorted(samples_ms)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+    return {
+        'count': len(ordered),
+        'mean': round(sum(ordered) / len(ordered), 3),
+        'p50': pick(0.50),
+        'p90': pick(0.90),
+        'p95': pick(0.95),
+        'p99': pick(0.99),
+        'max': round(ordered[-1], 3),
+    }
+
+
+def timed_ms(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return (time.perf_counter() - started) * 1000, result
+
+
+def peak_rss_mb():
+    # На Linux ru_maxrss в килобайтах
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def run_metadata():
+    """Сведения о прогоне, чтобы результаты разных коммитов можно было сравнивать."""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    import numpy
+    return {
+        'commit': commit,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'numpy': numpy.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def write_report(report, output):
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    print(text)
@@ -0,0 +1,156 @@
+"""
+Бенчмарк поиска пользователя при входе и генерации токенов учеников.
+
+Создаёт в локальной SQLite пользователей (по умолчанию 100000: психологи с email и ученики с токенами)
+и для каждого размера меряет задержки поиска:
+  - прежним способом (email__iexact / token__iexact — LIKE по всей таблице),
+  - по нормализованным ключам email_key / token_key с уникальным индексом (User.objects.find_by_login),
+и сохраняет план запроса (EXPLAIN) для обоих.
+Отдельно считает совпадения токенов: прежний uuid4().hex[::10] (4 шестнадцатеричных символа)
+и текущий генератор CustomUserManager.generate_token.
+Результат печатается (и пишется в --output) в JSON.
+
+Запуск из папки backend:
+    python -m benchmarks.login_lookup --sizes 1000 10000 100000 --output login.json
+"""
+import argparse
+import os
+import random
+import tempfile
+import uuid
+from .common import percentiles, run_metadata, setup_django, timed_ms, write_report
+
+
+def legacy_token():
+    """Прежний CustomUserManager: uuid4().hex[::10]."""
+    return uuid.uuid4().hex[::10]
+
+
+def legacy_lookup(User, login):
+    """Прежний MyTokenObtainPairSerializer.validate."""
+    if '@' in login:
+        return User.objects.filter(email__iexact=login).first()
+    return User.objects.filter(token__iexact=login).first()
+
+
+def signups_until_collision(generate, limit):
+    """Сколько токенов выдаётся до первого повтора (None — повтора не было за limit штук)."""
+    seen = set()
+    for count in range(1, limit + 1):
+        token = generate()
+        if token in seen:
+            return count
+        seen.add(token)
+    return None
+
+
+def create_users(User, make_password, rng, count, psychologist_share):
+    """Добавляет count пользователей пачками через bulk_create (пароль хешируется один раз на всех)."""
+    password = make_password('bench-password')
+    start = User.objects.count()
+    created = 0
+    while created < count:
+        chunk = min(5000, count - created)
+        users = []
+        for number in range(start + created, start + created + chunk):
+            if rng.random() < psychologist_share:
+                user = User(email=f'Psychologist.{number}@School{number % 50}.RU', token=f'p{number}')
+            else:
+                user = User(token=User.objects.generate_token())
+            user.password = password
+            user.fill_login_keys()
+            users.append(user)
+        User.objects.bulk_create(users)
+        created += chunk
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--lookups', type=int, default=500, help="Сколько входов на каждый размер")
+    parser.add_argument('--psychologist-share', type=float, default=0.05)
+    parser.add_argument('--collision-trials', type=int, default=200,
+                        help="Сколько раз выдавать прежние токены до первого совпадения")
+    parser.add_argument('--tokens', type=int, default=1000000, help="Сколько токенов текущей схемы проверить на совпадения")
+    parser.add_argument('--db', help="Файл SQLite (по умолчанию временный)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Куда записать JSON")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix='psycho-bench-'), 'bench.sqlite3')
+    setup_django(db_path=db_path)
+
+    from django.contrib.auth.hashers import make_password
+    from django.core.management import call_command
+    from users.models import TOKEN_ALPHABET, TOKEN_LENGTH, User
+
+    call_command('migrate', verbosity=0)
+    if User.objects.exists():
+        raise SystemExit(f"База {db_path} не пустая — укажите другой --db")
+
+    rng = random.Random(args.seed)
+
+    def logins(count):
+        """Случайные существующие пользователи, введённые в другом регистре, и немного несуществующих."""
+        pks = rng.sample(range(1, User.objects.count() + 1), count)
+        result = []
+        for email, token in User.objects.filter(pk__in=pks).values_list('email', 'token'):
+            result.append(email.upper() if email else token.upper())
+        result += ['nobody@school.ru', 'zzzzzzzzzz'] * max(1, count // 20)
+        rng.shuffle(result)
+        return result
+
+    results = []
+    for size in sorted(set(args.sizes)):
+        create_ms, _ = timed_ms(
+            create_users, User, make_password, rng, size - User.objects.count(), args.psychologist_share,
+        )
+        sample = logins(min(args.lookups, size))
+        legacy = [timed_ms(legacy_lookup, User, login)[0] for login in sample]
+        indexed = [timed_ms(User.objects.find_by_login, login)[0] for login in sample]
+        assert all(legacy_lookup(User, login) == User.objects.find_by_login(login) for login in sample[:50])
+
+        email, token = 'PSYCHOLOGIST.1@SCHOOL1.RU', 'ZZZZZZZZZZ'
+        results.append({
+            'users': size,
+            'create_seconds': round(create_ms / 1000, 3),
+            'legacy_iexact_ms': percentiles(legacy),
+            'indexed_key_ms': percentiles(indexed),
+            'plans': {
+                'legacy_email': User.objects.filter(email__iexact=email).explain(),
+                'legacy_token': User.objects.filter(token__iexact=token).explain(),
+                'indexed_email': User.objects.filter(email_key=email.casefold()).explain(),
+                'indexed_token': User.objects.filter(token_key=token.casefold()).explain(),
+            },
+        })
+        print(
+            f"{size} пользователей: p50 iexact {results[-1]['legacy_iexact_ms']['p50']} мс, "
+            f"по ключу {results[-1]['indexed_key_ms']['p50']} мс",
+            flush=True,
+        )
+
+    collisions = [signups_until_collision(legacy_token, 16 ** 4 + 1) for _ in range(args.collision_trials)]
+    current = signups_until_collision(User.objects.generate_token, args.tokens)
+    space = len(TOKEN_ALPHABET) ** TOKEN_LENGTH
+    write_report({
+        'benchmark': 'login_lookup',
+        'meta': dict(run_metadata(), db=db_path),
+        'params': vars(args),
+        'results': results,
+        'tokens': {
+            'legacy_space': 16 ** 4,
+            'legacy_signups_until_collision': percentiles(collisions),
+            'current_space': space,
+            'current_first_collision': current,
+            'current_tokens_checked': args.tokens,
+            # Вероятность хотя бы одного совпадения среди --tokens токенов (парадокс дней рождения)
+            'current_collision_probability': args.tokens * (args.tokens - 1) / 2 / space,
+        },
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
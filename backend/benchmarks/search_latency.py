@@ -0,0 +1,160 @@
+"""
+Бенчмарк ИИ-поиска статей в зависимости от размера корпуса.
+
+Создаёт в локальной SQLite синтетические статьи (100 -> 100000), заполняет векторы командой
+embed_articles и для каждого размера меряет:
+  - загрузку модели и индексов (холодный запрос),
+  - задержки тёплых запросов (промахи кэша), повторных запросов (попадания) и эндпоинта ai-search,
+  - пропускную способность при нескольких одновременных клиентах,
+  - пиковую память процесса.
+Результат печатается (и пишется в --output) в JSON, чтобы сравнивать прогоны разных коммитов.
+
+Запуск из папки backend:
+    python -m benchmarks.search_latency --stub-encoder --sizes 100 1000 10000 100000 --output bench.json
+--stub-encoder подменяет модель детерминированной заглушкой и позволяет запускать бенчмарк без весов.
+"""
+import argparse
+import io
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .common import peak_rss_mb, percentiles, run_metadata, setup_django, timed_ms, write_report
+
+# Словарь для синтетических статей и запросов: темы, с которыми приходят школьники, и нейтральные слова
+VOCABULARY = """
+стресс экзамены учеба оценки семья родители друзья одноклассники учитель школа тревога страх
+сон усталость бессонница отношения ссора конфликт обида одиночество самооценка уверенность
+буллинг травля давление ожидания будущее профессия выбор мотивация лень прокрастинация время
+режим спорт здоровье настроение грусть злость слезы поддержка помощь разговор доверие совет
+дом брат сестра развод переезд новый класс контрольная домашнее задание вечер утро неделя каникулы
+телефон соцсети игры интернет внимание память концентрация отдых прогулка музыка книга
+""".split()
+
+
+# Остальные слова текста — из большого «словаря» с распределением Ципфа, как в живом тексте:
+# иначе каждое слово встречается почти в каждой статье и лексический индекс меряется в худшем случае
+FILLER = [f"слово{i}" for i in range(20000)]
+FILLER_WEIGHTS = [1 / (rank + 1) for rank in range(len(FILLER))]
+TOPIC_SHARE = 0.3
+
+
+def make_text(rng, words):
+    topic = sum(rng.random() < TOPIC_SHARE for _ in range(words))
+    chosen = [rng.choice(VOCABULARY) for _ in range(topic)]
+    chosen += rng.choices(FILLER, weights=FILLER_WEIGHTS, k=words - topic)
+    rng.shuffle(chosen)
+    return ' '.join(chosen)
+
+
+def make_query(rng, words):
+    return ' '.join(rng.choice(VOCABULARY) for _ in range(words))
+
+
+def create_posts(Post, rng, count, text_words):
+    """Добавляет count статей пачками через bulk_create (сигналы не срабатывают, как при импорте архива)."""
+    created = 0
+    while created < count:
+        chunk = min(5000, count - created)
+        Post.objects.bulk_create([
+            Post(title=make_text(rng, 5), excerpt=make_text(rng, 15), text=make_text(rng, text_words))
+            for _ in range(chunk)
+        ])
+        created += chunk
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 100000])
+    parser.add_argument('--queries', type=int, default=200, help="Сколько разных запросов на каждый размер")
+    parser.add_argument('--query-words', type=int, default=5)
+    parser.add_argument('--view-queries', type=int, default=50, help="Сколько запросов через эндпоинт ai-search")
+    parser.add_argument('--concurrency', type=int, default=8, help="Число одновременных клиентов при замере пропускной способности")
+    parser.add_argument('--text-words', type=int, default=120, help="Длина полного текста синтетической статьи")
+    parser.add_argument('--stub-encoder', action='store_true', help="Заглушка вместо модели (не нужны веса)")
+    parser.add_argument('--db', help="Файл SQLite (по умолчанию временный)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Куда записать JSON")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix='psycho-bench-'), 'bench.sqlite3')
+    setup_django(stub_encoder=args.stub_encoder, db_path=db_path)
+
+    from django.core.management import call_command
+    from django.test import Client
+    from articles import ai_search, encoder
+    from articles.corpus import bump_corpus_version
+    from articles.models import Post
+
+    call_command('migrate', verbosity=0)
+    if Post.objects.exists():
+        raise SystemExit(f"База {db_path} не пустая — укажите другой --db")
+
+    load_seconds = encoder.warm_up()
+    if load_seconds is None:
+        raise SystemExit("Модель ИИ не загружена (для запуска без весов используйте --stub-encoder)")
+
+    rng = random.Random(args.seed)
+    client = Client()
+    search = ai_search.search_articles_semantically
+
+    def fresh_queries(count):
+        return [make_query(rng, args.query_words) for _ in range(count)]
+
+    results = []
+    for size in sorted(set(args.sizes)):
+        create_ms, _ = timed_ms(create_posts, Post, rng, size - Post.objects.count(), args.text_words)
+        embed_ms, _ = timed_ms(call_command, 'embed_articles', batch_size=256, chunk_size=2000, stdout=io.StringIO())
+
+        # Холодный запрос: индексы перечитываются из БД
+        bump_corpus_version()
+        cold_ms, _ = timed_ms(search, make_query(rng, args.query_words))
+
+        queries = fresh_queries(args.queries)
+        warm = [timed_ms(search, query)[0] for query in queries]
+        cached = [timed_ms(search, query)[0] for query in queries]
+
+        view = [
+            timed_ms(client.post, '/api/v1/articles/ai-search/', {'query': query}, content_type='application/json')[0]
+            for query in fresh_queries(args.view_queries)
+        ]
+
+        concurrent_queries = fresh_queries(args.queries)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            concurrent = list(executor.map(lambda query: timed_ms(search, query)[0], concurrent_queries))
+        elapsed = time.perf_counter() - started
+
+        results.append({
+            'articles': size,
+            'create_seconds': round(create_ms / 1000, 3),
+            'embed_seconds': round(embed_ms / 1000, 3),
+            'cold_query_ms': round(cold_ms, 3),
+            'warm_ms': percentiles(warm),
+            'cached_ms': percentiles(cached),
+            'view_ms': percentiles(view),
+            'concurrent': {
+                'clients': args.concurrency,
+                'throughput_qps': round(len(concurrent_queries) / elapsed, 1),
+                'latency_ms': percentiles(concurrent),
+            },
+            'search_stats': ai_search.get_search_stats(),
+            'peak_rss_mb': peak_rss_mb(),
+        })
+        print(f"{size} статей: тёплый p50 {results[-1]['warm_ms']['p50']} мс", flush=True)
+
+    write_report({
+        'benchmark': 'search_latency',
+        'meta': dict(run_metadata(), encoder=encoder.MODEL_NAME, db=db_path),
+        'params': vars(args),
+        'model_load_seconds': round(load_seconds, 3),
+        'results': results,
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
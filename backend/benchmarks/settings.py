@@ -0,0 +1,27 @@
+# Настройки для бенчмарков: локальная SQLite вместо рабочей MySQL.
+# Путь к базе — переменная окружения BENCH_DB, заглушка модели — BENCH_STUB_ENCODER=1.
+import os
+import tempfile
+from backend.settings import *  # noqa: F401,F403
+
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('BENCH_DB') or os.path.join(tempfile.gettempdir(), 'psycho_bench.sqlite3'),
+    }
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Файл векторов не используем, чтобы замеры не зависели от того, что лежит на диске
+AI_SEARCH_EMBEDDING_STORE = None
+
+if os.environ.get('BENCH_STUB_ENCODER') == '1':
+    AI_SEARCH_ENCODER = 'stub'
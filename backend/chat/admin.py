@@ -1,3 +1,26 @@
 from django.contrib import admin
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+from .models import PsychologistLoad
 
-# Register your models here.
+
+@admin.register(PsychologistLoad)
+class PsychologistLoadAdmin(admin.ModelAdmin):
+    list_display = ('psychologist', 'active_chats', 'capacity', 'load', 'is_available')
+    list_editable = ('capacity', 'is_available')
+    list_filter = ('is_available',)
+    ordering = ('load',)
+    # Счётчик меняется вместе с чатами, руками его не правим (пересчёт — rebuild_psychologist_load)
+    readonly_fields = ('active_chats', 'load')
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.load = obj.active_chats / obj.capacity
+            super().save_model(request, obj, form, change)
+            return
+        # Только норма и доступность: полное сохранение затёрло бы счётчик, изменённый параллельно
+        PsychologistLoad.objects.filter(pk=obj.pk).update(
+            capacity=obj.capacity,
+            is_available=obj.is_available,
+            load=Cast(F('active_chats'), FloatField()) / obj.capacity,
+        )
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ChatConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'chat'
+
+    def ready(self):
+        # Подключаем обработчики сигналов (превью последнего сообщения в чате)
+        from . import signals  # noqa: F401
@@ -0,0 +1,105 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Q
+from users.models import User
+from .models import Chat, PsychologistLoad
+
+# Назначение психолога новому чату.
+# Выбирается наименее занятый (active_chats / capacity) из принимающих чаты — по индексу, одной строкой.
+# Строка выбранного психолога блокируется до конца транзакции, а занятые другими транзакциями пропускаются
+# (SKIP LOCKED): при наплыве регистраций одновременные запросы расходятся по разным психологам,
+# а не ждут друг друга и не достаются все одному.
+
+
+class ActiveChatExists(Exception):
+    pass
+
+
+class NoPsychologistAvailable(Exception):
+    pass
+
+
+def psychologists():
+    """Активные пользователи с правом users.psych (выданным напрямую или через группу)."""
+    perm = {'codename': 'psych', 'content_type__app_label': 'users'}
+    return User.objects.filter(
+        Q(**{f'user_permissions__{key}': value for key, value in perm.items()})
+        | Q(**{f'groups__permissions__{key}': value for key, value in perm.items()}),
+        is_active=True,
+    ).distinct()
+
+
+def sync_psychologists():
+    """
+    Заводит строки загрузки новым психологам (сразу с числом их активных чатов)
+    и убирает тех, у кого больше нет права. Возвращает число добавленных.
+    """
+    ids = set(psychologists().values_list('pk', flat=True))
+    PsychologistLoad.objects.exclude(psychologist__in=ids).delete()
+    new = ids - set(PsychologistLoad.objects.values_list('psychologist_id', flat=True))
+    if not new:
+        return 0
+    counts = dict(
+        Chat.objects.filter(psychologist__in=new, is_active=True)
+        .values('psychologist').annotate(total=Count('id')).values_list('psychologist', 'total')
+    )
+    loads = []
+    for psychologist_id in sorted(new):
+        load = PsychologistLoad(psychologist_id=psychologist_id, active_chats=counts.get(psychologist_id, 0))
+        load.load = load.active_chats / load.capacity
+        loads.append(load)
+    # ignore_conflicts: строку мог только что создать параллельный запрос
+    PsychologistLoad.objects.bulk_create(loads, ignore_conflicts=True)
+    return len(loads)
+
+
+def _least_loaded(skip_locked):
+    # Заблокированный (is_active=False) психолог чатов не получает, даже если его строка загрузки осталась.
+    # Блокируется только строка загрузки (of='self'), а не строка пользователя из JOIN
+    return (
+        PsychologistLoad.objects.select_for_update(skip_locked=skip_locked, of=('self',))
+        .filter(is_available=True, psychologist__is_active=True)
+        .order_by('load', 'psychologist_id')
+        .values_list('psychologist_id', flat=True)
+        .first()
+    )
+
+
+def pick_psychologist():
+    """
+    id наименее занятого психолога; его строка загрузки остаётся заблокированной до конца транзакции.
+    Вызывать внутри transaction.atomic().
+    """
+    psychologist_id = _least_loaded(skip_locked=True)
+    if psychologist_id is None:
+        # Все подходящие строки заняты параллельными назначениями — ждём самую свободную
+        psychologist_id = _least_loaded(skip_locked=False)
+    if psychologist_id is None and sync_psychologists():
+        # Строк загрузки ещё нет (новая база, новый психолог) — заводим и пробуем снова
+        psychologist_id = _least_loaded(skip_locked=False)
+    return psychologist_id
+
+
+def start_chat(student):
+    """
+    Создаёт ученику активный чат с наименее занятым психологом.
+    Вызывать внутри transaction.atomic(), чтобы вместе с чатом сохранилось и первое сообщение.
+    Бросает ActiveChatExists, если активный чат уже есть, и NoPsychologistAvailable, если назначить некого.
+    """
+    with transaction.atomic():
+        # Блокировка строки ученика: одновременные первые сообщения одного ученика проходят по очереди,
+        # и второй запрос уже видит созданный первым чат
+        User.objects.select_for_update().filter(pk=student.pk).values_list('pk').first()
+        if Chat.objects.filter(student=student, is_active=True).exists():
+            raise ActiveChatExists
+        psychologist_id = pick_psychologist()
+        if psychologist_id is None:
+            raise NoPsychologistAvailable
+        try:
+            # Отдельная точка сохранения: ошибка уникальности не должна портить внешнюю транзакцию
+            with transaction.atomic():
+                chat = Chat.objects.create(student=student, psychologist_id=psychologist_id, is_active=True)
+        except IntegrityError:
+            # Чат создан в обход блокировки (например, из админки) — ограничение в БД не даёт второй активный
+            raise ActiveChatExists
+        PsychologistLoad.adjust(psychologist_id, 1)
+    return chat
@@ -0,0 +1,302 @@
+import os
+import re
+import threading
+
+# Латинские буквы и цифры, которыми подменяют похожие русские буквы («xуй», «6ля», «@»)
+HOMOGLYPHS = str.maketrans({
+    'a': 'а', 'c': 'с', 'e': 'е', 'h': 'н', 'k': 'к', 'm': 'м', 'o': 'о', 'p': 'р',
+    't': 'т', 'u': 'и', 'x': 'х', 'y': 'у', 'ё': 'е',
+    '0': 'о', '3': 'з', '6': 'б', '@': 'а',
+})
+
+# Окончания существительных и прилагательных (от длинных к коротким).
+# Для каждого слова списка в автомат кладётся ещё и основа без окончания,
+# и она засчитывается, если дальше в слове стоит одно из этих окончаний: «шлюх» + «ами».
+ENDINGS = sorted("""
+ами ями ого его ому ему ыми ими ой ей ый ий ая яя ое ее ую юю ых их ым им ом ем ов ев ам ям ах ях ью
+а я о е у ю ы и ь й
+""".split(), key=len, reverse=True)
+ENDING_SET = frozenset(ENDINGS)
+MAX_ENDING = max(map(len, ENDINGS))
+# Короче этого основа совпадает с обычными словами («сук» — «сукно»)
+MIN_STEM_LENGTH = 4
+# Глаголы не сокращаем: их основа + окончание слишком часто даёт приличные слова («кончи» — «кончит»)
+VERB_ENDINGS = ('ть', 'ти', 'ся', 'сь')
+
+# Слово — подряд идущие буквы и цифры; всё остальное (пробелы, знаки, дефисы) — разделители
+WORD_RE = re.compile(r'[^\W_]+')
+CYRILLIC_WORD_RE = re.compile(r'[а-яё]+')
+# Отдельные буквы через разделители («с-л-о-в-о», «х у й») склеиваются в одно слово,
+# если их хотя бы столько и между ними не больше GLUE_GAP символов
+GLUE_MIN_LETTERS = 3
+GLUE_GAP = 3
+
+# Виды шаблонов в автомате
+EXACT = 1
+STEM = 2
+
+
+class AhoCorasick:
+    """
+    Автомат Ахо-Корасик: находит все вхождения любого слова из списка за один проход по тексту.
+    Состояния — узлы бора, для каждого хранятся переходы, суффиксная ссылка
+    и длины слов, которые заканчиваются в этом состоянии (уже вместе со словами по суффиксным ссылкам).
+    """
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        for pattern in patterns:
+            self._add(pattern)
+        self._build()
+
+    def __len__(self):
+        return len(self._goto)
+
+    def _add(self, pattern):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = next_state
+        if len(pattern) not in self._out[state]:
+            self._out[state] += (len(pattern),)
+
+    def _build(self):
+        # Обход в ширину: суффиксная ссылка узла строится по уже готовой ссылке родителя
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[next_state] = fail
+                self._out[next_state] += self._out[fail]
+                queue.append(next_state)
+
+    def iter_matches(self, text):
+        """Отдаёт пары (начало, конец) всех вхождений слов в text в порядке их окончания."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for position, char in enumerate(text, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length in out[state]:
+                yield position - length, position
+
+
+def fold(text):
+    """Нижний регистр и замена похожих латинских букв; длина строки сохраняется."""
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        # Редкие символы, у которых строчная форма длиннее (например, «İ»), оставляем как есть
+        lowered = ''.join(char.lower() if len(char.lower()) == 1 else char for char in text)
+    return lowered.translate(HOMOGLYPHS)
+
+
+def _glued_words(glued):
+    return [glued] if len(glued) >= GLUE_MIN_LETTERS else [[span] for span in glued]
+
+
+def _words(folded):
+    """
+    Отдаёт слова текста списками отрезков (начало, конец).
+    Отдельные буквы склеиваются, если между ними один и тот же короткий разделитель:
+    в «а б-л-я» буква «а» остаётся отдельным словом, а «б-л-я» склеивается.
+    """
+    glued, separator = [], None
+    for match in WORD_RE.finditer(folded):
+        start, end = match.span()
+        if end - start > 1:
+            yield from _glued_words(glued)
+            glued, separator = [], None
+            yield [(start, end)]
+            continue
+        if glued:
+            gap = folded[glued[-1][1]:start]
+            if len(gap) > GLUE_GAP:
+                yield from _glued_words(glued)
+                glued, gap = [], None
+            elif separator is not None and gap != separator:
+                if len(glued) > 2:
+                    # Разделитель сменился после слова по буквам («д-у-р-а-к и») — слово закончилось
+                    yield from _glued_words(glued)
+                    glued, gap = [], None
+                else:
+                    # Первая буква была отдельным словом («а б-л-я») — вторая начинает новую группу
+                    yield from _glued_words(glued[:-1])
+                    glued = glued[-1:]
+            separator = gap
+        glued.append((start, end))
+    yield from _glued_words(glued)
+
+
+def normalize(text):
+    """
+    Приводит текст к виду, в котором ищутся запрещённые слова: нижний регистр, похожие латинские
+    буквы -> русские, повторы букв схлопнуты («бляяя» -> «бля»), разделители внутри слова убраны
+    («с-л-о-в-о» -> «слово»), слова разделены одним пробелом.
+    Возвращает (строка, starts, ends): для каждого её символа — границы в исходном тексте,
+    чтобы найденное можно было показать или замаскировать в оригинале.
+    """
+    folded = fold(text)
+    chars, starts, ends = [], [], []
+    for spans in _words(folded):
+        if chars:
+            chars.append(' ')
+            starts.append(ends[-1])
+            ends.append(ends[-1])
+        previous = None
+        for start, end in spans:
+            for position in range(start, end):
+                char = folded[position]
+                if char == previous:
+                    ends[-1] = position + 1
+                    continue
+                chars.append(char)
+                starts.append(position)
+                ends.append(position + 1)
+                previous = char
+    return ''.join(chars), starts, ends
+
+
+def stem(word):
+    """Отрезает окончание существительного или прилагательного, если остаётся не меньше MIN_STEM_LENGTH букв."""
+    for ending in ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM_LENGTH:
+            return word[:-len(ending)]
+    return word
+
+
+def compile_words(words):
+    """
+    Собирает автомат по нормализованным словам списка и их основам.
+    Возвращает (автомат, {шаблон: EXACT|STEM}).
+    """
+    kinds = {}
+    for word in words:
+        normalized = normalize(word)[0]
+        # «xx» после схлопывания повторов — просто буква «х», такой шаблон ловил бы любое «x»
+        if len(normalized) < 2:
+            continue
+        kinds[normalized] = kinds.get(normalized, 0) | EXACT
+        if CYRILLIC_WORD_RE.fullmatch(word.lower()) and not word.endswith(VERB_ENDINGS):
+            word_stem = stem(normalized)
+            if word_stem != normalized:
+                kinds[word_stem] = kinds.get(word_stem, 0) | STEM
+    return AhoCorasick(kinds), kinds
+
+
+def load_words(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return [word for word in (line.strip() for line in file) if word]
+
+
+class WordFilter:
+    """
+    Запрещённые слова из файла, собранные в автомат один раз на процесс.
+    Автомат пересобирается, только когда меняется время изменения файла (или файла разрешённых слов),
+    поэтому правка списка подхватывается без перезапуска сервера.
+    """
+
+    def __init__(self, path, allowed_path=None):
+        self.path = path
+        # Слова, которые здесь разрешены, хотя есть в общем списке (для статей — медицинские термины)
+        self.allowed_path = allowed_path
+        self._lock = threading.Lock()
+        self._compiled = None
+        self._mtime = None
+
+    def _load(self):
+        words = load_words(self.path)
+        if self.allowed_path:
+            allowed = {normalize(word)[0] for word in load_words(self.allowed_path)}
+            words = [word for word in words if normalize(word)[0] not in allowed]
+        return compile_words(words)
+
+    def _get_compiled(self):
+        try:
+            mtime = tuple(os.stat(path).st_mtime_ns for path in (self.path, self.allowed_path) if path)
+        except OSError:
+            # Файл на мгновение пропал (например, его заменяют) — работаем со старым списком
+            if self._compiled is not None:
+                return self._compiled
+            raise
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self._compiled = self._load()
+                    self._mtime = mtime
+        return self._compiled
+
+    @staticmethod
+    def _iter_spans(compiled, text):
+        """
+        Текст нормализуется и проходится автоматом один раз. Совпадение засчитывается, если оно
+        начинается с начала слова и либо заканчивается вместе со словом (EXACT),
+        либо после него в слове остаётся только окончание (STEM, тогда в ответ входит и окончание).
+        Отдаёт границы совпадений в исходном тексте в порядке их окончания.
+        """
+        automaton, kinds = compiled
+        normalized, starts, ends = normalize(text)
+        for start, end in automaton.iter_matches(normalized):
+            if start and normalized[start - 1] != ' ':
+                continue
+            kind = kinds[normalized[start:end]]
+            word_end = normalized.find(' ', end, end + MAX_ENDING + 1)
+            if word_end == -1:
+                word_end = len(normalized) if len(normalized) - end <= MAX_ENDING else None
+            if word_end == end and kind & EXACT:
+                yield starts[start], ends[end - 1]
+            elif word_end is not None and kind & STEM and normalized[end:word_end] in ENDING_SET:
+                yield starts[start], ends[word_end - 1]
+
+    @staticmethod
+    def _merge(spans):
+        merged = []
+        for start, end in sorted(spans):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    def find(self, text):
+        """Возвращает (начало, конец) первого запрещённого слова в text или None."""
+        return next(self._iter_spans(self._get_compiled(), text), None)
+
+    def contains(self, text):
+        return self.find(text) is not None
+
+    def find_all(self, text):
+        """Все запрещённые слова в text: отсортированный список (начало, конец) без пересечений."""
+        return self._merge(self._iter_spans(self._get_compiled(), text))
+
+    def find_all_many(self, texts):
+        """find_all для пачки текстов: файл списка проверяется и автомат берётся один раз на всю пачку."""
+        compiled = self._get_compiled()
+        return [self._merge(self._iter_spans(compiled, text)) if text else [] for text in texts]
+
+    @staticmethod
+    def mask_spans(text, spans, char='*'):
+        """Заменяет на char все непробельные символы внутри spans, длина текста не меняется."""
+        if not spans:
+            return text
+        chars = list(text)
+        for start, end in spans:
+            for position in range(start, end):
+                if not chars[position].isspace():
+                    chars[position] = char
+        return ''.join(chars)
+
+    def mask(self, text, char='*'):
+        """Текст, в котором запрещённые слова заменены звёздочками."""
+        return self.mask_spans(text, self.find_all(text), char)
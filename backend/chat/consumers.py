@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from .models import Chat
+from .permissions import IsPsychologistOrSelf
+from .realtime import chat_group, user_chats_group
+
+# Коды закрытия соединения (как 401 и 403 у HTTP)
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_FORBIDDEN = 4403
+
+
+class ChatConsumer(AsyncJsonWebsocketConsumer):
+    """
+    ws/chats/<chat_id>/?token=<access JWT> — новые сообщения чата в момент отправки.
+    Доступ — как у REST: IsPsychologistOrSelf. Отправляются сообщения по-прежнему через REST
+    (там цензура и проверки), сокет только доставляет их.
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=CLOSE_UNAUTHORIZED)
+            return
+        chat_id = self.scope['url_route']['kwargs']['chat_id']
+        if not await self.has_access(user, chat_id):
+            await self.close(code=CLOSE_FORBIDDEN)
+            return
+        self.group = chat_group(chat_id)
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        await self.accept()
+
+    @database_sync_to_async
+    def has_access(self, user, chat_id):
+        chat = Chat.objects.filter(pk=chat_id).first()
+        if chat is None:
+            return False
+        permission = IsPsychologistOrSelf()
+        request = SimpleNamespace(user=user)
+        return permission.has_permission(request, self) and permission.has_object_permission(request, self, chat)
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group'):
+            await self.channel_layer.group_discard(self.group, self.channel_name)
+
+    async def chat_message(self, event):
+        await self.send_json({'type': 'message', 'message': event['message']})
+
+    async def chat_read(self, event):
+        await self.send_json({'type': 'read', 'reader_id': event['reader_id'], 'up_to_id': event['up_to_id']})
+
+
+class ChatListConsumer(AsyncJsonWebsocketConsumer):
+    """ws/chats/?token=<access JWT> — обновления списка чатов пользователя (новые чаты и последние сообщения)."""
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=CLOSE_UNAUTHORIZED)
+            return
+        self.group = user_chats_group(user.id)
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group'):
+            await self.channel_layer.group_discard(self.group, self.channel_name)
+
+    async def chat_updated(self, event):
+        await self.send_json({'type': 'chat', 'chat': event['chat']})
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, FloatField, OuterRef, Subquery
+from django.db.models.functions import Cast, Coalesce
+from chat.assignment import sync_psychologists
+from chat.models import Chat, PsychologistLoad
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает загрузку психологов по таблице чатов: заводит строки новым психологам, "
+        "убирает бывших и выставляет число активных чатов. Нужна после правки чатов в обход API."
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            added = sync_psychologists()
+            active = (
+                Chat.objects.filter(psychologist=OuterRef('pk'), is_active=True)
+                .order_by().values('psychologist').annotate(total=Count('id')).values('total')
+            )
+            active_chats = Coalesce(Subquery(active), 0)
+            # load первым — см. PsychologistLoad.adjust
+            updated = PsychologistLoad.objects.update(
+                load=Cast(active_chats, FloatField()) / F('capacity'),
+                active_chats=active_chats,
+            )
+        self.stdout.write(self.style.SUCCESS(f"Психологов: {updated} (новых: {added})"))
+        for load in PsychologistLoad.objects.select_related('psychologist').order_by('load'):
+            state = '' if load.is_available else ' (не принимает чаты)'
+            self.stdout.write(f"  {load.psychologist.email}: {load.active_chats}/{load.capacity}{state}")
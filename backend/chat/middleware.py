@@ -0,0 +1,29 @@
+from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from users.authentication import ClaimsJWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework.exceptions import AuthenticationFailed
+
+
+@database_sync_to_async
+def get_user_from_token(raw_token):
+    """Проверяет access JWT тем же классом, что и REST API, и возвращает пользователя (из клеймов, без БД)."""
+    authentication = ClaimsJWTAuthentication()
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return AnonymousUser()
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Аутентификация WebSocket по ?token=<access JWT>: браузер не даёт передать заголовок
+    Authorization при открытии сокета. Пользователь кладётся в scope['user'].
+    """
+
+    async def __call__(self, scope, receive, send):
+        token = parse_qs(scope.get('query_string', b'').decode()).get('token')
+        scope = dict(scope, user=await get_user_from_token(token[0]) if token else AnonymousUser())
+        return await super().__call__(scope, receive, send)
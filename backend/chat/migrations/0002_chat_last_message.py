@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:04
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Subquery
+from django.db.models.functions import Substr
+
+
+def fill_last_message(apps, schema_editor):
+    # Заполняем превью для уже существующих чатов одним UPDATE с подзапросом
+    Chat = apps.get_model('chat', 'Chat')
+    Message = apps.get_model('chat', 'Message')
+    latest = Message.objects.filter(chat=OuterRef('pk')).order_by('-timestamp', '-id')
+    Chat.objects.filter(Exists(latest)).update(
+        last_message_content=Subquery(latest.annotate(preview=Substr('content', 1, 100)).values('preview')[:1]),
+        last_message_at=Subquery(latest.values('timestamp')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chat',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Время последнего сообщения'),
+        ),
+        migrations.AddField(
+            model_name='chat',
+            name='last_message_content',
+            field=models.CharField(blank=True, default='', max_length=100, verbose_name='Последнее сообщение'),
+        ),
+        migrations.RunPython(fill_last_message, migrations.RunPython.noop),
+    ]
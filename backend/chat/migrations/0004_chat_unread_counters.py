@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-18 21:40
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_unread(apps, schema_editor):
+    Chat = apps.get_model('chat', 'Chat')
+    Message = apps.get_model('chat', 'Message')
+
+    # is_read до сих пор никто не ставил. Считаем прочитанным всё, на что собеседник уже ответил:
+    # сообщения до последнего сообщения другой стороны. Иначе вся старая переписка стала бы «непрочитанной»
+    last_by_side = Message.objects.values('chat', 'chat__student').annotate(
+        last_from_student=Max('id', filter=Q(sender=models.F('chat__student'))),
+        last_to_student=Max('id', filter=~Q(sender=models.F('chat__student'))),
+    )
+    for row in last_by_side.iterator():
+        messages = Message.objects.filter(chat=row['chat'], is_read=False)
+        if row['last_from_student']:
+            # Ученик ответил после этих сообщений психолога — значит, прочитал их
+            messages.filter(id__lt=row['last_from_student']).exclude(sender=row['chat__student']).update(is_read=True)
+        if row['last_to_student']:
+            messages.filter(id__lt=row['last_to_student'], sender=row['chat__student']).update(is_read=True)
+
+    def unread(condition):
+        counted = (
+            Message.objects.filter(condition, chat=OuterRef('pk'), is_read=False)
+            .order_by().values('chat').annotate(total=Count('id')).values('total')
+        )
+        return Coalesce(Subquery(counted), 0)
+
+    Chat.objects.update(
+        unread_by_student=unread(~Q(sender=OuterRef('student'))),
+        unread_by_psychologist=unread(Q(sender=OuterRef('student'))),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_message_chat_ts_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chat',
+            name='unread_by_psychologist',
+            field=models.PositiveIntegerField(default=0, verbose_name='Не прочитано психологом'),
+        ),
+        migrations.AddField(
+            model_name='chat',
+            name='unread_by_student',
+            field=models.PositiveIntegerField(default=0, verbose_name='Не прочитано учеником'),
+        ),
+        migrations.RunPython(fill_unread, migrations.RunPython.noop),
+    ]
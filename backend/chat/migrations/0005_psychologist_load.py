@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:17
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_chat_unread_counters'),
+        ('users', '0002_alter_user_email'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PsychologistLoad',
+            fields=[
+                ('psychologist', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='chat_load', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Психолог')),
+                ('active_chats', models.PositiveIntegerField(default=0, verbose_name='Активных чатов')),
+                ('capacity', models.PositiveIntegerField(default=30, validators=[django.core.validators.MinValueValidator(1)], verbose_name='Норма чатов')),
+                ('load', models.FloatField(default=0, verbose_name='Занятость')),
+                ('is_available', models.BooleanField(default=True, verbose_name='Принимает новые чаты')),
+            ],
+            options={
+                'verbose_name': 'Загрузка психолога',
+                'verbose_name_plural': 'Загрузка психологов',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='chat',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='chat',
+            constraint=models.UniqueConstraint(models.Case(models.When(is_active=True, then='student')), name='chat_one_active_per_student'),
+        ),
+        migrations.AddIndex(
+            model_name='psychologistload',
+            index=models.Index(fields=['is_available', 'load', 'psychologist'], name='chat_load_available_load'),
+        ),
+    ]
@@ -1,12 +1,22 @@
 # chat/models.py
 
-from django.db import models
+from django.core.validators import MinValueValidator
+from django.db import models, transaction
+from django.db.models.functions import Cast
 from django.conf import settings
+from django.utils import timezone
 from users.models import User # Импортируем вашу модель User
 
 # Получаем модель пользователя, настроенную в settings.py
 AUTH_USER_MODEL = settings.AUTH_USER_MODEL 
 
+# Сколько символов последнего сообщения показывается в списке чатов
+LAST_MESSAGE_PREVIEW_LENGTH = 100
+
+# Сколько активных чатов психолог ведёт «в норме» (можно поменять каждому в админке).
+# Новые чаты распределяются по доле занятости: active_chats / capacity
+DEFAULT_PSYCHOLOGIST_CAPACITY = getattr(settings, 'CHAT_PSYCHOLOGIST_CAPACITY', 30)
+
 class Chat(models.Model):
     """Модель, представляющая собой разговор между учеником и психологом."""
     
@@ -37,17 +47,106 @@ class Chat(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Копия последнего сообщения для списка чатов (обновляется сигналом при отправке),
+    # чтобы список не ходил в БД за последним сообщением каждого чата
+    last_message_content = models.CharField(max_length=100, blank=True, default='', verbose_name="Последнее сообщение")
+    last_message_at = models.DateTimeField(null=True, blank=True, verbose_name="Время последнего сообщения")
+
+    # Счётчики непрочитанных сообщений каждой стороны: увеличиваются сигналом при отправке,
+    # уменьшаются в mark_read — список чатов показывает их без подсчёта сообщений
+    unread_by_student = models.PositiveIntegerField(default=0, verbose_name="Не прочитано учеником")
+    unread_by_psychologist = models.PositiveIntegerField(default=0, verbose_name="Не прочитано психологом")
+
     class Meta:
         verbose_name = "Чат"
         verbose_name_plural = "Чаты"
-        # Убеждаемся, что у одного ученика не может быть двух активных чатов одновременно
-        unique_together = ('student', 'is_active') 
+        constraints = [
+            # У одного ученика не может быть двух активных чатов одновременно, а закрытых — сколько угодно.
+            # Индекс по выражению (NULL для закрытых чатов не участвует в уникальности) работает и в MySQL,
+            # где нет частичных индексов
+            models.UniqueConstraint(
+                models.Case(models.When(is_active=True, then='student')), name='chat_one_active_per_student',
+            ),
+        ]
+
+    def unread_field(self, user_id):
+        """
+        Поле счётчика непрочитанных для участника: ученик читает ответы, назначенный психолог — сообщения ученика.
+        Для остальных (другой психолог открыл чужой чат) — None: их просмотр не делает сообщения прочитанными.
+        """
+        if user_id is None:
+            return None
+        if user_id == self.student_id:
+            return 'unread_by_student'
+        if user_id == self.psychologist_id:
+            return 'unread_by_psychologist'
+        return None
+
+    def unread_count(self, user_id):
+        field = self.unread_field(user_id)
+        return getattr(self, field) if field else 0
+
+    def mark_read(self, user_id, up_to_id):
+        """
+        Отмечает прочитанными все сообщения собеседника до up_to_id включительно одним UPDATE
+        и на столько же уменьшает счётчик. Возвращает число отмеченных сообщений (0 для не участника чата).
+        """
+        field = self.unread_field(user_id)
+        if field is None:
+            return 0
+        messages = self.messages.filter(id__lte=up_to_id, is_read=False)
+        if field == 'unread_by_student':
+            messages = messages.exclude(sender=self.student_id)
+        else:
+            messages = messages.filter(sender=self.student_id)
+        with transaction.atomic():
+            # UPDATE считает только строки, которые сам поменял, поэтому два одновременных запроса
+            # не вычтут одно сообщение дважды
+            marked = messages.update(is_read=True)
+            if marked:
+                # Без вычитания ниже нуля: поле беззнаковое, и MySQL не даст записать отрицательное даже временно
+                Chat.objects.filter(pk=self.pk).update(**{field: models.Case(
+                    models.When(**{f'{field}__gt': marked}, then=models.F(field) - marked), default=0,
+                    output_field=models.PositiveIntegerField(),
+                )})
+        if marked:
+            setattr(self, field, max(getattr(self, field) - marked, 0))
+        return marked
+
+    def close(self):
+        """Закрывает чат и освобождает место у психолога. Возвращает False, если чат уже был закрыт."""
+        with transaction.atomic():
+            closed = Chat.objects.filter(pk=self.pk, is_active=True).update(is_active=False, updated_at=timezone.now())
+            if closed and self.psychologist_id:
+                PsychologistLoad.adjust(self.psychologist_id, -1)
+        self.is_active = False
+        return bool(closed)
 
     def __str__(self):
         psy_name = self.psychologist.email if self.psychologist else "Нет назначенного"
         return f"Чат {self.student.token} - {psy_name}"
 
 
+class MessageQuerySet(models.QuerySet):
+    """
+    Выборки сообщений по ключу (timestamp, id) вместо OFFSET: с индексом (chat, timestamp, id)
+    опрос новых сообщений и листание истории читают только нужные строки, а не всю переписку.
+    """
+
+    def after(self, timestamp, message_id=None):
+        """Сообщения новее ключа, от старых к новым."""
+        if message_id is None:
+            condition = models.Q(timestamp__gt=timestamp)
+        else:
+            condition = models.Q(timestamp__gt=timestamp) | models.Q(timestamp=timestamp, id__gt=message_id)
+        return self.filter(condition).order_by('timestamp', 'id')
+
+    def before(self, timestamp, message_id):
+        """Сообщения старше ключа, от новых к старым (для страницы истории берём первые N и разворачиваем)."""
+        condition = models.Q(timestamp__lt=timestamp) | models.Q(timestamp=timestamp, id__lt=message_id)
+        return self.filter(condition).order_by('-timestamp', '-id')
+
+
 class Message(models.Model):
     """Модель сообщения внутри конкретного чата."""
     
@@ -69,10 +168,55 @@ class Message(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True, verbose_name="Время отправки")
     is_read = models.BooleanField(default=False, verbose_name="Прочитано")
 
+    objects = MessageQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Сообщение"
         verbose_name_plural = "Сообщения"
         ordering = ['timestamp']
+        indexes = [
+            # Опрос новых сообщений и постраничная история чата (см. MessageQuerySet)
+            models.Index(fields=['chat', 'timestamp', 'id'], name='chat_message_chat_ts_id'),
+        ]
         
     def __str__(self):
-        return f"Сообщение от {self.sender.get_username()} в чате {self.chat.id}"
\ No newline at end of file
+        return f"Сообщение от {self.sender.get_username()} в чате {self.chat.id}"
+
+
+class PsychologistLoad(models.Model):
+    """
+    Загрузка психолога: число активных чатов и доля от его нормы.
+    Счётчики меняются атомарно вместе с чатами (см. chat/assignment.py и Chat.close),
+    а пересчитать их с нуля можно командой rebuild_psychologist_load.
+    """
+    psychologist = models.OneToOneField(
+        AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='chat_load', verbose_name="Психолог",
+    )
+    active_chats = models.PositiveIntegerField(default=0, verbose_name="Активных чатов")
+    capacity = models.PositiveIntegerField(
+        default=DEFAULT_PSYCHOLOGIST_CAPACITY, validators=[MinValueValidator(1)], verbose_name="Норма чатов",
+    )
+    # active_chats / capacity — хранится, чтобы наименее занятого находить по индексу, а не сортировкой всех
+    load = models.FloatField(default=0, verbose_name="Занятость")
+    is_available = models.BooleanField(default=True, verbose_name="Принимает новые чаты")
+
+    class Meta:
+        verbose_name = "Загрузка психолога"
+        verbose_name_plural = "Загрузка психологов"
+        indexes = [
+            models.Index(fields=['is_available', 'load', 'psychologist'], name='chat_load_available_load'),
+        ]
+
+    def __str__(self):
+        return f"{self.psychologist_id}: {self.active_chats}/{self.capacity}"
+
+    @classmethod
+    def adjust(cls, psychologist_id, delta):
+        """Меняет число активных чатов психолога на delta одним UPDATE."""
+        active_chats = models.F('active_chats') + delta
+        # load присваивается первым: MySQL вычисляет SET по порядку, и active_chats здесь ещё старое.
+        # Вычитание ниже нуля не допускаем — поле беззнаковое
+        cls.objects.filter(pk=psychologist_id, active_chats__gte=max(-delta, 0)).update(
+            load=Cast(active_chats, models.FloatField()) / models.F('capacity'),
+            active_chats=active_chats,
+        )
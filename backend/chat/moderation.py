@@ -0,0 +1,37 @@
+import os
+from django.conf import settings
+from .censor import WordFilter
+
+# Один фильтр на процесс: список слов собирается в автомат при первой проверке
+# и пересобирается, только если файл изменился
+CENSORED_WORDS_FILE = getattr(
+    settings, 'CENSORED_WORDS_FILE', os.path.join(os.path.dirname(__file__), 'censored_words.txt')
+)
+word_filter = WordFilter(CENSORED_WORDS_FILE)
+
+
+def contains_banned(text):
+    return isinstance(text, str) and word_filter.contains(text)
+
+
+def find_banned(text):
+    """Все запрещённые слова в тексте: список (начало, конец) в символах исходного текста."""
+    return word_filter.find_all(text) if isinstance(text, str) else []
+
+
+def find_banned_many(texts):
+    """find_banned для пачки текстов за один вызов (для модерации архива)."""
+    return word_filter.find_all_many([text if isinstance(text, str) else '' for text in texts])
+
+
+def mask_banned(text, char='*'):
+    """Текст, в котором запрещённые слова заменены звёздочками."""
+    return word_filter.mask(text, char) if isinstance(text, str) else text
+
+
+def describe_spans(text, spans, limit=5):
+    """Короткое описание найденного для сообщений об ошибках: «10-15 «слово», ...»."""
+    parts = [f"{start}-{end} «{text[start:end]}»" for start, end in spans[:limit]]
+    if len(spans) > limit:
+        parts.append(f"и ещё {len(spans) - limit}")
+    return ', '.join(parts)
@@ -2,6 +2,7 @@
 
 from rest_framework.permissions import BasePermission
 from users.models import User # Предполагаем, что users.models.User существует
+from users.authentication import is_psychologist
 
 class IsPsychologistOrSelf(BasePermission):
     """
@@ -16,14 +17,13 @@ class IsPsychologistOrSelf(BasePermission):
         user = request.user
         
         # 1. Проверка: Является ли пользователь психологом?
-        # Используем разрешение, определенное в вашей модели User
-        is_psychologist = user.has_perm('users.psych') 
-        if is_psychologist:
+        # Право 'users.psych' — из токена (см. users/authentication.py), без запросов к БД
+        if is_psychologist(user):
             return True
         
         # 2. Проверка: Является ли пользователь учеником в этом чате?
-        # Ученик может видеть только СВОЙ чат.
-        if user == obj.student:
+        # Ученик может видеть только СВОЙ чат. Сравниваем id, не загружая ученика
+        if user.pk == obj.student_id:
             return True
             
         return False
\ No newline at end of file
@@ -0,0 +1,69 @@
+from asgiref.sync import async_to_sync
+from django.db import transaction
+
+# Без установленного channels чат продолжает работать через опрос
+try:
+    from channels.layers import get_channel_layer
+except ImportError:
+    get_channel_layer = None
+
+
+def chat_group(chat_id):
+    """Группа подписчиков одного чата (ws/chats/<id>/)."""
+    return f'chat_{chat_id}'
+
+
+def user_chats_group(user_id):
+    """Группа подписчиков списка чатов пользователя (ws/chats/)."""
+    return f'user_{user_id}_chats'
+
+
+def _send(group, event):
+    layer = get_channel_layer() if get_channel_layer else None
+    if layer is None:
+        return
+    try:
+        async_to_sync(layer.group_send)(group, event)
+    except Exception as e:
+        # Доставка в реальном времени — дополнение к опросу, ошибка не должна ломать отправку сообщения
+        print(f"Ошибка отправки события {event['type']} в {group}: {e}")
+
+
+def broadcast_message(message):
+    """
+    Рассылает новое сообщение участникам чата и обновлённую строку чата в их списки.
+    Отправка — после коммита транзакции, чтобы клиент, получив событие, уже видел сообщение в БД.
+    """
+    from .serializers import MessageSerializer
+
+    def send():
+        _send(chat_group(message.chat_id), {'type': 'chat.message', 'message': MessageSerializer(message).data})
+        broadcast_chat(message.chat_id)
+
+    transaction.on_commit(send)
+
+
+def broadcast_chat(chat_id):
+    """
+    Рассылает свежую строку чата в списки участников. Чат перечитывается из БД: счётчики непрочитанных
+    меняются F-выражениями, и копия в памяти может отставать. У каждого участника свой счётчик.
+    """
+    from .models import Chat
+    from .serializers import ChatListSerializer
+
+    chat = Chat.objects.select_related('student', 'psychologist').filter(pk=chat_id).first()
+    if chat is None:
+        return
+    for user_id in {chat.student_id, chat.psychologist_id} - {None}:
+        chat_data = ChatListSerializer(chat, context={'viewer_id': user_id}).data
+        _send(user_chats_group(user_id), {'type': 'chat.updated', 'chat': chat_data})
+
+
+def broadcast_read(chat_id, reader_id, up_to_id):
+    """Сообщает собеседнику, что его сообщения до up_to_id прочитаны, а читателю — новый счётчик в списке."""
+
+    def send():
+        _send(chat_group(chat_id), {'type': 'chat.read', 'reader_id': reader_id, 'up_to_id': up_to_id})
+        broadcast_chat(chat_id)
+
+    transaction.on_commit(send)
@@ -0,0 +1,7 @@
+from django.urls import path
+from .consumers import ChatConsumer, ChatListConsumer
+
+websocket_urlpatterns = [
+    path('ws/chats/', ChatListConsumer.as_asgi()),
+    path('ws/chats/<int:chat_id>/', ChatConsumer.as_asgi()),
+]
@@ -6,7 +6,8 @@ from users.serializers import UserSerializer # Ваш существующий U
 
 class MessageSerializer(serializers.ModelSerializer):
     # Поле sender_id поможет фронтенду определить, кто отправил сообщение
-    sender_id = serializers.ReadOnlyField(source='sender.id') 
+    # Берём сам столбец внешнего ключа: source='sender.id' загружал бы отправителя каждого сообщения
+    sender_id = serializers.ReadOnlyField()
     
     class Meta:
         model = Message
@@ -21,14 +22,25 @@ class ChatListSerializer(serializers.ModelSerializer):
     
     # Получение последнего сообщения для превью
     last_message = serializers.SerializerMethodField()
+    # Сколько сообщений собеседника не прочитал тот, кто смотрит список
+    unread_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Chat
-        fields = ['id', 'student_token', 'psychologist_email', 'is_active', 'created_at', 'updated_at', 'last_message']
+        fields = ['id', 'student_token', 'psychologist_email', 'is_active', 'created_at', 'updated_at', 'last_message', 'unread_count']
+
+    def get_unread_count(self, obj):
+        # Зритель — пользователь запроса или (для рассылки по WebSocket) явно переданный viewer_id
+        viewer_id = self.context.get('viewer_id')
+        if viewer_id is None and 'request' in self.context:
+            viewer_id = self.context['request'].user.pk
+        return obj.unread_count(viewer_id)
     
     def get_last_message(self, obj):
-        last_msg = obj.messages.all().order_by('-timestamp').first()
-        if last_msg:
+        # Превью хранится в самом чате (см. chat/signals.py), отдельный запрос за сообщением не нужен
+        if obj.last_message_at:
             # Возвращаем только содержание и время отправки
-            return {'content': last_msg.content[:100], 'timestamp': last_msg.timestamp}
+            # Время форматируем сами: эти данные уходят и в WebSocket, где нет JSON-энкодера DRF
+            timestamp = serializers.DateTimeField().to_representation(obj.last_message_at)
+            return {'content': obj.last_message_content, 'timestamp': timestamp}
         return None
\ No newline at end of file
@@ -0,0 +1,64 @@
+from django.db.models import Case, F, Q, Value, When
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from users.models import User
+from .models import Chat, Message, PsychologistLoad, LAST_MESSAGE_PREVIEW_LENGTH
+from .realtime import broadcast_message
+
+
+def _if(condition, then, default, field):
+    return Case(When(condition, then=then), default=default, output_field=Chat._meta.get_field(field))
+
+
+@receiver(post_save, sender=Message)
+def message_saved(sender, instance, created, **kwargs):
+    """
+    Одним UPDATE (без чтения чата из БД) копируем новое сообщение в превью чата
+    и увеличиваем счётчик непрочитанных у получателя.
+    """
+    if not created:
+        return
+    preview = instance.content[:LAST_MESSAGE_PREVIEW_LENGTH]
+    # Условие на время — чтобы более раннее сообщение, сохранённое позже, не затёрло превью
+    newer = Q(last_message_at__isnull=True) | Q(last_message_at__lte=instance.timestamp)
+    from_student = Q(student=instance.sender_id)
+    Chat.objects.filter(pk=instance.chat_id).update(
+        last_message_content=_if(newer, Value(preview), F('last_message_content'), 'last_message_content'),
+        updated_at=_if(newer, Value(instance.timestamp), F('updated_at'), 'updated_at'),
+        unread_by_psychologist=_if(
+            from_student, F('unread_by_psychologist') + 1, F('unread_by_psychologist'), 'unread_by_psychologist',
+        ),
+        unread_by_student=_if(from_student, F('unread_by_student'), F('unread_by_student') + 1, 'unread_by_student'),
+        # Последним: MySQL вычисляет SET по порядку, и условия выше должны видеть старое значение
+        last_message_at=_if(newer, Value(instance.timestamp), F('last_message_at'), 'last_message_at'),
+    )
+
+    # Чат, с которым создавали сообщение, тоже обновляем — его могут сразу отдать в ответе
+    if Message.chat.is_cached(instance):
+        chat = instance.chat
+        if chat.last_message_at is None or chat.last_message_at <= instance.timestamp:
+            chat.last_message_content = preview
+            chat.last_message_at = chat.updated_at = instance.timestamp
+        field = 'unread_by_psychologist' if instance.sender_id == chat.student_id else 'unread_by_student'
+        setattr(chat, field, getattr(chat, field) + 1)
+
+    # Подписчикам WebSocket — сразу после коммита
+    broadcast_message(instance)
+
+
+@receiver(post_delete, sender=Chat)
+def chat_deleted(sender, instance, **kwargs):
+    """Удалённый активный чат освобождает место у психолога (закрытие — см. Chat.close)."""
+    if instance.is_active and instance.psychologist_id:
+        PsychologistLoad.adjust(instance.psychologist_id, -1)
+
+
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def permissions_changed(sender, action, **kwargs):
+    """Выдали или забрали право psych (напрямую или через группу) — обновляем список психологов для назначения."""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        from .assignment import sync_psychologists
+        sync_psychologists()
@@ -1,3 +1,481 @@
-from django.test import TestCase
+import os
+import tempfile
+from unittest import skipIf
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import Permission
+from io import StringIO
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import SimpleTestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from users.models import User
+from .censor import AhoCorasick, WordFilter, normalize
+from .models import Chat, Message, PsychologistLoad
 
-# Create your tests here.
+try:
+    from channels.testing import WebsocketCommunicator
+except ImportError:
+    WebsocketCommunicator = None
+
+
+def make_psychologist(email='psy@school.ru'):
+    psychologist = User.objects.create(email=email, token=email)
+    psychologist.user_permissions.add(Permission.objects.get(codename='psych'))
+    return psychologist
+
+
+def make_chats(psychologist, count, start=0):
+    for i in range(start, start + count):
+        student = User.objects.create(token=f'student-{i}')
+        chat = Chat.objects.create(student=student, psychologist=psychologist)
+        Message.objects.create(chat=chat, sender=student, content=f"Здравствуйте, это сообщение {i}")
+        Message.objects.create(chat=chat, sender=psychologist, content=f"Ответ психолога {i}")
+
+
+class ChatListQueriesTest(APITestCase):
+    def setUp(self):
+        self.psychologist = make_psychologist()
+        self.client.force_authenticate(self.psychologist)
+
+    def list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/chats/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.json()
+
+    def test_query_count_does_not_grow_with_chats(self):
+        make_chats(self.psychologist, 3)
+        few, data = self.list_queries()
+        self.assertEqual(len(data), 3)
+
+        make_chats(self.psychologist, 30, start=3)
+        # Новый запрос — новый объект пользователя, кэш прав не переносится
+        self.client.force_authenticate(User.objects.get(pk=self.psychologist.pk))
+        many, data = self.list_queries()
+        self.assertEqual(len(data), 33)
+        self.assertEqual(few, many)
+        # Права пользователя (2 запроса) + ETag (агрегат) + сами чаты вместе с учеником и психологом
+        self.assertLessEqual(many, 4)
+
+    def test_last_message_preview(self):
+        make_chats(self.psychologist, 1)
+        chat = Chat.objects.get()
+        Message.objects.create(chat=chat, sender=chat.student, content='я' * 150)
+
+        _, data = self.list_queries()
+        last_message = data[0]['last_message']
+        self.assertEqual(last_message['content'], 'я' * 100)
+        self.assertEqual(data[0]['student_token'], 'student-0')
+        self.assertEqual(data[0]['psychologist_email'], 'psy@school.ru')
+
+        chat.refresh_from_db()
+        self.assertEqual(chat.last_message_at, chat.messages.order_by('-timestamp').first().timestamp)
+
+    def test_chat_without_messages(self):
+        student = User.objects.create(token='silent')
+        Chat.objects.create(student=student, psychologist=self.psychologist)
+        _, data = self.list_queries()
+        self.assertIsNone(data[0]['last_message'])
+
+
+class MessageHistoryTest(APITestCase):
+    def setUp(self):
+        self.psychologist = make_psychologist()
+        self.student = User.objects.create(token='student')
+        self.chat = Chat.objects.create(student=self.student, psychologist=self.psychologist)
+        self.messages = [
+            Message.objects.create(chat=self.chat, sender=self.student, content=f"сообщение {i}") for i in range(10)
+        ]
+        self.client.force_authenticate(self.student)
+
+    def fetch(self, **params):
+        response = self.client.get(f'/api/v1/chats/{self.chat.id}/messages/', params)
+        return response.status_code, response.json()
+
+    def ids(self, data):
+        return [message['id'] for message in data]
+
+    def test_full_history_without_params(self):
+        _, data = self.fetch()
+        self.assertEqual(self.ids(data), [m.id for m in self.messages])
+
+    def test_after_id_returns_only_new_messages(self):
+        _, data = self.fetch(after_id=self.messages[6].id)
+        self.assertEqual(self.ids(data), [m.id for m in self.messages[7:]])
+        _, data = self.fetch(after_id=self.messages[-1].id)
+        self.assertEqual(data, [])
+
+    def test_since(self):
+        _, data = self.fetch(since=self.messages[7].timestamp.isoformat())
+        self.assertEqual(self.ids(data), [m.id for m in self.messages[8:]])
+
+    def test_paging_backwards(self):
+        _, data = self.fetch(limit=4)
+        self.assertEqual(self.ids(data), [m.id for m in self.messages[6:]])
+        _, data = self.fetch(before_id=data[0]['id'], limit=4)
+        self.assertEqual(self.ids(data), [m.id for m in self.messages[2:6]])
+        _, data = self.fetch(before_id=data[0]['id'], limit=4)
+        self.assertEqual(self.ids(data), [m.id for m in self.messages[:2]])
+
+    def test_invalid_params(self):
+        other = Chat.objects.create(student=User.objects.create(token='other'))
+        foreign = Message.objects.create(chat=other, sender=other.student, content="чужое")
+        self.assertEqual(self.fetch(after_id=foreign.id)[0], 400)
+        self.assertEqual(self.fetch(after_id='abc')[0], 400)
+        self.assertEqual(self.fetch(limit=0)[0], 400)
+        self.assertEqual(self.fetch(since='вчера')[0], 400)
+        self.assertEqual(self.fetch(after_id=self.messages[0].id, before_id=self.messages[5].id)[0], 400)
+
+
+@skipIf(WebsocketCommunicator is None, "channels не установлен")
+class ChatWebSocketTest(TransactionTestCase):
+    # TransactionTestCase: сообщения рассылаются после коммита, а consumers читают БД из другого потока
+
+    def setUp(self):
+        self.psychologist = make_psychologist()
+        self.student = User.objects.create(token='student')
+        self.chat = Chat.objects.create(student=self.student, psychologist=self.psychologist)
+
+    def socket(self, path, user=None, token=None):
+        from backend.asgi import application
+        if user is not None:
+            token = AccessToken.for_user(user)
+        query = f'?token={token}' if token else ''
+        return WebsocketCommunicator(application, f'{path}{query}')
+
+    def send_message(self, user, content):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.post(f'/api/v1/chats/{self.chat.id}/send_message/', {'content': content}, format='json')
+
+    async def test_new_message_is_pushed(self):
+        chat_socket = self.socket(f'/ws/chats/{self.chat.id}/', self.psychologist)
+        list_socket = self.socket('/ws/chats/', self.psychologist)
+        self.assertTrue((await chat_socket.connect())[0])
+        self.assertTrue((await list_socket.connect())[0])
+
+        response = await sync_to_async(self.send_message)(self.student, "Мне нужна помощь")
+        self.assertEqual(response.status_code, 201)
+
+        event = await chat_socket.receive_json_from(timeout=2)
+        self.assertEqual(event['type'], 'message')
+        self.assertEqual(event['message']['id'], response.json()['id'])
+        self.assertEqual(event['message']['content'], "Мне нужна помощь")
+
+        event = await list_socket.receive_json_from(timeout=2)
+        self.assertEqual(event['type'], 'chat')
+        self.assertEqual(event['chat']['id'], self.chat.id)
+        self.assertEqual(event['chat']['last_message']['content'], "Мне нужна помощь")
+
+        await chat_socket.disconnect()
+        await list_socket.disconnect()
+
+    async def test_student_receives_psychologist_reply(self):
+        chat_socket = self.socket(f'/ws/chats/{self.chat.id}/', self.student)
+        self.assertTrue((await chat_socket.connect())[0])
+        await sync_to_async(self.send_message)(self.psychologist, "Здравствуйте, слушаю вас")
+        event = await chat_socket.receive_json_from(timeout=2)
+        self.assertEqual(event['message']['sender_id'], self.psychologist.id)
+        await chat_socket.disconnect()
+
+    async def test_requires_token(self):
+        connected, code = await self.socket(f'/ws/chats/{self.chat.id}/').connect()
+        self.assertFalse(connected)
+        self.assertEqual(code, 4401)
+
+        connected, code = await self.socket('/ws/chats/', token='garbage').connect()
+        self.assertFalse(connected)
+        self.assertEqual(code, 4401)
+
+    async def test_other_student_is_rejected(self):
+        stranger = await sync_to_async(User.objects.create)(token='stranger')
+        connected, code = await self.socket(f'/ws/chats/{self.chat.id}/', stranger).connect()
+        self.assertFalse(connected)
+        self.assertEqual(code, 4403)
+
+
+class ConditionalGetTest(APITestCase):
+    def setUp(self):
+        self.psychologist = make_psychologist()
+        make_chats(self.psychologist, 3)
+        self.chat = Chat.objects.first()
+        self.client.force_authenticate(self.psychologist)
+
+    def revalidate(self, url):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        return first, second, len(queries)
+
+    def test_unchanged_list_is_not_modified(self):
+        first, second, queries = self.revalidate('/api/v1/chats/')
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second.content, b'')
+        # Права пользователя + один агрегирующий запрос
+        self.assertLessEqual(queries, 3)
+
+    def test_new_message_changes_list_and_history(self):
+        first_list = self.client.get('/api/v1/chats/')
+        history_url = f'/api/v1/chats/{self.chat.id}/messages/'
+        first_history = self.client.get(history_url)
+
+        Message.objects.create(chat=self.chat, sender=self.chat.student, content="новое")
+
+        response = self.client.get('/api/v1/chats/', HTTP_IF_NONE_MATCH=first_list['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['last_message']['content'], "новое")
+        response = self.client.get(history_url, HTTP_IF_NONE_MATCH=first_history['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[-1]['content'], "новое")
+
+    def test_closed_chat_changes_student_list(self):
+        self.client.force_authenticate(self.chat.student)
+        first = self.client.get('/api/v1/chats/')
+        Chat.objects.filter(pk=self.chat.pk).update(is_active=False)
+        response = self.client.get('/api/v1/chats/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [])
+
+    def test_unchanged_history_is_not_modified(self):
+        url = f'/api/v1/chats/{self.chat.id}/messages/?after_id={self.chat.messages.last().id}'
+        _, second, queries = self.revalidate(url)
+        self.assertEqual(second.status_code, 304)
+        self.assertIn('private', second['Cache-Control'])
+        # Права пользователя + сам чат
+        self.assertLessEqual(queries, 3)
+
+    def test_etag_depends_on_params_and_user(self):
+        url = f'/api/v1/chats/{self.chat.id}/messages/'
+        full = self.client.get(url)
+        paged = self.client.get(url, {'limit': 1})
+        self.assertNotEqual(full['ETag'], paged['ETag'])
+
+        other = make_psychologist('other@school.ru')
+        self.client.force_authenticate(other)
+        response = self.client.get('/api/v1/chats/', HTTP_IF_NONE_MATCH=self.client.get('/api/v1/chats/')['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.client.force_authenticate(self.psychologist)
+        response = self.client.get('/api/v1/chats/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+
+class UnreadTest(APITestCase):
+    def setUp(self):
+        self.psychologist = make_psychologist()
+        make_chats(self.psychologist, 5)
+        self.chat = Chat.objects.order_by('id').first()
+        self.student = self.chat.student
+        self.questions = [
+            Message.objects.create(chat=self.chat, sender=self.student, content=f"вопрос {i}") for i in range(3)
+        ]
+
+    def unread(self, user):
+        self.client.force_authenticate(user)
+        return {chat['id']: chat['unread_count'] for chat in self.client.get('/api/v1/chats/').json()}
+
+    def mark_read(self, user, up_to_id):
+        self.client.force_authenticate(user)
+        return self.client.post(f'/api/v1/chats/{self.chat.id}/mark_read/', {'up_to_id': up_to_id}, format='json')
+
+    def test_counts_per_side(self):
+        # make_chats: сообщение ученика и ответ психолога в каждом чате, затем ещё 3 вопроса
+        counts = self.unread(self.psychologist)
+        self.assertEqual(counts[self.chat.id], 4)
+        self.assertEqual(sorted(counts.values()), [1, 1, 1, 1, 4])
+        self.assertEqual(self.unread(self.student), {self.chat.id: 1})
+
+    def test_mark_read_is_one_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.mark_read(self.psychologist, self.questions[1].id)
+        self.assertEqual(response.json(), {'marked': 3, 'unread_count': 1})
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        # Сообщения и счётчик чата — по одному UPDATE
+        self.assertEqual(len(updates), 2)
+
+        read = list(self.chat.messages.filter(is_read=True).values_list('sender', flat=True))
+        self.assertEqual(read, [self.student.id] * 3)
+        self.assertEqual(self.unread(self.psychologist)[self.chat.id], 1)
+        # Повторная отметка ничего не меняет, собственные сообщения психолога не трогаются
+        self.assertEqual(self.mark_read(self.psychologist, self.questions[-1].id).json(), {'marked': 1, 'unread_count': 0})
+        self.assertEqual(self.mark_read(self.psychologist, self.questions[-1].id).json()['marked'], 0)
+        self.assertEqual(self.unread(self.student), {self.chat.id: 1})
+
+    def test_student_reads_replies(self):
+        reply = self.chat.messages.exclude(sender=self.student).get()
+        self.assertEqual(self.mark_read(self.student, self.questions[-1].id).json(), {'marked': 1, 'unread_count': 0})
+        reply.refresh_from_db()
+        self.assertTrue(reply.is_read)
+        self.assertEqual(self.unread(self.psychologist)[self.chat.id], 4)
+
+    def test_read_changes_etags(self):
+        self.client.force_authenticate(self.psychologist)
+        list_etag = self.client.get('/api/v1/chats/')['ETag']
+        history_url = f'/api/v1/chats/{self.chat.id}/messages/'
+        history_etag = self.client.get(history_url)['ETag']
+        self.mark_read(self.student, self.questions[-1].id)
+
+        # Ученик прочитал ответ: у психолога меняется история (is_read), а список — нет
+        self.client.force_authenticate(self.psychologist)
+        self.assertEqual(self.client.get(history_url, HTTP_IF_NONE_MATCH=history_etag).status_code, 200)
+        self.assertEqual(self.client.get('/api/v1/chats/', HTTP_IF_NONE_MATCH=list_etag).status_code, 304)
+        self.mark_read(self.psychologist, self.questions[-1].id)
+        self.assertEqual(self.client.get('/api/v1/chats/', HTTP_IF_NONE_MATCH=list_etag).status_code, 200)
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.mark_read(self.psychologist, None).status_code, 400)
+        self.assertEqual(self.mark_read(self.psychologist, 'abc').status_code, 400)
+        stranger = User.objects.create(token='stranger')
+        self.assertEqual(self.mark_read(stranger, self.questions[-1].id).status_code, 403)
+
+    def test_other_psychologist_does_not_read_for_the_assigned_one(self):
+        # Чужой чат другой психолог открыть может, но сообщения от этого не становятся прочитанными
+        other = make_psychologist('other@school.ru')
+        self.assertEqual(self.mark_read(other, self.questions[-1].id).json(), {'marked': 0, 'unread_count': 0})
+        self.assertFalse(self.chat.messages.filter(is_read=True).exists())
+        self.assertEqual(self.unread(self.psychologist)[self.chat.id], 4)
+        self.assertEqual(self.unread(self.student), {self.chat.id: 1})
+
+
+class AssignmentTest(APITestCase):
+    def setUp(self):
+        self.psychologists = [make_psychologist(f'psy{i}@school.ru') for i in range(3)]
+
+    def initiate(self, student, content="Здравствуйте, мне нужна помощь"):
+        self.client.force_authenticate(student)
+        return self.client.post('/api/v1/chats/initiate/', {'content': content}, format='json')
+
+    def students(self, count, start=0):
+        return [User.objects.create(token=f'student-{i}') for i in range(start, start + count)]
+
+    def active_per_psychologist(self):
+        return {
+            psychologist.email: Chat.objects.filter(psychologist=psychologist, is_active=True).count()
+            for psychologist in self.psychologists
+        }
+
+    def test_chats_are_spread_evenly(self):
+        for student in self.students(9):
+            self.assertEqual(self.initiate(student).status_code, 201)
+        self.assertEqual(set(self.active_per_psychologist().values()), {3})
+        loads = PsychologistLoad.objects.values_list('active_chats', flat=True)
+        self.assertEqual(sorted(loads), [3, 3, 3])
+
+    def test_capacity_weights_assignment(self):
+        PsychologistLoad.objects.filter(psychologist=self.psychologists[0]).update(capacity=1)
+        PsychologistLoad.objects.filter(psychologist=self.psychologists[1]).update(capacity=2)
+        PsychologistLoad.objects.filter(psychologist=self.psychologists[2]).update(is_available=False)
+        for student in self.students(6):
+            self.initiate(student)
+        counts = self.active_per_psychologist()
+        self.assertEqual(list(counts.values()), [2, 4, 0])
+
+    def test_second_active_chat_is_rejected(self):
+        student = self.students(1)[0]
+        self.assertEqual(self.initiate(student).status_code, 201)
+        self.assertEqual(self.initiate(student).status_code, 409)
+        self.assertEqual(Chat.objects.filter(student=student).count(), 1)
+        self.assertEqual(sum(PsychologistLoad.objects.values_list('active_chats', flat=True)), 1)
+
+        # Ограничение в БД ловит и чат, созданный в обход initiate
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Chat.objects.create(student=student, psychologist=self.psychologists[0])
+
+    def test_close_frees_slot(self):
+        student = self.students(1)[0]
+        for _ in range(2):
+            chat_id = self.initiate(student).json()['id']
+            response = self.client.post(f'/api/v1/chats/{chat_id}/close/')
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(response.json()['is_active'])
+        # Закрытых чатов у ученика может быть сколько угодно
+        self.assertEqual(Chat.objects.filter(student=student, is_active=False).count(), 2)
+        self.assertEqual(sum(PsychologistLoad.objects.values_list('active_chats', flat=True)), 0)
+
+    def test_no_psychologists(self):
+        for psychologist in self.psychologists:
+            psychologist.user_permissions.clear()
+        self.assertFalse(PsychologistLoad.objects.exists())
+        self.assertEqual(self.initiate(self.students(1)[0]).status_code, 503)
+
+    def test_inactive_psychologist_gets_no_chats(self):
+        # Строка загрузки заблокированного психолога остаётся, но назначение её пропускает
+        User.objects.filter(pk=self.psychologists[0].pk).update(is_active=False)
+        for student in self.students(4):
+            self.assertEqual(self.initiate(student).status_code, 201)
+        self.assertEqual(list(self.active_per_psychologist().values()), [0, 2, 2])
+
+    def test_rebuild_command(self):
+        for student in self.students(4):
+            self.initiate(student)
+        Chat.objects.filter(psychologist=self.psychologists[0]).update(is_active=False)
+        PsychologistLoad.objects.update(active_chats=99, load=99)
+        call_command('rebuild_psychologist_load', stdout=StringIO())
+        loads = dict(PsychologistLoad.objects.values_list('psychologist__email', 'active_chats'))
+        self.assertEqual(loads, {'psy0@school.ru': 0, 'psy1@school.ru': 1, 'psy2@school.ru': 1})
+        self.assertEqual(PsychologistLoad.objects.get(psychologist=self.psychologists[1]).load, 1 / 30)
+
+
+class AhoCorasickTest(SimpleTestCase):
+    def test_overlapping_matches(self):
+        automaton = AhoCorasick(['he', 'she', 'his', 'hers'])
+        self.assertEqual(list(automaton.iter_matches('ushers')), [(1, 4), (2, 4), (2, 6)])
+        self.assertEqual(list(automaton.iter_matches('ahishers')), [(1, 4), (3, 6), (4, 6), (4, 8)])
+        self.assertEqual(list(automaton.iter_matches('xyz')), [])
+
+    def test_pattern_inside_other_pattern(self):
+        # «аб» найдено по суффиксной ссылке из «каб», хотя ветки «аб» автомат не проходил
+        automaton = AhoCorasick(['каба', 'аб'])
+        self.assertEqual(list(automaton.iter_matches('кабан')), [(1, 3), (0, 4)])
+
+
+class CensorNormalizeTest(SimpleTestCase):
+    def test_letter_swaps_and_repeats(self):
+        self.assertEqual(normalize('ДУР@К')[0], 'дурак')
+        self.assertEqual(normalize('дyp4k')[0], 'дур4к')
+        self.assertEqual(normalize('ДУУУУРАК')[0], 'дурак')
+        self.assertEqual(normalize('6ед0')[0], 'бедо')
+
+    def test_separators(self):
+        self.assertEqual(normalize('д-у-р-а-к')[0], 'дурак')
+        self.assertEqual(normalize('д у р а к')[0], 'дурак')
+        self.assertEqual(normalize('д.у.р.а.к, привет')[0], 'дурак привет')
+        # Разделитель сменился — «а» остаётся отдельным словом
+        self.assertEqual(normalize('а д-у-р-а-к')[0], 'а дурак')
+        self.assertEqual(normalize('д-у-р-а-к и')[0], 'дурак и')
+        # Две буквы — это ещё не слово по буквам
+        self.assertEqual(normalize('я и ты')[0], 'я и ты')
+
+    def test_positions_point_to_original(self):
+        text = 'Ну  д-у-р-а-к!'
+        normalized, starts, ends = normalize(text)
+        self.assertEqual(normalized, 'ну дурак')
+        first = normalized.index('дурак')
+        self.assertEqual(text[starts[first]:ends[first + 4]], 'д-у-р-а-к')
+
+
+class WordFilterTest(SimpleTestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.txt')
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            file.write('дурак\nтупица\nсука\n')
+        self.addCleanup(os.remove, self.path)
+        self.filter = WordFilter(self.path)
+
+    def test_evasions(self):
+        for text in ['ДУР@К', 'ты д-у-р-а-к', 'дуууурак!', 'д у р а к', 'Тупицами']:
+            with self.subTest(text=text):
+                self.assertTrue(self.filter.contains(text))
+
+    def test_ordinary_words(self):
+        # Основа «сук» короче MIN_STEM_LENGTH и не ловит обычные слова
+        for text in ['сукно', 'дураковаляние', 'а к у', 'тупик']:
+            with self.subTest(text=text):
+                self.assertFalse(self.filter.contains(text))
+
+    def test_mask_keeps_original_layout(self):
+        self.assertEqual(self.filter.mask('Ну ты д-у-р-а-к и тупица'), 'Ну ты ********* и ******')
+        self.assertEqual(self.filter.find_all_many(['дурак', '', 'привет']), [[(0, 5)], [], []])
@@ -10,8 +10,21 @@ from .serializers import ChatListSerializer, MessageSerializer
 from .permissions import IsPsychologistOrSelf
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
-from users.models import User
+from users.authentication import is_psychologist
 from .custom_filters import censor
+from .realtime import broadcast_chat, broadcast_read
+from .assignment import ActiveChatExists, NoPsychologistAvailable, start_chat
+from django.db import transaction
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.db.models import Count, Max, Sum
+from api.conditional import make_etag, not_modified, set_etag
+
+# Размер страницы истории сообщений по умолчанию и максимальный ?limit
+MESSAGES_PAGE_SIZE = getattr(settings, 'CHAT_MESSAGES_PAGE_SIZE', 50)
+MESSAGES_MAX_LIMIT = getattr(settings, 'CHAT_MESSAGES_MAX_LIMIT', 200)
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def initiate_chat(request):
@@ -21,7 +34,7 @@ def initiate_chat(request):
     """
     user = request.user
     # Убеждаемся, что инициатор — ученик
-    if user.has_perm('users.psych'):
+    if is_psychologist(user):
         return Response({"detail": "Психологи не могут инициировать чат через этот endpoint."}, 
                         status=status.HTTP_403_FORBIDDEN)
     
@@ -31,37 +44,84 @@ def initiate_chat(request):
                         status=status.HTTP_400_BAD_REQUEST)
     if censor(content):
         return Response(status=status.HTTP_400_BAD_REQUEST)
-    # 1. Проверяем, есть ли уже активный чат
-    active_chat = Chat.objects.filter(student=user, is_active=True).first()
-    if active_chat:
+    # Проверка активного чата, выбор наименее занятого психолога и создание чата — под блокировками
+    # (см. chat/assignment.py): одновременные запросы не создадут двух чатов и разойдутся по разным психологам.
+    # Первое сообщение — в той же транзакции, чтобы не оставалось пустых чатов
+    try:
+        with transaction.atomic():
+            new_chat = start_chat(user)
+            Message.objects.create(
+                chat=new_chat,
+                sender=user,
+                content=content
+            )
+    except ActiveChatExists:
         return Response({"detail": "У вас уже есть активный чат."}, 
                         status=status.HTTP_409_CONFLICT)
-                        
-    # 2. Находим свободного психолога (логика назначения может быть сложной)
-    # Для простоты: берем первого попавшегося или того, у кого меньше всего активных чатов
-    available_psychologist = User.objects.filter(is_staff=True).first() # Измените это на вашу логику поиска
-    
-    if not available_psychologist:
+    except NoPsychologistAvailable:
         return Response({"detail": "В данный момент нет доступных психологов."}, 
                         status=status.HTTP_503_SERVICE_UNAVAILABLE)
-                        
-    # 3. Создаем новый чат
-    new_chat = Chat.objects.create(
-        student=user,
-        psychologist=available_psychologist,
-        is_active=True
-    )
-    
-    # 4. Создаем первое сообщение
-    Message.objects.create(
-        chat=new_chat,
-        sender=user,
-        content=content
-    )
     
     # Возвращаем созданный чат
-    serializer = ChatListSerializer(new_chat)
+    serializer = ChatListSerializer(new_chat, context={'request': request})
     return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+def _positive_int(params, name):
+    value = params.get(name)
+    if value is None:
+        return None
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        value = 0
+    if value <= 0:
+        raise ValueError(f"Параметр {name} должен быть положительным целым числом.")
+    return value
+
+
+def _cursor(chat, message_id):
+    """Ключ (время, id) сообщения чата — от него отсчитываются новые или старые сообщения."""
+    timestamp = chat.messages.filter(pk=message_id).values_list('timestamp', flat=True).first()
+    if timestamp is None:
+        raise ValueError(f"Сообщение {message_id} не найдено в этом чате.")
+    return timestamp, message_id
+
+
+def select_messages(chat, params):
+    """Сообщения чата по параметрам запроса (см. ChatViewSet.messages), всегда от старых к новым."""
+    after_id = _positive_int(params, 'after_id')
+    before_id = _positive_int(params, 'before_id')
+    limit = _positive_int(params, 'limit')
+    since = params.get('since')
+    if limit is not None:
+        limit = min(limit, MESSAGES_MAX_LIMIT)
+    if sum(value is not None for value in (after_id, before_id, since)) > 1:
+        raise ValueError("Укажите только один из параметров after_id, since, before_id.")
+
+    if after_id is not None or since is not None:
+        if after_id is not None:
+            messages = chat.messages.after(*_cursor(chat, after_id))
+        else:
+            # «+» в часовом поясе приходит из строки запроса пробелом
+            timestamp = parse_datetime(since.replace(' ', '+'))
+            if timestamp is None:
+                raise ValueError("Параметр since должен быть временем в формате ISO 8601.")
+            if timezone.is_naive(timestamp):
+                timestamp = timezone.make_aware(timestamp)
+            messages = chat.messages.after(timestamp)
+        return messages[:limit] if limit else messages
+
+    if before_id is not None or limit is not None:
+        if before_id is not None:
+            messages = chat.messages.before(*_cursor(chat, before_id))
+        else:
+            messages = chat.messages.order_by('-timestamp', '-id')
+        return list(messages[:limit or MESSAGES_PAGE_SIZE])[::-1]
+
+    return chat.messages.all()
+
+
 class ChatViewSet(viewsets.GenericViewSet, 
                   mixins.ListModelMixin,
                   mixins.RetrieveModelMixin):
@@ -73,33 +133,64 @@ class ChatViewSet(viewsets.GenericViewSet,
     serializer_class = ChatListSerializer
     permission_classes = [IsAuthenticated, IsPsychologistOrSelf]
     
-    # Убедитесь, что у вас есть разрешение 'users.psych'
+    # Право 'users.psych' — из клейма токена (см. users/authentication.py)
     def is_psychologist(self, user):
-        return user.has_perm('users.psych')
+        return is_psychologist(user)
 
     def get_queryset(self):
         user = self.request.user
+        # Токен ученика и email психолога нужны в каждой строке списка — берём их тем же запросом
+        chats = Chat.objects.select_related('student', 'psychologist')
         if self.is_psychologist(user):
             # Психолог видит все чаты, в которых он участвует
-            return Chat.objects.filter(psychologist=user).order_by('-updated_at')
+            return chats.filter(psychologist=user).order_by('-updated_at')
         else:
             # Ученик видит только свои активные чаты
             # В вашем случае, скорее всего, это будет один чат
-            return Chat.objects.filter(student=user, is_active=True)
+            return chats.filter(student=user, is_active=True)
+
+    def list(self, request, *args, **kwargs):
+        # Список меняется, когда обновляется любой чат (новое сообщение, закрытие) или чат пропадает из выборки.
+        # Время последнего обновления и число чатов — один агрегирующий запрос без загрузки строк.
+        # Прочтение не трогает updated_at (иначе чат поднимался бы в списке), его видно по сумме счётчиков
+        unread_field = 'unread_by_psychologist' if self.is_psychologist(request.user) else 'unread_by_student'
+        state = self.get_queryset().order_by().aggregate(
+            updated=Max('updated_at'), count=Count('id'), unread=Sum(unread_field),
+        )
+        etag = make_etag(request, 'chats', request.user.pk, state['count'], state['updated'], state['unread'])
+        response = not_modified(request, etag, private=True)
+        if response is None:
+            response = set_etag(super().list(request, *args, **kwargs), etag, private=True)
+        return response
 
     # Эндпоинт для получения сообщений в конкретном чате:
     # GET /v1/chats/{chat_pk}/messages/
+    #   ?after_id=<id> или ?since=<время ISO> — только сообщения новее (для опроса),
+    #   ?before_id=<id> — страница более старых сообщений (листание истории назад),
+    #   ?limit=<n> — не больше n сообщений (без after_id/since — последние n).
+    # Без параметров возвращается вся история, как раньше.
     @action(detail=True, methods=['get'])
     def messages(self, request, pk=None):
         chat = get_object_or_404(Chat, pk=pk)
         
         # Проверяем разрешение перед возвратом сообщений
         self.check_object_permissions(request, chat)
-        
-        # Получаем все сообщения чата
-        messages = chat.messages.all()
+
+        # Каждое новое сообщение обновляет updated_at чата (см. chat/signals.py), а прочтение — счётчики,
+        # поэтому для ETag хватает уже загруженного чата — без запросов к сообщениям
+        etag = make_etag(
+            request, 'messages', chat.pk, chat.updated_at, chat.unread_by_student, chat.unread_by_psychologist,
+        )
+        response = not_modified(request, etag, private=True)
+        if response is not None:
+            return response
+
+        try:
+            messages = select_messages(chat, request.query_params)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         serializer = MessageSerializer(messages, many=True)
-        return Response(serializer.data)
+        return set_etag(Response(serializer.data), etag, private=True)
 
     # Эндпоинт для отправки нового сообщения:
     # POST /v1/chats/{chat_pk}/send_message/
@@ -118,4 +209,36 @@ class ChatViewSet(viewsets.GenericViewSet,
             # Важно: sender и chat устанавливаются из контекста запроса, а не из данных пользователя
             serializer.save(chat=chat, sender=request.user)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    # Отметка о прочтении:
+    # POST /v1/chats/{chat_pk}/mark_read/ {"up_to_id": <id>}
+    # Все сообщения собеседника до up_to_id включительно становятся прочитанными (одним UPDATE).
+    @action(detail=True, methods=['post'])
+    def mark_read(self, request, pk=None):
+        chat = get_object_or_404(Chat, pk=pk)
+        self.check_object_permissions(request, chat)
+
+        try:
+            up_to_id = _positive_int(request.data, 'up_to_id')
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if up_to_id is None:
+            return Response({"up_to_id": "Обязательно поле 'up_to_id'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        marked = chat.mark_read(request.user.pk, up_to_id)
+        if marked:
+            broadcast_read(chat.pk, request.user.pk, up_to_id)
+        return Response({'marked': marked, 'unread_count': chat.unread_count(request.user.pk)})
+
+    # Закрытие чата (учеником или психологом):
+    # POST /v1/chats/{chat_pk}/close/
+    # Место у психолога освобождается, ученик может начать новый чат.
+    @action(detail=True, methods=['post'])
+    def close(self, request, pk=None):
+        # Ученик и психолог нужны в ответе — тем же запросом
+        chat = get_object_or_404(Chat.objects.select_related('student', 'psychologist'), pk=pk)
+        self.check_object_permissions(request, chat)
+        if chat.close():
+            transaction.on_commit(lambda: broadcast_chat(chat.pk))
+        return Response(ChatListSerializer(chat, context={'request': request}).data)
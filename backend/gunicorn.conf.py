@@ -0,0 +1,22 @@
+# Конфигурация gunicorn: gunicorn backend.wsgi (из папки backend)
+# Только HTTP (WSGI): WebSocket чата так не обслуживается — для него run.py (daphne, ASGI),
+# а с несколькими воркерами ещё и REDIS_URL для общего слоя каналов
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '127.0.0.1:8001')
+# Воркеры узнают о правках статей друг друга через общий кэш (CACHES в settings), а не через память процесса
+workers = int(os.environ.get('GUNICORN_WORKERS', 2))
+
+# Приложение (а вместе с ним и модель ИИ) загружается один раз в мастер-процессе,
+# воркеры получают его через fork и делят страницы памяти с весами модели.
+preload_app = True
+
+
+def when_ready(server):
+    # Вызывается в мастере до создания воркеров.
+    # Только загрузка весов, без прогона: пулы потоков torch не должны стартовать до fork.
+    if os.environ.get('AI_SEARCH_PRELOAD', '1') == '1':
+        from articles.encoder import warm_up
+        seconds = warm_up(run_inference=False)
+        if seconds is not None:
+            server.log.info("Модель ИИ загружена за %.2f с", seconds)
@@ -1,9 +1,21 @@
-import os  
-from waitress import serve  
-from backend.wsgi import application
-# Import app  
-# Run from the same directory as this script  
-this_files_dir = os.path.dirname(os.path.abspath(__file__))  
-os.chdir(this_files_dir)  
-# `url_prefix` — необязательный параметр, полезен, если приложение обслуживается в подкаталоге (например, за обратным прокси)  
-serve(application, host='127.0.0.1', port=8001)  
\ No newline at end of file
+import os
+from daphne.endpoints import build_endpoint_description_strings
+from daphne.server import Server
+
+# Без этой проверки каждый процесс, запущенный через spawn (multiprocessing), импортирует run.py
+# заново и поднимает ещё один сервер на том же порту
+if __name__ == '__main__':
+    # Run from the same directory as this script
+    this_files_dir = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(this_files_dir)
+    # ASGI, а не WSGI: тот же процесс обслуживает и HTTP, и WebSocket чата (/ws/chats/...).
+    # Без REDIS_URL слой каналов живёт в памяти процесса (см. CHANNEL_LAYERS в settings),
+    # поэтому сервер — один процесс daphne, а не несколько воркеров
+    from backend.asgi import application
+    from articles.encoder import warm_up
+    # Загружаем модель ИИ до старта сервера, чтобы первый поиск не ждал её загрузки
+    warm_up()
+    Server(
+        application=application,
+        endpoints=build_endpoint_description_strings(host='127.0.0.1', port=8001),
+    ).run()
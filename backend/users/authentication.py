@@ -0,0 +1,37 @@
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from .models import ClaimsUser
+
+PSYCHOLOGIST_PERMISSION = 'users.psych'
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT-аутентификация без запроса к БД: пользователь собирается из клеймов проверенного токена
+    (ClaimsUser), строка users_user читается, только если view обратится к её полям.
+    Подпись и срок действия токена проверяются как обычно, is_active — по клейму на момент выдачи.
+    Цена — права и блокировка пользователя применяются со следующим access-токеном, а не мгновенно.
+    Поэтому access живёт недолго (ACCESS_TOKEN_LIFETIME), а новый выдаётся по refresh-токену только
+    активному пользователю и с клеймами, заново прочитанными из БД (MyTokenRefreshSerializer).
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = ClaimsUser._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, ValidationError):
+            raise InvalidToken("Token contained no recognizable user identification")
+        # Клейма нет у токенов, выданных до его появления, — они доживают свой срок
+        if validated_token.get('is_active', True) is False:
+            raise AuthenticationFailed("User is inactive", code='user_inactive')
+        user = ClaimsUser.from_db(DEFAULT_DB_ALIAS, [api_settings.USER_ID_FIELD], [user_id])
+        user._claims = validated_token.payload
+        return user
+
+
+def is_psychologist(user):
+    """Психолог ли пользователь: по клейму токена для ClaimsUser, иначе по правам (запоминаются Django на объекте)."""
+    return bool(user and user.is_authenticated and user.has_perm(PSYCHOLOGIST_PERMISSION))
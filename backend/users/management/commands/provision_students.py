@@ -0,0 +1,45 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from users.provisioning import get_chunk_size, get_workers, iter_csv
+
+
+class Command(BaseCommand):
+    help = (
+        "Создаёт учеников для подключения школы и пишет лист token,password в CSV. "
+        "Пароли хешируются в пуле процессов, ученики сохраняются пачками; лист пишется по мере сохранения."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int, help="Сколько учеников создать")
+        parser.add_argument('--output', help="Файл CSV (по умолчанию — в stdout)")
+        parser.add_argument('--chunk-size', type=int, default=None, help="Сколько учеников сохранять за раз")
+        parser.add_argument('--workers', type=int, default=None, help="Процессов для хеширования паролей")
+
+    def handle(self, *args, **options):
+        count = options['count']
+        chunk_size = options['chunk_size'] or get_chunk_size()
+        workers = options['workers'] or get_workers()
+        if count <= 0 or chunk_size <= 0 or workers <= 0:
+            raise CommandError("count, --chunk-size и --workers должны быть больше нуля")
+
+        output = open(options['output'], 'w', encoding='utf-8', newline='') if options['output'] else self.stdout
+        # Если лист идёт в stdout, итог печатается в stderr, чтобы не попасть в CSV
+        log = self.stderr if output is self.stdout else self.stdout
+        started = time.monotonic()
+        created = 0
+        try:
+            for index, part in enumerate(iter_csv(count, chunk_size, workers)):
+                # Куски CSV кончаются переводом строки, OutputWrapper своего не добавит
+                output.write(part)
+                if index:
+                    created = min(count, created + chunk_size)
+                    log.write(f"Создано {created} из {count}")
+        finally:
+            if output is not self.stdout:
+                output.close()
+
+        elapsed = time.monotonic() - started
+        log.write(self.style.SUCCESS(
+            f"Учеников: {created}, время: {elapsed:.1f} с, {created / elapsed if elapsed else 0.0:.1f} в секунду, "
+            f"процессов: {workers}"
+        ))
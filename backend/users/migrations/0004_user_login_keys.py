@@ -0,0 +1,89 @@
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+# Копия нормализации из users/models.py на момент миграции: миграция должна давать те же ключи,
+# даже если модель потом поменяется
+TOKEN_CONFUSABLES = str.maketrans({'o': '0', 'i': '1', 'l': '1', ' ': None, '-': None})
+MAX_REPORTED = 50
+
+
+def normalize_email_key(email):
+    return email.strip().casefold() or None if email else None
+
+
+def normalize_token(token):
+    return token.strip().casefold().translate(TOKEN_CONFUSABLES) or None if token else None
+
+
+def login_keys(user):
+    return (('email_key', normalize_email_key(user.email)), ('token_key', normalize_token(user.token)))
+
+
+def check_login_keys(apps, schema_editor):
+    """
+    Останавливает миграцию, если два пользователя получили бы один ключ входа (email или токен,
+    отличающиеся только регистром). Раньше вход находил случайного из них; кого оставить, решает человек.
+    Проверка идёт до изменения схемы: в MySQL DDL не откатывается, и миграция не останется применённой наполовину.
+    """
+    User = apps.get_model('users', 'User')
+    owners = {'email_key': {}, 'token_key': {}}
+    for user in User.objects.only('pk', 'email', 'token').order_by('pk').iterator(chunk_size=BATCH_SIZE):
+        for field, key in login_keys(user):
+            if key is not None:
+                owners[field].setdefault(key, []).append(user.pk)
+    collisions = [
+        f"{field} {key!r}: пользователи {', '.join(map(str, pks))}"
+        for field, keys in owners.items() for key, pks in keys.items() if len(pks) > 1
+    ]
+    if collisions:
+        more = f"\n... и ещё {len(collisions) - MAX_REPORTED}" if len(collisions) > MAX_REPORTED else ''
+        raise RuntimeError(
+            "Email или токен нескольких пользователей отличаются только регистром — "
+            "исправьте или удалите лишние учётные записи и повторите миграцию:\n"
+            + '\n'.join(collisions[:MAX_REPORTED]) + more
+        )
+
+
+def fill_login_keys(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    batch = []
+    for user in User.objects.only('pk', 'email', 'token').order_by('pk').iterator(chunk_size=BATCH_SIZE):
+        for field, key in login_keys(user):
+            setattr(user, field, key)
+        batch.append(user)
+        if len(batch) >= BATCH_SIZE:
+            User.objects.bulk_update(batch, ['email_key', 'token_key'])
+            batch = []
+    User.objects.bulk_update(batch, ['email_key', 'token_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_claims_user'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_login_keys, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='user',
+            name='email_key',
+            field=models.CharField(editable=False, max_length=254, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='token_key',
+            field=models.CharField(editable=False, max_length=200, null=True),
+        ),
+        migrations.RunPython(fill_login_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='user',
+            name='email_key',
+            field=models.CharField(editable=False, max_length=254, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='token_key',
+            field=models.CharField(editable=False, max_length=200, null=True, unique=True),
+        ),
+    ]
@@ -1,25 +1,55 @@
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth.base_user import BaseUserManager
 from django.utils.translation import gettext_lazy as _
-import uuid
+import secrets
+
+# Токен ученика — логин, который он вводит руками: строчные буквы и цифры без похожих друг на друга
+# (алфавит Crockford base32, нет i, l, o, u). 32^10 ≈ 10^15 вариантов, совпадение даже на миллионе
+# учеников почти невозможно, а на редкий случай есть несколько повторных попыток.
+TOKEN_ALPHABET = '0123456789abcdefghjkmnpqrstvwxyz'
+TOKEN_LENGTH = getattr(settings, 'STUDENT_TOKEN_LENGTH', 10)
+TOKEN_ATTEMPTS = 5
+# При вводе токена: регистр не важен, «o» читается как ноль, «i» и «l» — как единица, пробелы и дефисы убираются
+TOKEN_CONFUSABLES = str.maketrans({'o': '0', 'i': '1', 'l': '1', ' ': None, '-': None})
+
+
+def normalize_email_key(email):
+    """Ключ поиска по email: без пробелов по краям и без учёта регистра. None для пустого."""
+    return email.strip().casefold() or None if email else None
+
+
+def normalize_token(token):
+    """Ключ поиска по токену ученика — в нём совпадают все варианты написания, которые принимает вход."""
+    return token.strip().casefold().translate(TOKEN_CONFUSABLES) or None if token else None
+
 
 class CustomUserManager(BaseUserManager):
+    def generate_token(self):
+        return ''.join(secrets.choice(TOKEN_ALPHABET) for _ in range(TOKEN_LENGTH))
+
     def create_user(self,  email=None, password=None,  **extra_fields):
-        if not password: return ValueError(_('The given password must be set'))
+        if not password:
+            raise ValueError(_('The given password must be set'))
         if email:
-            email = self.normalize_email(email)
-            token = uuid.uuid4().hex[::10]
-            user = self.model(token=token, email=email, **extra_fields)
-            user.set_password(password)
-            user.save()
-            return user
-        
-        token = uuid.uuid4().hex[::10]
-        user = self.model(token=token, password=password, **extra_fields)
+            extra_fields['email'] = self.normalize_email(email)
+        token = extra_fields.pop('token', None)
+        user = self.model(**extra_fields)
         user.set_password(password)
-        user.save()
-        return user
+        # Токен задан явно — одна попытка; сгенерированный при совпадении генерируется заново
+        for _attempt in range(1 if token else TOKEN_ATTEMPTS):
+            user.token = token or self.generate_token()
+            try:
+                # Точка сохранения: ошибка уникальности не должна портить внешнюю транзакцию
+                with transaction.atomic(using=self.db):
+                    user.save(using=self.db)
+                return user
+            except IntegrityError:
+                if not self.filter(token_key=normalize_token(user.token)).exists():
+                    # Конфликт не по токену (например, email уже занят) — повтор не поможет
+                    raise
+        raise IntegrityError(f'Не удалось подобрать свободный токен за {TOKEN_ATTEMPTS} попыток')
 
     def create_superuser(self, email, password, **extra_fields):
         extra_fields.setdefault('is_staff', True)
@@ -32,10 +62,34 @@ class CustomUserManager(BaseUserManager):
             raise ValueError(_('Superuser must have is_superuser=True.'))
         
         return self.create_user(email, password, **extra_fields)
+
+    def get_by_natural_key(self, username):
+        # Вход в админку тоже без учёта регистра email — по индексу email_key
+        key = normalize_email_key(username)
+        if key is None:
+            raise self.model.DoesNotExist
+        return self.get(email_key=key)
+
+    def find_by_login(self, login):
+        """
+        Пользователь по тому, что ввели в поле входа: email (если есть «@») или токен ученика.
+        Ищется по нормализованному ключу с уникальным индексом — одна строка по индексу, без сканирования.
+        """
+        if '@' in login:
+            field, key = 'email_key', normalize_email_key(login)
+        else:
+            field, key = 'token_key', normalize_token(login)
+        if key is None:
+            return None
+        return self.filter(**{field: key}).first()
 class User(AbstractUser):
     username = None
     token = models.CharField(max_length=200, unique=True)
     email = models.EmailField('email', unique=True, null=True, blank=True)
+    # Нормализованные email и токен (normalize_email_key, normalize_token) для входа без учёта регистра.
+    # Заполняются в save(); при bulk_create / update их нужно проставить самим (fill_login_keys).
+    email_key = models.CharField(max_length=254, unique=True, null=True, editable=False)
+    token_key = models.CharField(max_length=200, unique=True, null=True, editable=False)
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
     objects = CustomUserManager()
@@ -44,4 +98,52 @@ class User(AbstractUser):
             ("psych", "Psychologist, can message with users"),
         ]
     def __str__(self):
-        return self.email
\ No newline at end of file
+        return self.email
+
+    def fill_login_keys(self):
+        self.email_key = normalize_email_key(self.email)
+        self.token_key = normalize_token(self.token)
+
+    def save(self, *args, **kwargs):
+        self.fill_login_keys()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if 'email' in update_fields:
+                update_fields.add('email_key')
+            if 'token' in update_fields:
+                update_fields.add('token_key')
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
+
+class ClaimsUser(User):
+    """
+    Пользователь запроса, собранный из проверенного access JWT (см. users/authentication.py) без запроса к БД.
+    Известен только id, остальные поля отложены: при первом обращении к любому из них строка загружается
+    целиком одним запросом. Право psych берётся из клейма is_psychologist токена.
+    Это тот же User (прокси-модель): его можно передавать в фильтры, внешние ключи и сравнивать с User.
+    """
+    # Права, значение которых записано в токен: право -> клейм (см. MyTokenObtainPairSerializer.get_token)
+    PERMISSION_CLAIMS = {'users.psych': 'is_psychologist'}
+
+    class Meta:
+        proxy = True
+
+    @property
+    def claims(self):
+        return getattr(self, '_claims', {})
+
+    def has_perm(self, perm, obj=None):
+        claim = self.PERMISSION_CLAIMS.get(perm)
+        if obj is None and claim in self.claims:
+            return bool(self.claims[claim])
+        # Клейма нет (старый токен) или другое право — обычная проверка; Django запомнит права на весь запрос
+        return super().has_perm(perm, obj)
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        # Обращение к отложенному полю грузит не одно это поле, а все отложенные сразу
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and set(fields) <= deferred:
+            fields = deferred
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
@@ -0,0 +1,129 @@
+import csv
+import django
+import multiprocessing
+import os
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from .models import TOKEN_ALPHABET, TOKEN_ATTEMPTS, User
+
+# Массовое создание учеников (подключение школы): токены и пароли выдаются листом CSV.
+# Самое дорогое — хеш пароля (PBKDF2, сотни миллисекунд), поэтому в команде provision_students
+# хеши считаются в пуле процессов, а ученики вставляются пачками по bulk_create.
+# Пока вставляется одна пачка, пул уже хеширует следующую. Эндпоинт хеширует в своём процессе (workers=1).
+# Строки листа отдаются по пачкам сразу после их сохранения — весь лист в памяти не держится.
+
+PASSWORD_LENGTH = 10
+CSV_HEADER = ('token', 'password')
+
+
+def get_chunk_size():
+    return getattr(settings, 'STUDENT_PROVISION_CHUNK_SIZE', 500)
+
+
+def get_workers():
+    """Процессов для хеширования; 1 — хешировать в текущем процессе без пула."""
+    return getattr(settings, 'STUDENT_PROVISION_WORKERS', None) or os.cpu_count() or 1
+
+
+def generate_password():
+    # Тот же алфавит без похожих символов, что и у токена: лист печатают и переписывают руками
+    return ''.join(secrets.choice(TOKEN_ALPHABET) for _ in range(PASSWORD_LENGTH))
+
+
+class _InlineExecutor:
+    """Замена пула при workers=1: то же map(), но в текущем процессе."""
+
+    def map(self, fn, iterable, chunksize=1):
+        return map(fn, iterable)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+def _executor(workers):
+    if workers <= 1:
+        return _InlineExecutor()
+    # spawn, а не fork: fork из многопоточного сервера может унести в потомка чужие захваченные блокировки.
+    # Django в процессах пула настраивается заново (нужны PASSWORD_HASHERS); модули, которые
+    # передаются в пул (django.setup, make_password), импортируются и без настроенного Django
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup)
+
+
+def _free_tokens(count):
+    """count разных токенов, которых нет в БД (один запрос на проверку)."""
+    tokens = set()
+    for _attempt in range(TOKEN_ATTEMPTS):
+        while len(tokens) < count:
+            tokens.add(User.objects.generate_token())
+        # Сгенерированный токен уже в нормализованном виде
+        tokens -= set(User.objects.filter(token_key__in=tokens).values_list('token_key', flat=True))
+        if len(tokens) == count:
+            return list(tokens)
+    raise IntegrityError(f'Не удалось подобрать свободные токены за {TOKEN_ATTEMPTS} попыток')
+
+
+def _insert(hashes):
+    """Сохраняет пачку учеников с готовыми хешами паролей и возвращает их токены."""
+    for _attempt in range(TOKEN_ATTEMPTS):
+        tokens = _free_tokens(len(hashes))
+        users = [User(token=token, password=password) for token, password in zip(tokens, hashes)]
+        for user in users:
+            # bulk_create не вызывает save()
+            user.fill_login_keys()
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+            return tokens
+        except IntegrityError:
+            # Токен занял параллельный запрос между проверкой и вставкой — вся пачка с новыми токенами
+            if not User.objects.filter(token_key__in=tokens).exists():
+                raise
+    raise IntegrityError(f'Не удалось сохранить пачку учеников за {TOKEN_ATTEMPTS} попыток')
+
+
+def _hashed_chunks(executor, count, chunk_size, workers):
+    """Отдаёт пачки (пароли, хеши); следующая пачка отправляется в пул до того, как отдана текущая."""
+    pending = None
+    for start in range(0, count, chunk_size):
+        passwords = [generate_password() for _ in range(min(chunk_size, count - start))]
+        hashes = executor.map(make_password, passwords, chunksize=max(1, len(passwords) // (workers * 4)))
+        if pending is not None:
+            yield pending[0], list(pending[1])
+        pending = passwords, hashes
+    if pending is not None:
+        yield pending[0], list(pending[1])
+
+
+def provision_students(count, chunk_size=None, workers=None):
+    """
+    Создаёт count учеников и отдаёт их (токен, пароль) пачками по мере сохранения.
+    Каждая пачка сохраняется в своей транзакции: если перестать читать генератор, уже отданные
+    ученики останутся, а следующие не создадутся.
+    """
+    chunk_size = chunk_size or get_chunk_size()
+    workers = min(workers or get_workers(), max(1, count))
+    with _executor(workers) as executor:
+        for passwords, hashes in _hashed_chunks(executor, count, chunk_size, workers):
+            tokens = _insert(hashes)
+            yield list(zip(tokens, passwords))
+
+
+class _Echo:
+    """Файлоподобный объект для csv.writer: write() просто возвращает строку."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(count, chunk_size=None, workers=None):
+    """Лист учеников в CSV: заголовок, затем по одному куску текста на сохранённую пачку."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_HEADER)
+    for rows in provision_students(count, chunk_size, workers):
+        yield ''.join(writer.writerow(row) for row in rows)
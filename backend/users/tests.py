@@ -1,3 +1,298 @@
-from django.test import TestCase
+from django.contrib.auth.models import Permission
+import importlib
+from unittest import mock
+from django.apps import apps
+from django.conf import global_settings
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from chat.models import Chat
+from .authentication import ClaimsJWTAuthentication, is_psychologist
+from .provisioning import iter_csv, provision_students
+from .models import TOKEN_ALPHABET, TOKEN_ATTEMPTS, TOKEN_LENGTH, ClaimsUser, User, normalize_email_key, normalize_token
+from .views import MyTokenObtainPairSerializer
 
-# Create your tests here.
+
+def login_token(user):
+    """Access JWT с теми же клеймами, что выдаёт вход (api/token/)."""
+    return MyTokenObtainPairSerializer.get_token(user).access_token
+
+
+class ClaimsUserTest(TestCase):
+    def setUp(self):
+        self.psychologist = User.objects.create(email='psy@school.ru', token='psy')
+        self.psychologist.user_permissions.add(Permission.objects.get(codename='psych'))
+        self.student = User.objects.create(token='student')
+
+    def authenticate(self, token):
+        return ClaimsJWTAuthentication().get_user(token)
+
+    def test_user_from_claims_without_queries(self):
+        tokens = login_token(self.psychologist), login_token(self.student)
+        with CaptureQueriesContext(connection) as queries:
+            psychologist, student = map(self.authenticate, tokens)
+            self.assertTrue(is_psychologist(psychologist))
+            self.assertFalse(is_psychologist(student))
+            self.assertEqual(psychologist, self.psychologist)
+            self.assertTrue(psychologist.is_authenticated)
+        self.assertEqual(len(queries), 0)
+
+    def test_row_is_loaded_once_on_demand(self):
+        user = self.authenticate(login_token(self.psychologist))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(user.email, 'psy@school.ru')
+            self.assertEqual(user.token, 'psy')
+            self.assertFalse(user.is_staff)
+        self.assertEqual(len(queries), 1)
+
+    def test_usable_as_model_instance(self):
+        student = self.authenticate(login_token(self.student))
+        chat = Chat.objects.create(student=student, psychologist=self.psychologist)
+        self.assertEqual(Chat.objects.filter(student=student).get(), chat)
+        self.assertIsInstance(student, User)
+
+    def test_token_without_claim_falls_back_to_permissions(self):
+        user = self.authenticate(AccessToken.for_user(self.psychologist))
+        self.assertIsInstance(user, ClaimsUser)
+        self.assertTrue(is_psychologist(user))
+
+
+class ClaimsAuthenticationApiTest(APITestCase):
+    def setUp(self):
+        self.student = User.objects.create(token='student')
+        self.chat = Chat.objects.create(student=self.student)
+
+    def test_poll_costs_no_auth_queries(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {login_token(self.student)}')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/v1/chats/{self.chat.id}/messages/')
+        self.assertEqual(response.status_code, 200)
+        tables = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('users_user', tables)
+        self.assertNotIn('auth_permission', tables)
+
+    def test_other_students_chat_is_forbidden(self):
+        stranger = User.objects.create(token='stranger')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {login_token(stranger)}')
+        self.assertEqual(self.client.get(f'/api/v1/chats/{self.chat.id}/messages/').status_code, 403)
+
+    def test_invalid_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer garbage')
+        self.assertEqual(self.client.get('/api/v1/chats/').status_code, 401)
+
+    def test_inactive_claim_is_rejected(self):
+        self.student.is_active = False
+        token = login_token(self.student)
+        self.assertIs(token['is_active'], False)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(self.client.get(f'/api/v1/chats/{self.chat.id}/messages/').status_code, 401)
+
+    def test_revoked_permission_is_dropped_on_refresh(self):
+        psychologist = User.objects.create(email='psy@school.ru', token='psy')
+        psychologist.user_permissions.add(Permission.objects.get(codename='psych'))
+        refresh = str(MyTokenObtainPairSerializer.get_token(psychologist))
+        url = f'/api/v1/chats/{self.chat.id}/messages/'
+
+        access = self.client.post('/api/token/refresh/', {'refresh': refresh}).json()['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        # В refresh-токене клейм is_psychologist остался True, но новый access берёт его из БД
+        psychologist.user_permissions.clear()
+        access = self.client.post('/api/token/refresh/', {'refresh': refresh}).json()['access']
+        self.assertIs(AccessToken(access)['is_psychologist'], False)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_deactivated_user_loses_access_on_refresh(self):
+        refresh = MyTokenObtainPairSerializer.get_token(self.student)
+        # access живёт недолго: после блокировки доступ остаётся не дольше этого срока
+        self.assertLessEqual(refresh.access_token.lifetime.total_seconds(), 15 * 60)
+        self.assertEqual(self.client.post('/api/token/refresh/', {'refresh': str(refresh)}).status_code, 200)
+        User.objects.filter(pk=self.student.pk).update(is_active=False)
+        self.assertEqual(self.client.post('/api/token/refresh/', {'refresh': str(refresh)}).status_code, 401)
+
+
+class LoginLookupTest(APITestCase):
+    def setUp(self):
+        self.psychologist = User.objects.create_user(email='Psy.Name@School.ru', password='secret')
+        self.student = User.objects.create_user(password='secret', token='k7m2p9x4qa')
+
+    def login(self, login):
+        return self.client.post('/api/token/', {'email': login, 'password': 'secret'})
+
+    def test_login_ignores_case(self):
+        self.assertEqual(self.login('psy.name@school.RU').status_code, 200)
+        self.assertEqual(self.login('K7M2P9X4QA').status_code, 200)
+        self.assertEqual(self.login('missing@school.ru').status_code, 401)
+
+    def test_token_typed_with_confusable_letters(self):
+        student = User.objects.create_user(password='secret', token='10ab0')
+        self.assertEqual(User.objects.find_by_login(' IOab-o '), student)
+        self.assertIsNone(User.objects.find_by_login(' - '))
+
+    def test_lookup_by_indexed_key(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(User.objects.find_by_login('PSY.NAME@school.ru'), self.psychologist)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"email_key" =', queries[0]['sql'])
+        self.assertNotIn('LIKE', queries[0]['sql'])
+
+    def test_keys_follow_changes(self):
+        self.psychologist.email = 'New@School.ru'
+        self.psychologist.save(update_fields=['email'])
+        self.assertEqual(User.objects.get_by_natural_key('new@school.RU'), self.psychologist)
+        with self.assertRaises(User.DoesNotExist):
+            User.objects.get_by_natural_key('')
+
+    def test_keys_are_unique(self):
+        with self.assertRaises(IntegrityError):
+            User.objects.create_user(email='psy.name@school.ru', password='secret')
+
+
+class LoginKeysMigrationTest(TestCase):
+    migration = importlib.import_module('users.migrations.0004_user_login_keys')
+
+    def test_frozen_normalization_matches_model(self):
+        for value in [None, '', '  Psy@School.RU ', 'AbC-1o l', 'İstanbul@x.ru']:
+            self.assertEqual(self.migration.normalize_email_key(value), normalize_email_key(value))
+            self.assertEqual(self.migration.normalize_token(value), normalize_token(value))
+
+    def test_collisions_stop_the_migration(self):
+        # bulk_create не вызывает save(), ключей у старых строк ещё нет — как до миграции
+        users = User.objects.bulk_create([
+            User(email='Psy@School.ru', token='p1'), User(email='psy@school.RU ', token='p2'),
+            User(token='AbcO1'), User(token='abc01'), User(token='other'),
+        ])
+        with self.assertRaises(RuntimeError) as error:
+            self.migration.check_login_keys(apps, None)
+        message = str(error.exception)
+        self.assertIn(f"email_key 'psy@school.ru': пользователи {users[0].pk}, {users[1].pk}", message)
+        self.assertIn(f"token_key 'abc01': пользователи {users[2].pk}, {users[3].pk}", message)
+
+        User.objects.filter(pk__in=[users[1].pk, users[3].pk]).delete()
+        self.migration.check_login_keys(apps, None)
+        self.migration.fill_login_keys(apps, None)
+        self.assertEqual(User.objects.get(pk=users[2].pk).token_key, 'abc01')
+
+
+class StudentTokenTest(TestCase):
+    def test_generated_token(self):
+        tokens = {User.objects.create_user(password='secret').token for _ in range(20)}
+        self.assertEqual(len(tokens), 20)
+        for token in tokens:
+            self.assertEqual(len(token), TOKEN_LENGTH)
+            self.assertLessEqual(set(token), set(TOKEN_ALPHABET))
+
+    def test_retries_taken_token(self):
+        User.objects.create_user(password='secret', token='taken')
+        with mock.patch.object(User.objects, 'generate_token', side_effect=['TAKEN', 'taken', 'free']):
+            self.assertEqual(User.objects.create_user(password='secret').token, 'free')
+
+    def test_gives_up_after_attempts(self):
+        User.objects.create_user(password='secret', token='taken')
+        with mock.patch.object(User.objects, 'generate_token', return_value='taken') as generate:
+            with self.assertRaises(IntegrityError):
+                User.objects.create_user(password='secret')
+        self.assertEqual(generate.call_count, TOKEN_ATTEMPTS)
+
+    def test_other_conflicts_are_not_retried(self):
+        User.objects.create_user(email='psy@school.ru', password='secret')
+        with mock.patch.object(User.objects, 'generate_token', wraps=User.objects.generate_token) as generate:
+            with self.assertRaises(IntegrityError):
+                User.objects.create_user(email='PSY@school.ru', password='secret')
+        self.assertEqual(generate.call_count, 1)
+
+    def test_password_is_required(self):
+        with self.assertRaises(ValueError):
+            User.objects.create_user()
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], STUDENT_PROVISION_WORKERS=1)
+class ProvisioningTest(APITestCase):
+    URL = '/api/auth/provision-students/'
+
+    def setUp(self):
+        self.admin = User.objects.create(email='admin@school.ru', token='admin', is_staff=True)
+        self.admin_token = login_token(self.admin)
+
+    def assertCanLogin(self, token, password):
+        user = User.objects.find_by_login(token.upper())
+        self.assertIsNotNone(user)
+        self.assertTrue(user.check_password(password))
+
+    def test_chunks(self):
+        chunks = list(provision_students(7, chunk_size=3))
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 3, 1])
+        rows = [row for chunk in chunks for row in chunk]
+        self.assertEqual(len({token for token, _ in rows}), 7)
+        self.assertEqual(User.objects.count(), 8)
+        for token, password in rows:
+            self.assertCanLogin(token, password)
+
+    def test_queries_per_chunk(self):
+        with CaptureQueriesContext(connection) as queries:
+            list(provision_students(30, chunk_size=10))
+        # На пачку: проверка токенов + вставка (в тестах ещё SAVEPOINT и RELEASE), а не запрос на ученика
+        self.assertLessEqual(len(queries), 3 * 4)
+
+    def test_taken_tokens_are_replaced(self):
+        User.objects.create(token='taken')
+        tokens = iter(['taken', 'first', 'taken', 'second'])
+        with mock.patch.object(User.objects, 'generate_token', side_effect=lambda: next(tokens)):
+            rows = list(provision_students(2))[0]
+        self.assertEqual({token for token, _ in rows}, {'first', 'second'})
+
+    # Процессы пула настраивают Django заново, без override_settings — хеши обычные (PBKDF2)
+    @override_settings(PASSWORD_HASHERS=global_settings.PASSWORD_HASHERS)
+    def test_process_pool(self):
+        rows = list(provision_students(3, workers=2))[0]
+        for token, password in rows:
+            self.assertCanLogin(token, password)
+
+    def test_csv(self):
+        parts = list(iter_csv(5, chunk_size=2))
+        self.assertEqual(parts[0], 'token,password\r\n')
+        self.assertEqual(len(parts), 4)
+        self.assertEqual(sum(part.count('\n') for part in parts[1:]), 5)
+
+    def test_endpoint_streams_csv(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.admin_token}')
+        response = self.client.post(self.URL, {'count': 4}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'token,password')
+        for line in lines[1:]:
+            self.assertCanLogin(*line.split(','))
+        self.assertEqual(len(lines), 5)
+
+    @override_settings(STUDENT_PROVISION_WORKERS=4)
+    def test_endpoint_does_not_start_process_pool(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.admin_token}')
+        with mock.patch('users.provisioning.ProcessPoolExecutor') as pool:
+            response = self.client.post(self.URL, {'count': 3}, format='json')
+            lines = b''.join(response.streaming_content).decode().splitlines()
+        pool.assert_not_called()
+        self.assertEqual(len(lines), 4)
+
+    async def test_endpoint_streams_under_asgi(self):
+        response = await self.async_client.post(
+            self.URL, {'count': 2}, content_type='application/json',
+            headers={'authorization': f'Bearer {self.admin_token}'},
+        )
+        self.assertEqual(response.status_code, 200)
+        content = b''.join([part async for part in response.streaming_content])
+        self.assertEqual(len(content.decode().splitlines()), 3)
+
+    def test_endpoint_validation(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.admin_token}')
+        for count in (0, 'много', None, 10 ** 6):
+            self.assertEqual(self.client.post(self.URL, {'count': count}, format='json').status_code, 400)
+        student = User.objects.create(token='student')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {login_token(student)}')
+        self.assertEqual(self.client.post(self.URL, {'count': 1}, format='json').status_code, 403)
+        self.assertEqual(User.objects.count(), 2)
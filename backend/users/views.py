@@ -1,16 +1,21 @@
 from users.models import User
 from users.serializers import UserSerializer # Убедитесь, что UserSerializer существует
-from django.db.models import Q
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework import exceptions, serializers
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
 from .models import User, CustomUserManager
 from .serializers import UserSerializer # Убедитесь, что он есть
-import uuid
+from .provisioning import iter_csv
 
 class RegisterStudentView(APIView):
     permission_classes = [AllowAny]
@@ -22,11 +27,7 @@ class RegisterStudentView(APIView):
             return Response({"detail": "Пароль обязателен."}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            # Генерируем уникальный токен (как в вашей модели: uuid hex укороченный)
-            # Используем цикл для гарантии уникальности
-            # token = uuid.uuid4().hex[:10]
-            # while User.objects.filter(token=token).exists():
-            #     token = uuid.uuid4().hex[:10]
+            # Уникальный токен генерирует create_user (см. CustomUserManager: при совпадении повторяет попытку)
 
             # Создаем пользователя
             # Email оставляем пустым или генерируем фейковый, если он обязателен в вашей БД
@@ -34,7 +35,6 @@ class RegisterStudentView(APIView):
             
             user = User.objects.create_user(
                 password=password,
-                # token=token
             )
             
             # Возвращаем токен, чтобы показать его ученику
@@ -46,6 +46,43 @@ class RegisterStudentView(APIView):
         except Exception as e:
             print(e)
             return Response({"detail": "Ошибка при создании аккаунта."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+async def _aiterate(iterator):
+    """
+    Синхронный генератор как асинхронный: под ASGI (daphne) Django иначе дочитывает
+    StreamingHttpResponse до конца в память и только потом отдаёт. Шаги идут в потоке синхронных view.
+    """
+    iterator = iter(iterator)
+    done = object()
+    while (part := await sync_to_async(next)(iterator, done)) is not done:
+        yield part
+
+
+class ProvisionStudentsView(APIView):
+    """
+    POST {"count": N} — создаёт N учеников (подключение школы) и отдаёт лист token,password в CSV.
+    Лист идёт потоком по мере сохранения пачек (см. users/provisioning.py). Только для администраторов.
+    """
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        limit = getattr(settings, 'STUDENT_PROVISION_MAX', 5000)
+        try:
+            count = int(request.data.get('count'))
+        except (TypeError, ValueError):
+            count = 0
+        if not 1 <= count <= limit:
+            return Response({"detail": f"count — число от 1 до {limit}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Хешируем в процессе сервера: пул процессов (spawn) из запроса запускал бы копии сервера
+        # и создавался бы заново на каждый запрос. Пул — только в команде provision_students
+        rows = iter_csv(count, workers=1)
+        if isinstance(request._request, ASGIRequest):
+            rows = _aiterate(rows)
+        response = StreamingHttpResponse(rows, content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="students-{count}.csv"'
+        return response
+
+
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
     # Оставляем поле email, так как оно используется для унифицированного ввода
     email = serializers.CharField(required=True) 
@@ -56,13 +93,9 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
 
         user = None
 
-        # 1. Логика проверки: находим пользователя по email или токену
-        if "@" in unified_input:
-            # Email (для психолога)
-            user = User.objects.filter(Q(email__iexact=unified_input)).first()
-        else:
-            # Токен (для школьника)
-            user = User.objects.filter(Q(token__iexact=unified_input)).first()
+        # 1. Логика проверки: находим пользователя по email (психолог) или токену (школьник).
+        # Без учёта регистра, по нормализованному ключу с индексом (см. CustomUserManager.find_by_login)
+        user = User.objects.find_by_login(unified_input)
             
         # 2. Проверка существования пользователя
         if user is None:
@@ -97,10 +130,40 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
     def get_token(cls, user):
         # Эта часть добавляет is_psychologist в payload самого JWT-токена.
         token = super().get_token(user)
-        # Предполагаем, что users.psych — это правильный код разрешения
-        token['is_psychologist'] = user.has_perm('users.psych') 
+        set_user_claims(token, user)
         return token
     
 
 class MyTokenObtainPairView(TokenObtainPairView):
-    serializer_class = MyTokenObtainPairSerializer
\ No newline at end of file
+    serializer_class = MyTokenObtainPairSerializer
+
+
+def set_user_claims(token, user):
+    """
+    Клеймы, по которым ClaimsJWTAuthentication узнаёт права и активность пользователя без запроса к БД.
+    Пишутся при входе и заново при каждом обновлении access-токена.
+    """
+    # Предполагаем, что users.psych — это правильный код разрешения
+    token['is_psychologist'] = user.has_perm('users.psych')
+    token['is_active'] = user.is_active
+
+
+class MyTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    simplejwt копирует в новый access-токен все клеймы refresh-токена, то есть права на момент входа
+    жили бы весь срок refresh (REFRESH_TOKEN_LIFETIME). Здесь клеймы переписываются по пользователю из БД,
+    и отозванное право перестаёт действовать со следующим access-токеном.
+    """
+
+    def validate(self, attrs):
+        # Подпись, срок, чёрный список и is_active пользователя проверяет simplejwt
+        data = super().validate(attrs)
+        access = AccessToken(data['access'], verify=False)
+        user = User.objects.get(**{api_settings.USER_ID_FIELD: access[api_settings.USER_ID_CLAIM]})
+        set_user_claims(access, user)
+        data['access'] = str(access)
+        return data
+
+
+class MyTokenRefreshView(TokenRefreshView):
+    serializer_class = MyTokenRefreshSerializer
\ No newline at end of file
@@ -1,5 +1,5 @@
 import axios from "axios";
-import { ACCESS_TOKEN } from "./constants";
+import { ACCESS_TOKEN, REFRESH_TOKEN } from "./constants";
 
 const apiUrl = "";
 
@@ -20,4 +20,50 @@ api.interceptors.request.use(
   }
 );
 
-export default api;
\ No newline at end of file
+// Access-токен живёт недолго (ACCESS_TOKEN_LIFETIME на сервере), новый берётся по refresh-токену.
+// Один запрос обновления на всех: параллельные запросы с истёкшим токеном ждут его же.
+let refreshing = null;
+
+export const refreshAccessToken = () => {
+  if (!refreshing) {
+    const refresh = localStorage.getItem(REFRESH_TOKEN);
+    refreshing = (refresh
+      ? api.post("/token/refresh/", { refresh }, { _retried: true })
+      : Promise.reject(new Error("Нет refresh-токена"))
+    )
+      .then((response) => {
+        localStorage.setItem(ACCESS_TOKEN, response.data.access);
+        return response.data.access;
+      })
+      .catch((error) => {
+        // Refresh истёк или пользователь заблокирован — нужен новый вход
+        localStorage.removeItem(ACCESS_TOKEN);
+        localStorage.removeItem(REFRESH_TOKEN);
+        throw error;
+      })
+      .finally(() => {
+        refreshing = null;
+      });
+  }
+  return refreshing;
+};
+
+// 401 из-за истёкшего access-токена: обновляем его и повторяем запрос один раз
+api.interceptors.response.use(
+  (response) => response,
+  async (error) => {
+    const config = error.config;
+    if (error.response?.status === 401 && config && !config._retried && localStorage.getItem(REFRESH_TOKEN)) {
+      config._retried = true;
+      try {
+        await refreshAccessToken();
+      } catch {
+        return Promise.reject(error);
+      }
+      return api(config);
+    }
+    return Promise.reject(error);
+  }
+);
+
+export default api;
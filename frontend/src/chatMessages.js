@@ -0,0 +1,22 @@
+// Новые сообщения из опроса (?after_id=) дописываются в конец, повторы по id отбрасываются
+export const mergeMessages = (current, incoming) => {
+    if (!incoming.length) return current;
+    const ids = new Set(incoming.map(msg => msg.id));
+    return [...current.filter(msg => !ids.has(msg.id)), ...incoming];
+};
+
+// Заменяет временное (оптимистичное) сообщение на сохранённое сервером
+export const confirmMessage = (current, tempId, saved) =>
+    current.some(msg => msg.id === saved.id)
+        ? current.filter(msg => msg.id !== tempId)
+        : current.map(msg => (msg.id === tempId ? saved : msg));
+
+// id последнего непрочитанного сообщения собеседника (его и отправляем в mark_read) или null
+export const lastUnreadId = (messages, userId) => {
+    const unread = messages.filter(msg => msg.sender_id != userId && !msg.is_read && !msg.is_sending);
+    return unread.length ? unread[unread.length - 1].id : null;
+};
+
+// Событие «прочитано» от собеседника: его читатель прочитал все чужие сообщения до upToId
+export const applyRead = (current, readerId, upToId) =>
+    current.map(msg => (msg.sender_id != readerId && msg.id <= upToId ? { ...msg, is_read: true } : msg));
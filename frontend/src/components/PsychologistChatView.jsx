@@ -1,6 +1,8 @@
 import React, { useState, useEffect, useRef } from 'react';
 import api from '../api';
 import { useAuth } from '../context/AuthContext';
+import { mergeMessages, confirmMessage, lastUnreadId, applyRead } from '../chatMessages';
+import { subscribe } from '../realtime';
 
 const LoadingPlaceholder = ({ text }) => (
     <div className="chat-placeholder chat-loading-state">
@@ -43,6 +45,12 @@ const PsychologistChatView = () => {
         return () => clearInterval(intervalId);
     }, [selectedChatId]); 
 
+    // Новые чаты и последние сообщения приходят по WebSocket: чат с обновлением поднимается наверх
+    useEffect(() => subscribe('/ws/chats/', (event) => {
+        if (event.type !== 'chat') return;
+        setChats(prev => [event.chat, ...prev.filter(chat => chat.id !== event.chat.id)]);
+    }), []);
+
     // 2. Загрузка сообщений выбранного чата
     useEffect(() => {
         if (!selectedChatId) {
@@ -50,11 +58,18 @@ const PsychologistChatView = () => {
             return;
         }
 
+        // id последнего полученного сообщения: после первой загрузки запрашиваем только новые
+        let lastId = null;
+
         const fetchMessages = async () => {
             setLoadingMessages(true); 
             try {
-                const response = await api.get(`/v1/chats/${selectedChatId}/messages/`);
-                setMessages(response.data);
+                const params = lastId ? { after_id: lastId } : {};
+                const response = await api.get(`/v1/chats/${selectedChatId}/messages/`, { params });
+                if (response.data.length) {
+                    lastId = response.data[response.data.length - 1].id;
+                }
+                setMessages(prev => params.after_id ? mergeMessages(prev, response.data) : response.data);
             } catch (err) {
                 console.error("Ошибка загрузки сообщений:", err);
             } finally {
@@ -63,11 +78,35 @@ const PsychologistChatView = () => {
         };
 
         fetchMessages();
+        // Новые сообщения приходят по WebSocket сразу после отправки; опрос остаётся запасным вариантом
+        const unsubscribe = subscribe(`/ws/chats/${selectedChatId}/`, (event) => {
+            if (event.type === 'read') {
+                // Собеседник прочитал наши сообщения
+                if (event.reader_id != user.id) setMessages(prev => applyRead(prev, event.reader_id, event.up_to_id));
+                return;
+            }
+            if (event.type !== 'message') return;
+            lastId = Math.max(lastId || 0, event.message.id);
+            setMessages(prev => mergeMessages(prev, [event.message]));
+        });
         const intervalId = setInterval(fetchMessages, 60000); 
 
-        return () => clearInterval(intervalId);
+        return () => {
+            clearInterval(intervalId);
+            unsubscribe();
+        };
     }, [selectedChatId]);
     
+    // Открытый чат — значит, сообщения собеседника прочитаны: одна отметка до последнего из них
+    useEffect(() => {
+        const upToId = selectedChatId && lastUnreadId(messages, user.id);
+        if (!upToId) return;
+        setMessages(prev => applyRead(prev, user.id, upToId));
+        api.post(`/v1/chats/${selectedChatId}/mark_read/`, { up_to_id: upToId }).then((response) => {
+            setChats(prev => prev.map(chat => (chat.id === selectedChatId ? { ...chat, unread_count: response.data.unread_count } : chat)));
+        }).catch(err => console.error("Ошибка отметки о прочтении:", err));
+    }, [messages, selectedChatId]);
+
     // Прокрутка вниз
     useEffect(() => {
         // ⬅️ ИСПРАВЛЕНИЕ ПРОКРУТКИ: Используем block: 'end', чтобы прокручивался только контейнер сообщений
@@ -96,7 +135,8 @@ const PsychologistChatView = () => {
         setMessages(prev => [...prev, tempMessage]);
         
         try {
-            await api.post(`/v1/chats/${selectedChatId}/send_message/`, { content: messageContent });
+            const response = await api.post(`/v1/chats/${selectedChatId}/send_message/`, { content: messageContent });
+            setMessages(prev => confirmMessage(prev, tempMessage.id, response.data));
         } catch (err) {
             alert("Не удалось отправить сообщение.");
             console.error(err);
@@ -121,7 +161,10 @@ const PsychologistChatView = () => {
                             className={`chat-list-item ${chat.id === selectedChatId ? 'active' : ''}`}
                             onClick={() => setSelectedChatId(chat.id)}
                         >
-                            <h4>Чат #{chat.id} - Ученик ({chat.student_token})</h4>
+                            <h4>
+                                Чат #{chat.id} - Ученик ({chat.student_token})
+                                {chat.unread_count > 0 && <span className="unread-badge">{chat.unread_count}</span>}
+                            </h4>
                             <p className="last-message">
                                 {chat.last_message ? `${new Date(chat.last_message.timestamp).toLocaleTimeString()}: ${chat.last_message.content}` : 'Нет сообщений'}
                             </p>
@@ -148,6 +191,7 @@ const PsychologistChatView = () => {
                                 >
                                     <span className="message-time">
                                         **{msg.sender_id == user.id ? 'Вы' : 'Ученик'}** - {new Date(msg.timestamp).toLocaleTimeString()}
+                                        {msg.sender_id == user.id && msg.is_read ? ' · прочитано' : ''}
                                     </span>
                                     <p>{msg.content}</p>
                                 </div>
@@ -1,6 +1,8 @@
 import React, { useState, useEffect, useRef } from 'react';
 import api from '../api';
 import { useAuth } from '../context/AuthContext';
+import { mergeMessages, confirmMessage, lastUnreadId, applyRead } from '../chatMessages';
+import { subscribe } from '../realtime';
 
 const LoadingPlaceholder = ({ text }) => (
     <div className="chat-placeholder chat-loading-state">
@@ -41,11 +43,18 @@ const StudentChat = () => {
     useEffect(() => {
         if (!chatId) return;
 
+        // id последнего полученного сообщения: после первой загрузки запрашиваем только новые
+        let lastId = null;
+
         const fetchMessages = async () => {
             setMessagesLoading(true); 
             try {
-                const response = await api.get(`/v1/chats/${chatId}/messages/`);
-                setMessages(response.data);
+                const params = lastId ? { after_id: lastId } : {};
+                const response = await api.get(`/v1/chats/${chatId}/messages/`, { params });
+                if (response.data.length) {
+                    lastId = response.data[response.data.length - 1].id;
+                }
+                setMessages(prev => params.after_id ? mergeMessages(prev, response.data) : response.data);
             } catch (err) {
                 console.error("Ошибка загрузки сообщений:", err);
             } finally {
@@ -54,12 +63,36 @@ const StudentChat = () => {
         };
 
         fetchMessages();
+        // Новые сообщения приходят по WebSocket сразу после отправки; опрос остаётся запасным вариантом
+        const unsubscribe = subscribe(`/ws/chats/${chatId}/`, (event) => {
+            if (event.type === 'read') {
+                // Собеседник прочитал наши сообщения
+                if (event.reader_id != user.id) setMessages(prev => applyRead(prev, event.reader_id, event.up_to_id));
+                return;
+            }
+            if (event.type !== 'message') return;
+            lastId = Math.max(lastId || 0, event.message.id);
+            setMessages(prev => mergeMessages(prev, [event.message]));
+        });
         // Устанавливаем опрос (polling) для обновления сообщений на 60 секунд
         const intervalId = setInterval(fetchMessages, 60000); 
 
-        return () => clearInterval(intervalId);
+        return () => {
+            clearInterval(intervalId);
+            unsubscribe();
+        };
     }, [chatId]);
     
+    // Открытый чат — значит, сообщения собеседника прочитаны: одна отметка до последнего из них
+    useEffect(() => {
+        const upToId = chatId && lastUnreadId(messages, user.id);
+        if (!upToId) return;
+        setMessages(prev => applyRead(prev, user.id, upToId));
+        // Счётчика непрочитанных у ученика на экране нет — ответ не нужен
+        api.post(`/v1/chats/${chatId}/mark_read/`, { up_to_id: upToId })
+            .catch(err => console.error("Ошибка отметки о прочтении:", err));
+    }, [messages, chatId]);
+
     // Прокрутка вниз при получении новых сообщений
     useEffect(() => {
         // ⬅️ ИСПРАВЛЕНИЕ ПРОКРУТКИ: Используем block: 'end', чтобы прокручивался только контейнер сообщений
@@ -117,8 +150,8 @@ const StudentChat = () => {
         setMessages(prev => [...prev, tempMessage]);
         
         try {
-            await api.post(`/v1/chats/${chatId}/send_message/`, { content: messageContent });
-            // Сообщения будут обновлены через polling, и is_sending исчезнет.
+            const response = await api.post(`/v1/chats/${chatId}/send_message/`, { content: messageContent });
+            setMessages(prev => confirmMessage(prev, tempMessage.id, response.data));
         } catch (err) {
             // ⬅️ ИЗМЕНЕНИЕ: Показ конкретной ошибки с бэкенда (например, о цензуре)
             alert(err.response?.data?.detail || "Не удалось отправить сообщение. Проверьте отсутствие ненормативной лексики");
@@ -178,6 +211,7 @@ const StudentChat = () => {
                     >
                         <span className="message-time">
                             **{msg.sender_id == user.id ? 'Вы' : 'Психолог'}** - {new Date(msg.timestamp).toLocaleTimeString()}
+                            {msg.sender_id == user.id && msg.is_read ? ' · прочитано' : ''}
                             {msg.is_sending && ' (отправка...)'}
                         </span>
                         <p>{msg.content}</p>
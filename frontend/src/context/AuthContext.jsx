@@ -1,7 +1,8 @@
 import { createContext, useState, useEffect, useContext } from 'react';
 // ИСПРАВЛЕНО: Используем именованный импорт { jwtDecode } вместо дефолтного
 import { jwtDecode } from 'jwt-decode'; 
-import { ACCESS_TOKEN } from '../constants';
+import { ACCESS_TOKEN, REFRESH_TOKEN } from '../constants';
+import { refreshAccessToken } from '../api';
 
 const AuthContext = createContext(null);
 
@@ -25,6 +26,13 @@ export const AuthProvider = ({ children }) => {
                         is_psychologist: decoded.is_psychologist || false,
                         id: decoded.user_id
                     });
+                } else if (localStorage.getItem(REFRESH_TOKEN)) {
+                    // Access-токен живёт недолго — берём новый по refresh-токену, не выходя из аккаунта
+                    refreshAccessToken().then(checkAuthStatus).catch(() => {
+                        logout();
+                        setLoading(false);
+                    });
+                    return;
                 } else {
                     // Токен истек
                     logout(); 
@@ -47,6 +55,7 @@ export const AuthProvider = ({ children }) => {
 
     const logout = () => {
         localStorage.removeItem(ACCESS_TOKEN);
+        localStorage.removeItem(REFRESH_TOKEN);
         setUser(null);
     };
 
@@ -7,63 +7,89 @@ const Articles = () => {
     // Состояния для хранения данных и управления интерфейсом
     const [articles, setArticles] = useState([]);
     const [loading, setLoading] = useState(true);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [error, setError] = useState(null);
     const [searchTerm, setSearchTerm] = useState('');
     const [activeTag, setActiveTag] = useState('Все');
+    // Курсор следующей страницы (null — статьи закончились) и все теги базы для фильтра
+    const [nextCursor, setNextCursor] = useState(null);
+    const [allTags, setAllTags] = useState(['Все']);
     const navigate = useNavigate();
 
-    // 1. Загрузка данных с бэкенда при монтировании компонента
+    // Одна страница статей: GET /api/v1/articles/?cursor=...&tag=...
+    // Бэкенд отдаёт {next, previous, results}; курсор берём из ссылки next
+    const fetchPage = async (cursor, tag) => {
+        const params = {};
+        if (cursor) params.cursor = cursor;
+        if (tag !== 'Все') params.tag = tag;
+        const response = await api.get('/v1/articles/', { params });
+
+        let receivedData = response.data;
+        let next = null;
+        if (receivedData && Array.isArray(receivedData.results)) {
+            next = receivedData.next ? new URL(receivedData.next).searchParams.get('cursor') : null;
+            receivedData = receivedData.results;
+        }
+        // Защита: гарантируем, что полученные данные - это массив.
+        if (!Array.isArray(receivedData)) {
+            console.error("API вернул данные в неверном формате:", receivedData);
+            receivedData = [];
+        }
+        return { results: receivedData, next };
+    };
+
+    // 1. Теги для фильтра — один раз: в постраничном списке видны не все
+    useEffect(() => {
+        api.get('/v1/articles/tags/')
+            .then(response => {
+                if (Array.isArray(response.data)) setAllTags(['Все', ...response.data]);
+            })
+            .catch(err => console.error("Ошибка при получении тегов:", err));
+    }, []);
+
+    // 2. Первая страница — при открытии и при смене тега (фильтрует бэкенд)
     useEffect(() => {
+        let cancelled = false;
         const fetchArticles = async () => {
             try {
-                // Запрос к DRF: GET /api/v1/articles/
-                const response = await api.get('/v1/articles/');
-                
-                let receivedData = response.data;
-
-                // Защита №1: Обработка стандартной пагинации Django Rest Framework
-                // Если DRF возвращает paginated response, список статей находится в 'results'.
-                if (receivedData && receivedData.results && Array.isArray(receivedData.results)) {
-                    receivedData = receivedData.results;
-                }
-                
-                // Защита №2: Гарантируем, что полученные данные - это массив.
-                if (!Array.isArray(receivedData)) {
-                    console.error("API вернул данные в неверном формате:", receivedData);
-                    // Устанавливаем пустой массив, чтобы избежать ошибки filter
-                    receivedData = []; 
-                }
-
-                setArticles(receivedData);
+                const { results, next } = await fetchPage(null, activeTag);
+                if (cancelled) return;
+                setArticles(results);
+                setNextCursor(next);
                 setError(null);
             } catch (err) {
+                if (cancelled) return;
                 console.error("Ошибка при получении статей:", err);
                 setError("Не удалось загрузить статьи. Проверьте подключение к API или наличие данных.");
             } finally {
-                setLoading(false);
+                if (!cancelled) setLoading(false);
             }
         };
 
         fetchArticles();
-    }, []); 
+        return () => { cancelled = true; };
+    }, [activeTag]);
 
-    // 2. Логика фильтрации и поиска
-    // Используем (articles || []) для гарантированной работы метода .filter()
-    const filteredArticles = (articles || []).filter(article => { 
-        // Поиск по заголовку и краткому описанию
-        const matchesSearch = article.title.toLowerCase().includes(searchTerm.toLowerCase()) || 
-                              article.excerpt.toLowerCase().includes(searchTerm.toLowerCase());
-        
-        // Фильтрация по тегам (теги приходят как массив строк)
-        // Проверяем, содержит ли массив тегов статьи активный тег
-        const matchesTag = activeTag === 'Все' || article.tags.includes(activeTag);
-        
-        return matchesSearch && matchesTag;
-    });
+    // 3. Следующая страница по кнопке «Показать ещё»
+    const loadMore = async () => {
+        if (!nextCursor || loadingMore) return;
+        setLoadingMore(true);
+        try {
+            const { results, next } = await fetchPage(nextCursor, activeTag);
+            setArticles(prev => [...prev, ...results]);
+            setNextCursor(next);
+        } catch (err) {
+            console.error("Ошибка при получении статей:", err);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
 
-    // Список всех уникальных тегов для кнопок фильтра
-    // Если articles еще не загрузился, используем пустой массив (|| [])
-    const allTags = ['Все', ...new Set((articles || []).flatMap(a => a.tags))];
+    // 4. Поиск по загруженным статьям (по заголовку и краткому описанию)
+    const filteredArticles = (articles || []).filter(article => 
+        article.title.toLowerCase().includes(searchTerm.toLowerCase()) || 
+        article.excerpt.toLowerCase().includes(searchTerm.toLowerCase())
+    );
     
     // --- Условный рендеринг состояний ---
 
@@ -152,11 +178,19 @@ const Articles = () => {
                     ))
                 ) : (
                     <div className="no-results">
-                        <h3>{articles.length === 0 ? "Статьи еще не добавлены в базу" : "Ничего не найдено по вашему запросу"}</h3>
-                        {articles.length > 0 && <p>Попробуйте изменить запрос или сбросить фильтр тегов.</p>}
+                        <h3>{articles.length === 0 && activeTag === 'Все' ? "Статьи еще не добавлены в базу" : "Ничего не найдено по вашему запросу"}</h3>
+                        {(articles.length > 0 || activeTag !== 'Все') && <p>Попробуйте изменить запрос или сбросить фильтр тегов.</p>}
                     </div>
                 )}
             </section>
+
+            {nextCursor && (
+                <div className="load-more">
+                    <button className="filter-tag" onClick={loadMore} disabled={loadingMore}>
+                        {loadingMore ? "Загрузка..." : "Показать ещё"}
+                    </button>
+                </div>
+            )}
         </div>
     );
 };
@@ -113,6 +113,8 @@ const Home = () => {
                                                 >
                                                     <h5>{article.title}</h5>
                                                     <p>{article.excerpt}</p>
+                                                    {/* Фрагмент текста статьи, который лучше всего совпал с запросом */}
+                                                    {article.snippet && <p className="found-article-snippet">«{article.snippet}»</p>}
                                                     <span>Читать &rarr;</span>
                                                 </div>
                                             ))}
@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 import api from '../api';
-import { ACCESS_TOKEN } from '../constants'; 
+import { ACCESS_TOKEN, REFRESH_TOKEN } from '../constants'; 
 import { useAuth } from '../context/AuthContext'; // ⬅️ Импорт useAuth
 import '../styles/Login.css';
 
@@ -46,6 +46,7 @@ const Login = () => {
             const accessToken = response.data.access;
             if (accessToken) {
                 localStorage.setItem(ACCESS_TOKEN, accessToken);
+                localStorage.setItem(REFRESH_TOKEN, response.data.refresh);
                 login(); // Обновляет глобальное состояние AuthContext
                 
                 // Перенаправляем пользователя на корень, чтобы он попал в чат
@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useLocation, useNavigate } from 'react-router-dom';
 import api from '../api';
-import { ACCESS_TOKEN } from '../constants';
+import { ACCESS_TOKEN, REFRESH_TOKEN } from '../constants';
 import { useAuth } from '../context/AuthContext';
 import '../styles/RegisterStudent.css';
 
@@ -59,6 +59,7 @@ const RegisterStudent = () => {
             });
 
             localStorage.setItem(ACCESS_TOKEN, loginResponse.data.access);
+            localStorage.setItem(REFRESH_TOKEN, loginResponse.data.refresh);
             login(); // Обновляем состояние AuthContext
 
             // 3. Если была проблема, инициализируем чат
@@ -0,0 +1,52 @@
+import { jwtDecode } from "jwt-decode";
+import { refreshAccessToken } from "./api";
+import { ACCESS_TOKEN, REFRESH_TOKEN } from "./constants";
+
+// Сокеты живут на том же сервере, что и REST (VITE_API_URL или текущий сайт), но от корня: /ws/...
+const wsOrigin = () =>
+    new URL(import.meta.env.VITE_API_URL || window.location.origin, window.location.origin).origin.replace(/^http/, "ws");
+
+// Коды закрытия, при которых переподключаться бессмысленно (нет токена или доступа к чату)
+const FATAL_CLOSE_CODES = [4401, 4403];
+const RECONNECT_DELAY = 5000;
+
+// Токен для подключения. Access-токен живёт недолго, а отказ при открытии сокета браузер не отличает
+// от обрыва связи — поэтому истёкший токен меняется на новый заранее, а не по ошибке сервера
+const currentToken = async () => {
+    const token = localStorage.getItem(ACCESS_TOKEN) || "";
+    if (!token || !localStorage.getItem(REFRESH_TOKEN)) return token;
+    try {
+        if (jwtDecode(token).exp <= Date.now() / 1000 + 5) {
+            return await refreshAccessToken();
+        }
+    } catch (err) {
+        console.error("Не удалось обновить токен для сокета:", err);
+    }
+    return localStorage.getItem(ACCESS_TOKEN) || "";
+};
+
+// Подписка на события сервера: переподключается при обрыве, пока не вызвана возвращённая функция
+export const subscribe = (path, onEvent) => {
+    let socket = null;
+    let stopped = false;
+    let retryId = null;
+
+    const connect = async () => {
+        const token = await currentToken();
+        if (stopped) return;
+        socket = new WebSocket(`${wsOrigin()}${path}?token=${encodeURIComponent(token)}`);
+        socket.onmessage = (e) => onEvent(JSON.parse(e.data));
+        socket.onclose = (e) => {
+            if (!stopped && !FATAL_CLOSE_CODES.includes(e.code)) {
+                retryId = setTimeout(connect, RECONNECT_DELAY);
+            }
+        };
+    };
+
+    connect();
+    return () => {
+        stopped = true;
+        clearTimeout(retryId);
+        socket?.close();
+    };
+};